@@ -0,0 +1,136 @@
+import time
+import numpy as np
+from gurobipy import GRB
+from scipy.optimize import milp, Bounds, LinearConstraint
+from formulation import Formulation, MODEL_OPTIONS, compile_arrays, add_core
+from matrix_models import RESULT_BLOCKS, FEATURE_RESULT_BLOCKS, solution_to_results
+from model_factory import ModelFactory, FEATURES, FEATURE_SUFFIX
+from validation import constraint_violations, SENSE_TOLERANCE
+
+#-----------------------------------------
+
+# scipy.optimize.milp status codes, as the Gurobi status codes the rest of the code checks
+HIGHS_STATUS = {
+    0: GRB.OPTIMAL,
+    1: GRB.TIME_LIMIT,
+    2: GRB.INFEASIBLE,
+    3: GRB.UNBOUNDED,
+    4: GRB.NUMERIC,
+}
+
+# Solve a (maximisation) formulation with HiGHS through scipy.optimize.milp; returns the Gurobi status code and the
+# scipy result. The relative MIP gap defaults to Gurobi's MIPGap so both backends stop at the same point.
+def solve_milp(form, time_limit=None, mip_gap=1e-4):
+    lower = np.where(form.sense == '<', -np.inf, form.rhs)
+    upper = np.where(form.sense == '>', np.inf, form.rhs)
+    options = {'disp': False, 'mip_rel_gap': mip_gap}
+    if time_limit is not None:
+        options['time_limit'] = time_limit
+
+    # milp minimizes; the production models maximize profit
+    result = milp(-form.obj, integrality=(form.vtype != 'C').astype(int), bounds=Bounds(form.lb, form.ub),
+                  constraints=LinearConstraint(form.A, lower, upper), options=options)
+    return HIGHS_STATUS.get(result.status, GRB.NUMERIC), result
+
+#-----------------------------------------
+
+# The model factory interface (configure, update_parameters, values, results) on the open-source HiGHS solver
+# through scipy.optimize.milp. Needs no Gurobi license, so sweeps can run on any worker.
+class HighsModel:
+
+    def __init__(self, params, time_periods=None, units_per_employee=800, compact=False):
+        self.params = params
+        self.time_periods = list(time_periods) if time_periods is not None else list(range(1, 7))
+        self.units_per_employee = units_per_employee
+        self.compact = compact
+        self.enabled = {}
+        self.form = None
+        self.status = None
+        self.x = None
+        self.objective_value = None
+        self.bound = None
+        self.mip_gap = None
+        self.node_count = None
+        self.build_time = None
+        self.solve_time = None
+
+    @classmethod
+    def for_model_type(cls, params, model_type, time_periods=None, compact=False):
+        options = MODEL_OPTIONS[model_type]
+        model = cls(params, time_periods=time_periods if time_periods is not None else options['time_periods'], units_per_employee=options['units_per_employee'], compact=compact)
+        model.configure(second_shift=options['second_shift'], backorders=options['backorders'])
+        return model
+
+    def configure(self, second_shift=False, backorders=False):
+        self.enabled = {feature: True for feature, wanted in [('second_shift', second_shift), ('backorders', backorders)] if wanted}
+
+    # scipy.optimize.milp has no incremental interface: the formulation is rebuilt at the next solve
+    def update_parameters(self, params, warm_start=True):
+        self.params = params
+
+    # The same formulation as the Gurobi model factory with the enabled features. The formulation is rebuilt
+    # for every solve, so the compact core can also merge the capacity rows when there is no second shift.
+    def formulation(self):
+        data = compile_arrays(self.params, self.time_periods)
+        name = "Multi_Period_Model" if len(self.time_periods) > 1 else "Single_Period_Model"
+        form = Formulation(name + "".join(FEATURE_SUFFIX[f] for f in FEATURES if f in self.enabled))
+        add_core(form, data, units_per_employee=self.units_per_employee, compact=self.compact, single_shift=self.compact and 'second_shift' not in self.enabled)
+        for feature in FEATURES:
+            if feature in self.enabled:
+                FEATURES[feature](form, data)
+        return form
+
+    #-----------------------------------------
+
+    # Solve with HiGHS (see solve_milp). scipy does not expose the HiGHS thread count, so threads is accepted for
+    # interface parity only. The formulation is built here, so its time is kept apart in build_time.
+    def solve(self, time_limit=None, threads=None, mip_gap=1e-4):
+        start = time.perf_counter()
+        form = self.form = self.formulation()
+        self.build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        self.status, result = solve_milp(form, time_limit=time_limit, mip_gap=mip_gap)
+        self.solve_time = time.perf_counter() - start
+        self.x = result.x
+        self.objective_value = -result.fun if result.x is not None else None
+        self.bound = -result.mip_dual_bound if getattr(result, 'mip_dual_bound', None) is not None else self.objective_value
+        self.mip_gap = getattr(result, 'mip_gap', None)
+        self.node_count = getattr(result, 'mip_node_count', None)
+        return self.status
+
+    # Constraint check of the solution, from the slacks of all rows computed in one sparse product
+    def constraint_report(self, tolerance=SENSE_TOLERANCE):
+        form = self.form
+        slack = form.rhs - form.A @ self.x
+        return {'constraints_checked': form.num_constrs, 'constraint_violations': constraint_violations(form.constr_names, form.sense, form.rhs, slack, tolerance)}
+
+    #-----------------------------------------
+
+    @property
+    def block_items(self):
+        return self.form.block_items
+
+    # Solution values of a variable block, shaped (items, periods)
+    def values(self, name):
+        return self.x[self.form.var_blocks[name]]
+
+    # Solution of every result block as an (items, periods) array
+    def solution_arrays(self):
+        return {name: self.x[self.form.var_blocks[name]] for name in RESULT_BLOCKS + FEATURE_RESULT_BLOCKS if name in self.form.var_blocks}
+
+    # Results in the layout of the run_model_* functions
+    def results(self):
+        return {'objective_value': self.objective_value, **solution_to_results(self.form, self.x)}
+
+    # Objective of the solution split by period; sums to the objective value
+    def period_objective(self):
+        contribution = self.form.obj * self.x
+        return sum(contribution[index].sum(axis=0) for index in self.form.own_blocks().values())
+
+#-----------------------------------------
+
+# Solver backends with the model factory interface
+BACKENDS = {
+    'gurobi': ModelFactory,
+    'highs': HighsModel,
+}
@@ -0,0 +1,141 @@
+import time
+import numpy as np
+import gurobipy as gp
+from gurobipy import GRB
+from parameters import parameter_set_1
+from matrix_models import build_matrix_model
+
+# (number of suture types, number of periods) grid of the benchmark
+SIZES = [(12, 6), (24, 12), (48, 26), (100, 52), (150, 104)]
+
+#-----------------------------------------
+
+# Grow parameter set 1 to n_sutures suture types (each with its own raw material) over n_periods periods
+def scale_parameters(params, n_sutures, n_periods):
+    base = list(params['Demand'])
+    sutures = [base[k % len(base)] if k < len(base) else f"{base[k % len(base)]}_{k}" for k in range(n_sutures)]
+    origin = {s: base[k % len(base)] for k, s in enumerate(sutures)}
+    factor = n_sutures / len(base)
+
+    scaled = dict(params)
+    for key in ['InitialInventory', 'BatchSize', 'SafetyStock', 'Price', 'ProdCost', 'PackagingCost', 'MaxFinishedInventory']:
+        scaled[key] = {s: params[key][origin[s]] for s in sutures}
+    for key in ['InitialRawInventory', 'Cost_r', 'MaxRawInventory', 'MinRawInventory']:
+        scaled[key] = {s + '_raw': params[key][origin[s] + '_raw'] for s in sutures}
+    for key in ['MaxCapacity', 'MaxCapacity_m', 'MaxPackagingCapacity', 'MaxEmployees']:
+        scaled[key] = {k: v * factor for k, v in params[key].items()}
+    scaled['Demand'] = {s: np.resize(params['Demand'][origin[s]], n_periods).tolist() for s in sutures}
+    return scaled
+
+#-----------------------------------------
+
+# Reference: the multi-period model built the way the run_model_* builders do it, one addConstr per row
+def build_loop_model(params, time_periods):
+    suture_types = list(params['Demand'])
+    raw_material_types = list(params['InitialRawInventory'])
+    needle_types = list(params['InitialNeedleInventory'])
+    production_lines = list(params['MaxCapacity'])
+    machines = list(params['MaxCapacity_m'])
+    packaging_lines = list(params['MaxPackagingCapacity'])
+    suture_to_raw_material = {s: s + '_raw' for s in suture_types}
+    Demand = params['Demand']
+    StorageCost = params['StorageCost']
+    sterilization = {s: params['SterilizationCost']['B' if s in ['silk', 'polyester'] else 'A'] for s in suture_types}
+
+    model = gp.Model("Multi_Period_Model")
+
+    I_raw = model.addVars(raw_material_types, time_periods, vtype=GRB.CONTINUOUS, name="RawInventory", lb=0)
+    I_needles = model.addVars(needle_types, time_periods, vtype=GRB.CONTINUOUS, name="NeedleInventory", lb=0)
+    I_finished = model.addVars(suture_types, time_periods, vtype=GRB.CONTINUOUS, name="FinishedInventory", lb=0)
+    Q_raw = model.addVars(raw_material_types, time_periods, vtype=GRB.INTEGER, name="OrderQuantityRaw", lb=0)
+    Q_needles = model.addVars(needle_types, time_periods, vtype=GRB.INTEGER, name="OrderQuantityNeedles", lb=0)
+    D = model.addVars(suture_types, time_periods, vtype=GRB.INTEGER, name="Shipping", lb=0)
+    P_preparation = model.addVars(suture_types, time_periods, vtype=GRB.INTEGER, name="Preparation", lb=0)
+    P_cutting = model.addVars(suture_types, time_periods, vtype=GRB.INTEGER, name="Cutting", lb=0)
+    P_needle_attachment = model.addVars(suture_types, time_periods, vtype=GRB.INTEGER, name="NeedleAttachment", lb=0)
+    P_packaging = model.addVars(suture_types, time_periods, vtype=GRB.INTEGER, name="Packaging", lb=0)
+    P_sterilization = model.addVars(suture_types, time_periods, vtype=GRB.INTEGER, name="Sterilization", lb=0)
+    B = model.addVars(suture_types, time_periods, vtype=GRB.INTEGER, name="Batch", lb=0)
+    M = model.addVars(machines, time_periods, vtype=GRB.BINARY, name="MachineOp")
+    E = model.addVars(production_lines, time_periods, vtype=GRB.INTEGER, name="Employees", lb=0, ub=params['MaxEmployees'])
+    K = model.addVars(packaging_lines, time_periods, vtype=GRB.BINARY, name="PackLinesOp")
+
+    model.setObjective(gp.quicksum(params['Price'][s] * D[s, t] for s in suture_types for t in time_periods)
+                       - gp.quicksum(params['ProdCost'][s] * P_preparation[s, t] + params['CuttingCost'] * P_cutting[s, t] + params['PackagingCost'][s] * P_packaging[s, t] + sterilization[s] * P_sterilization[s, t] + StorageCost * I_finished[s, t] for s in suture_types for t in time_periods)
+                       - gp.quicksum(params['Cost_r'][r] * Q_raw[r, t] + StorageCost * I_raw[r, t] for r in raw_material_types for t in time_periods)
+                       - gp.quicksum(params['NeedleCost'][n] * Q_needles[n, t] + StorageCost * I_needles[n, t] for n in needle_types for t in time_periods)
+                       - gp.quicksum(params['LaborCost'][l] * E[l, t] for l in production_lines for t in time_periods), GRB.MAXIMIZE)
+
+    for t in time_periods:
+        for l in production_lines:
+            model.addConstr(gp.quicksum(P_preparation[s, t] for s in suture_types) <= params['MaxCapacity'][l], name=f"ProdCap_{l}_{t}")
+        for m in machines:
+            model.addConstr(gp.quicksum(P_preparation[s, t] for s in suture_types) <= M[m, t] * params['MaxCapacity_m'][m], name=f"MachCap_{m}_{t}")
+        for s in suture_types:
+            model.addConstr(B[s, t] * params['BatchSize'][s] == P_preparation[s, t], name=f"Batch_{s}_{t}")
+            previous = params['InitialInventory'][s] if t == time_periods[0] else I_finished[s, t-1]
+            model.addConstr(I_finished[s, t] == previous + P_sterilization[s, t] - D[s, t], name=f"InvBal_{s}_{t}")
+        for r in raw_material_types:
+            previous = params['InitialRawInventory'][r] if t == time_periods[0] else I_raw[r, t-1]
+            model.addConstr(I_raw[r, t] == previous + Q_raw[r, t] - gp.quicksum(P_preparation[s, t] for s in suture_types if suture_to_raw_material[s] == r), name=f"RawInv_{r}_{t}")
+        for n in needle_types:
+            previous = params['InitialNeedleInventory'][n] if t == time_periods[0] else I_needles[n, t-1]
+            model.addConstr(I_needles[n, t] == previous + Q_needles[n, t] - gp.quicksum(P_needle_attachment[s, t] for s in suture_types), name=f"NeedleInv_{n}_{t}")
+        for r in raw_material_types:
+            model.addConstr(I_raw[r, t] >= params['MinRawInventory'][r], name=f"MinRawInv_{r}_{t}")
+            model.addConstr(I_raw[r, t] <= params['MaxRawInventory'][r], name=f"MaxRawInventory_{r}_{t}")
+        for n in needle_types:
+            model.addConstr(I_needles[n, t] >= params['MinNeedleInventory'][n], name=f"MinNeedleInv_{n}_{t}")
+            model.addConstr(I_needles[n, t] <= params['MaxNeedleInventory'][n], name=f"MaxNeedleInventory_{n}_{t}")
+        for s in suture_types:
+            model.addConstr(I_finished[s, t] >= params['SafetyStock'][s], name=f"MinFinInv_{s}_{t}")
+            model.addConstr(I_finished[s, t] <= params['MaxFinishedInventory'][s], name=f"MaxFinishedInventory_{s}_{t}")
+            model.addConstr(D[s, t] == Demand[s][t-1], name=f"Demand_{s}_{t}")
+            model.addConstr(P_cutting[s, t] == P_preparation[s, t], name=f"Cutting_{s}_{t}")
+            model.addConstr(P_needle_attachment[s, t] == P_cutting[s, t], name=f"NeedleAttach_{s}_{t}")
+            model.addConstr(P_packaging[s, t] == P_needle_attachment[s, t], name=f"PackReq_{s}_{t}")
+            model.addConstr(P_sterilization[s, t] == P_packaging[s, t], name=f"Sterilization_{s}_{t}")
+        for l in production_lines:
+            model.addConstr(E[l, t] >= gp.quicksum(P_preparation[s, t] for s in suture_types) / 800, name=f"Staff_{l}_{t}")
+            model.addConstr(E[l, t] <= params['MaxEmployees'][l], name=f"MaxEmployees_{l}_{t}")
+        for p in packaging_lines:
+            model.addConstr(gp.quicksum(P_packaging[s, t] for s in suture_types) <= K[p, t] * params['MaxPackagingCapacity'][p], name=f"PackCap_{p}_{t}")
+        for m in machines:
+            model.addConstr(M[m, t] <= 1, name=f"BinaryMach_{m}_{t}")
+
+    model.update()
+    return model
+
+#-----------------------------------------
+
+def benchmark_build(sizes=SIZES):
+    rows = []
+    for n_sutures, n_periods in sizes:
+        params = scale_parameters(parameter_set_1, n_sutures, n_periods)
+        time_periods = list(range(1, n_periods + 1))
+
+        start = time.perf_counter()
+        loop_model = build_loop_model(params, time_periods)
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matrix_model, _, _ = build_matrix_model(params, "multi_period", time_periods=time_periods)
+        matrix_model.update()
+        matrix_time = time.perf_counter() - start
+
+        # Both builders must produce the same model
+        assert (loop_model.NumVars, loop_model.NumConstrs, loop_model.NumNZs) == (matrix_model.NumVars, matrix_model.NumConstrs, matrix_model.NumNZs)
+
+        rows.append((n_sutures, n_periods, matrix_model.NumVars, matrix_model.NumConstrs, matrix_model.NumNZs, loop_time, matrix_time))
+        loop_model.dispose()
+        matrix_model.dispose()
+
+    print(f"{'SKUs':>5} {'periods':>7} {'vars':>8} {'constrs':>8} {'nonzeros':>9} {'loop [s]':>9} {'matrix [s]':>10} {'speedup':>7}")
+    for n_sutures, n_periods, num_vars, num_constrs, nnz, loop_time, matrix_time in rows:
+        print(f"{n_sutures:>5} {n_periods:>7} {num_vars:>8} {num_constrs:>8} {nnz:>9} {loop_time:>9.3f} {matrix_time:>10.3f} {loop_time / matrix_time:>7.1f}")
+    return rows
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    benchmark_build()
@@ -0,0 +1,70 @@
+import sys
+import time
+import gurobipy as gp
+from gurobipy import GRB
+from parameters import parameter_set_1
+from benchmark_build import scale_parameters
+from formulation import build_formulation
+from backends import BACKENDS
+
+# (number of suture types, number of periods) grid of the benchmark
+SIZES = [(12, 6), (12, 12), (24, 12), (48, 26), (100, 52)]
+
+# Time limit of every solve; both formulations must reach the same objective
+SOLVE_TIME_LIMIT = 120
+
+#-----------------------------------------
+
+# Model size of the full and the compact formulation
+def model_size(params, model_type, time_periods, compact):
+    form = build_formulation(params, model_type, time_periods=time_periods, with_names=False, compact=compact)
+    return form.num_vars, form.num_constrs, form.A.nnz
+
+# Build and solve time, objective and whether the solve proved optimality; None and the error when the backend cannot solve it
+def solve_time(params, model_type, time_periods, compact, backend):
+    start = time.perf_counter()
+    try:
+        factory = BACKENDS[backend].for_model_type(params, model_type, time_periods=time_periods, compact=compact)
+        if backend == "gurobi":
+            factory.model.Params.OutputFlag = 0
+            factory.model.Params.TimeLimit = SOLVE_TIME_LIMIT
+            factory.model.optimize()
+            status, objective = factory.model.Status, factory.model.ObjVal if factory.model.SolCount else None
+        else:
+            status = factory.solve(time_limit=SOLVE_TIME_LIMIT)
+            objective = factory.objective_value
+    except gp.GurobiError as e:
+        # A size-limited license cannot solve the larger instances
+        return None, str(e), False
+    return time.perf_counter() - start, objective, status == GRB.OPTIMAL
+
+#-----------------------------------------
+
+def benchmark_compact(sizes=SIZES, model_type="multi_period_with_backorder_penalty", backend="gurobi"):
+    rows = []
+    for n_sutures, n_periods in sizes:
+        params = scale_parameters(parameter_set_1, n_sutures, n_periods)
+        time_periods = list(range(1, n_periods + 1))
+        full, compact = model_size(params, model_type, time_periods, False), model_size(params, model_type, time_periods, True)
+        full_time, full_objective, full_optimal = solve_time(params, model_type, time_periods, False, backend)
+        compact_time, compact_objective, compact_optimal = solve_time(params, model_type, time_periods, True, backend)
+        if full_time is None or compact_time is None:
+            print(f"{n_sutures} SKUs x {n_periods} periods not solved: {full_objective if full_time is None else compact_objective}")
+        elif full_optimal and compact_optimal:
+            # Both formulations must give the same optimum, up to the MIP gap
+            assert abs(full_objective - compact_objective) <= 1e-4 * max(1.0, abs(full_objective)), (full_objective, compact_objective)
+        rows.append((n_sutures, n_periods, full, compact, full_time, compact_time, full_optimal and compact_optimal))
+
+    # Solves that stopped at the time limit are marked with *
+    print(f"{'SKUs':>5} {'periods':>7} {'vars':>15} {'constrs':>15} {'nonzeros':>15} {'solve [s]':>16} {'speedup':>7}")
+    for n_sutures, n_periods, full, compact, full_time, compact_time, optimal in rows:
+        sizes = " ".join(f"{f'{a} -> {b}':>15}" for a, b in zip(full, compact))
+        times = f"{f'{full_time:.2f} -> {compact_time:.2f}':>15}{' ' if optimal else '*'} {full_time / compact_time:>7.1f}" if full_time and compact_time else f"{'-':>16} {'-':>7}"
+        print(f"{n_sutures:>5} {n_periods:>7} {sizes} {times}")
+    return rows
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    # python benchmark_compact.py [gurobi|highs]
+    benchmark_compact(backend=sys.argv[1] if len(sys.argv) > 1 else "gurobi")
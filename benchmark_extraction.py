@@ -0,0 +1,70 @@
+import time
+import gurobipy as gp
+from parameters import parameter_set_1
+from benchmark_build import scale_parameters
+from formulation import RESULT_BLOCKS, FEATURE_RESULT_BLOCKS
+from model_factory import ModelFactory
+
+# (number of suture types, number of periods) grid of the benchmark
+SIZES = [(12, 3), (12, 6), (24, 6), (24, 12), (48, 26), (100, 52), (150, 104)]
+
+# Time limit of the solve that provides the solution to extract; any incumbent will do
+SOLVE_TIME_LIMIT = 60
+
+#-----------------------------------------
+
+# Reference: the results of the model factory read with one var.x access per variable, as the legacy builders did
+def loop_results(factory):
+    results = {'objective_value': factory.model.ObjVal}
+    for name in RESULT_BLOCKS + [b for b in FEATURE_RESULT_BLOCKS if b in factory.vars]:
+        results[name] = {item: [var.x for var in row] for item, row in zip(factory.block_items[name], factory.vars[name])}
+    return results
+
+# Best of `repeats` timings of fn()
+def best_time(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+#-----------------------------------------
+
+# Per-variable .x access against ModelFactory.results(), the bulk extraction run_model uses, on the models it builds
+def benchmark_extraction(sizes=SIZES, model_type="multi_period_with_backorder_penalty", repeats=5):
+    rows = []
+    for n_sutures, n_periods in sizes:
+        params = scale_parameters(parameter_set_1, n_sutures, n_periods)
+        try:
+            factory = ModelFactory.for_model_type(params, model_type, time_periods=list(range(1, n_periods + 1)))
+            factory.model.Params.OutputFlag = 0
+            factory.model.Params.TimeLimit = SOLVE_TIME_LIMIT
+            factory.model.optimize()
+        except gp.GurobiError as e:
+            # A size-limited license cannot solve the larger instances
+            print(f"{n_sutures} SKUs x {n_periods} periods skipped: {e}")
+            continue
+        if factory.model.SolCount == 0:
+            print(f"{n_sutures} SKUs x {n_periods} periods skipped: no solution (status {factory.model.Status})")
+            factory.model.dispose()
+            continue
+
+        # Both extractions must return the same plan
+        assert loop_results(factory) == factory.results()
+
+        loop_time = best_time(lambda: loop_results(factory), repeats)
+        bulk_time = best_time(factory.results, repeats)
+        num_values = sum(factory.vars[name].size for name in factory.solution_arrays())
+        rows.append((n_sutures, n_periods, num_values, loop_time, bulk_time))
+        factory.model.dispose()
+
+    print(f"{'SKUs':>5} {'periods':>7} {'values':>8} {'per-var [ms]':>12} {'bulk [ms]':>9} {'speedup':>7}")
+    for n_sutures, n_periods, num_values, loop_time, bulk_time in rows:
+        print(f"{n_sutures:>5} {n_periods:>7} {num_values:>8} {1000 * loop_time:>12.3f} {1000 * bulk_time:>9.3f} {loop_time / bulk_time:>7.1f}")
+    return rows
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    benchmark_extraction()
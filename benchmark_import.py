@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import time
+
+# Commands of the benchmark: CLI invocations and module imports, each run in a fresh interpreter
+COMMANDS = {
+    "main.py --help": ["main.py", "--help"],
+    "main.py list": ["main.py", "list"],
+    "main.py validate": ["main.py", "validate"],
+    "import main": ["-c", "import main"],
+    "import parameter_schema": ["-c", "import parameter_schema"],
+    "import models": ["-c", "import models"],
+    "import scenario_analysis": ["-c", "import scenario_analysis"],
+    "import matplotlib.pyplot": ["-c", "import matplotlib.pyplot"],
+}
+
+# Heavy modules whose import the CLI should only pay when a command needs them
+HEAVY_MODULES = ["gurobipy", "matplotlib", "scipy", "numpy"]
+
+#-----------------------------------------
+
+# Best wall time of `repeats` fresh interpreters running the command, including interpreter startup
+def startup_time(arguments, repeats):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+# Heavy modules loaded by importing a module
+def loaded_modules(module):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    script = f"import sys, {module}; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", script], cwd=directory, capture_output=True, text=True, check=True).stdout
+    return output.split()
+
+#-----------------------------------------
+
+def benchmark_import(commands=COMMANDS, repeats=5):
+    baseline = startup_time(["-c", "pass"], repeats)
+    rows = [(name, startup_time(arguments, repeats)) for name, arguments in commands.items()]
+
+    print(f"Interpreter startup: {1000 * baseline:.0f} ms")
+    print(f"{'command':<28} {'wall [ms]':>9} {'over startup [ms]':>17}")
+    for name, seconds in rows:
+        print(f"{name:<28} {1000 * seconds:>9.0f} {1000 * (seconds - baseline):>17.0f}")
+    print(f"Heavy modules loaded by main.py: {', '.join(loaded_modules('main')) or 'none'}")
+    return rows
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    benchmark_import()
@@ -0,0 +1,163 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# (suture types, raw materials, lines, periods) grid of the benchmark, from the hand-written sets to a full catalogue
+SIZES = [(12, 12, 2, 6), (24, 24, 2, 12), (48, 48, 3, 26), (100, 100, 4, 52), (200, 200, 6, 52)]
+
+# run_model_* variant of every model type
+MODEL_TYPES = ["single_period", "multi_period", "multi_period_with_second_shift", "multi_period_with_backorder_penalty"]
+
+# Time limit of every solve; solves that stop at it keep their time and gap
+SOLVE_TIME_LIMIT = 60
+
+# Directory of the stored benchmark runs
+BENCHMARK_DIR = "benchmarks"
+
+# A metric regresses when it grows by more than REGRESSION_FACTOR and by more than its noise floor
+REGRESSION_FACTOR = 1.25
+NOISE_FLOOR = {'build_time': 0.05, 'solve_time': 0.5, 'extraction_time': 0.02, 'peak_memory_mb': 20.0}
+METRICS = list(NOISE_FLOOR)
+
+#-----------------------------------------
+
+# Silence the solver log of a benchmark process at the file descriptor, where Gurobi writes it
+@contextlib.contextmanager
+def quiet():
+    sys.stdout.flush()
+    saved, devnull = os.dup(1), os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+        os.close(devnull)
+
+# One run_model_* variant on one generated instance. Runs in a fresh process, so the peak resident memory of the
+# process (solver included) belongs to this case alone.
+def run_case(model_type, size, seed=0, backend="gurobi", time_limit=SOLVE_TIME_LIMIT):
+    import resource
+    from instance_generator import generate_parameters
+    from models import run_model_single_period, run_model_multi_period, run_model_with_second_shift, run_model_with_backorder_penalty
+    n_sutures, n_raws, n_lines, n_periods = size
+    time_periods = list(range(1, n_periods + 1))
+    params = generate_parameters(n_sutures, n_periods, n_raws=n_raws, n_lines=n_lines, seed=seed)
+
+    record = {}
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as directory, quiet():
+        try:
+            if model_type == "single_period":
+                results = run_model_single_period(params, directory, 1, backend=backend, telemetry=record)
+            else:
+                run = {"multi_period": run_model_multi_period, "multi_period_with_second_shift": run_model_with_second_shift,
+                       "multi_period_with_backorder_penalty": run_model_with_backorder_penalty}[model_type]
+                results = run(params, time_limit, directory, 1, backend=backend, time_periods=time_periods, telemetry=record)
+            record['objective_value'] = results['objective_value']
+        except Exception as e:
+            # Time limits keep the statistics of their solve; a size-limited license stops before it
+            record['error'] = str(e)
+    record.pop('gap_history', None)
+    record.update(model_type=model_type, size=list(size), seed=seed, backend=backend, total_time=time.perf_counter() - start,
+                  peak_memory_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+    return record
+
+#-----------------------------------------
+
+def _environment(backend, seed):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    environment = {'created': datetime.now().isoformat(timespec='seconds'), 'commit': commit, 'python': platform.python_version(),
+                   'machine': platform.machine(), 'cpu_count': os.cpu_count(), 'backend': backend, 'seed': seed, 'time_limit': SOLVE_TIME_LIMIT}
+    if backend == "gurobi":
+        import gurobipy as gp
+        environment['gurobi'] = ".".join(map(str, gp.gurobi.version()))
+    return environment
+
+def _key(record):
+    return record['model_type'], tuple(record['size']), record['backend']
+
+# Every model type on every size, one fresh process per case and one case at a time so the timings don't interfere
+def benchmark_scaling(sizes=SIZES, model_types=MODEL_TYPES, backend="gurobi", seed=0, output=None):
+    records = []
+    print(f"{'model type':<36} {'size':>16} {'vars':>7} {'build [s]':>9} {'solve [s]':>9} {'extract [s]':>11} {'memory [MB]':>11} {'objective':>12}")
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+        for size in sizes:
+            for model_type in model_types:
+                record = executor.submit(run_case, model_type, size, seed=seed, backend=backend).result()
+                records.append(record)
+                times = " ".join(f"{record[key]:>{width}.3f}" if record.get(key) is not None else f"{'-':>{width}}" for key, width in
+                                 [('build_time', 9), ('solve_time', 9), ('extraction_time', 11)])
+                objective = f"{record['objective_value']:.2f}" if 'objective_value' in record else record.get('error', '')[:40]
+                print(f"{model_type:<36} {'x'.join(map(str, size)):>16} {record.get('num_vars', 0):>7} {times} {record['peak_memory_mb']:>11.1f} {objective:>12}")
+
+    run = {'environment': _environment(backend, seed), 'records': records}
+    if output is None:
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        output = os.path.join(BENCHMARK_DIR, f"scaling-{datetime.now().strftime('%Y-%m-%d-%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=4)
+    print(f"Benchmark saved in {output}")
+    return run
+
+#-----------------------------------------
+
+# Regressions of a benchmark run against a stored baseline: metrics that grew by more than factor (and their noise
+# floor) and optimal objectives that changed, for every case in both runs
+def compare_benchmarks(baseline, current, factor=REGRESSION_FACTOR):
+    if isinstance(baseline, str):
+        with open(baseline) as f:
+            baseline = json.load(f)
+    if isinstance(current, str):
+        with open(current) as f:
+            current = json.load(f)
+    reference = {_key(record): record for record in baseline['records']}
+    regressions = []
+    for record in current['records']:
+        before = reference.get(_key(record))
+        if before is None:
+            continue
+        for metric in METRICS:
+            old, new = before.get(metric), record.get(metric)
+            if old is not None and new is not None and new > factor * old and new - old > NOISE_FLOOR[metric]:
+                regressions.append((record['model_type'], record['size'], metric, old, new))
+        # Incumbents of solves stopped at the time limit are not comparable
+        old, new = before.get('objective_value'), record.get('objective_value')
+        optimal = before.get('status') == record.get('status') == 2
+        if optimal and old is not None and new is not None and abs(new - old) > 1e-4 * max(1.0, abs(old)):
+            regressions.append((record['model_type'], record['size'], 'objective_value', old, new))
+
+    for model_type, size, metric, old, new in regressions:
+        print(f"Regression {model_type} {'x'.join(map(str, size))} {metric}: {old:.3f} -> {new:.3f}")
+    if not regressions:
+        print(f"No regressions against the baseline ({baseline['environment'].get('commit')}, {baseline['environment'].get('created')})")
+    return regressions
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build, solve, extraction time and peak memory of every run_model_* variant on generated instances")
+    parser.add_argument("--sizes", nargs="+", metavar="NxMxLxT", help="suture types x raw materials x lines x periods (default: SIZES)")
+    parser.add_argument("--model-types", nargs="+", choices=MODEL_TYPES, default=MODEL_TYPES)
+    parser.add_argument("--backend", choices=["gurobi", "highs"], default="gurobi")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help=f"benchmark file (default: {BENCHMARK_DIR}/scaling-<time>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="stored benchmark to check for regressions; exits with 1 on a regression")
+    args = parser.parse_args()
+
+    sizes = [tuple(int(n) for n in size.split("x")) for size in args.sizes] if args.sizes else SIZES
+    run = benchmark_scaling(sizes, args.model_types, backend=args.backend, seed=args.seed, output=args.output)
+    if args.compare and compare_benchmarks(args.compare, run):
+        sys.exit(1)
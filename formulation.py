@@ -0,0 +1,387 @@
+import numpy as np
+
+#-----------------------------------------
+
+# Sutures sterilized with method B, all other sutures use method A
+STERILIZATION_B = ['silk', 'polyester']
+
+# Switches of the shared formulation for each model type
+MODEL_OPTIONS = {
+    'single_period': {'time_periods': [1], 'second_shift': False, 'backorders': False, 'demand_sense': '=', 'units_per_employee': 700, 'name': 'Single_Period_Model'},
+    'multi_period': {'time_periods': list(range(1, 7)), 'second_shift': False, 'backorders': False, 'demand_sense': '=', 'units_per_employee': 800, 'name': 'Multi_Period_Model'},
+    'multi_period_with_second_shift': {'time_periods': list(range(1, 7)), 'second_shift': True, 'backorders': False, 'demand_sense': '<', 'units_per_employee': 800, 'name': 'Multi_Period_Model_With_Second_Shift'},
+    'multi_period_with_backorder_penalty': {'time_periods': list(range(1, 7)), 'second_shift': False, 'backorders': True, 'demand_sense': '<', 'units_per_employee': 800, 'name': 'Multi_Period_Model_With_Backorder_Penalty'},
+}
+
+# Stages and inventories reported for every model type, in the order of the legacy results
+RESULT_BLOCKS = ['Preparation', 'Cutting', 'NeedleAttachment', 'Packaging', 'Sterilization', 'Shipping', 'RawInventory', 'NeedleInventory', 'FinishedInventory']
+FEATURE_RESULT_BLOCKS = ['SecondShift', 'Shortage']
+
+#-----------------------------------------
+
+# Backorder cost per unit of unmet demand when a parameter set has no ShortageCost
+DEFAULT_SHORTAGE_COST = 4.0
+
+# ShortageCost as a number; older parameter files stored it as a set ({4})
+def shortage_cost(params):
+    value = params.get('ShortageCost', DEFAULT_SHORTAGE_COST)
+    if isinstance(value, (set, frozenset, list, tuple)):
+        value = next(iter(value))
+    return float(value)
+
+#-----------------------------------------
+
+# Turn the parameter dict into dense arrays ordered by the index lists of the model.
+# A compiled ParameterSet (parameter_schema.py) already holds them.
+def compile_arrays(params, time_periods):
+    if hasattr(params, 'compile'):
+        return params.compile(time_periods)
+    sutures = list(params['Demand'])
+    raws = list(params['InitialRawInventory'])
+    needles = list(params['InitialNeedleInventory'])
+    lines = list(params['MaxCapacity'])
+    machines = list(params['MaxCapacity_m'])
+    pack_lines = list(params['MaxPackagingCapacity'])
+
+    def vector(key, keys):
+        return np.array([params[key][k] for k in keys], dtype=float)
+
+    raw_position = {r: i for i, r in enumerate(raws)}
+    periods = np.asarray(time_periods)
+    sterilization = params['SterilizationCost']
+
+    return {
+        'sutures': sutures, 'raws': raws, 'needles': needles, 'lines': lines, 'machines': machines, 'pack_lines': pack_lines,
+        'time_periods': list(time_periods),
+        'raw_of': np.array([raw_position[s + '_raw'] for s in sutures]),
+        'InitialInventory': vector('InitialInventory', sutures),
+        'InitialRawInventory': vector('InitialRawInventory', raws),
+        'InitialNeedleInventory': vector('InitialNeedleInventory', needles),
+        'MaxCapacity': vector('MaxCapacity', lines),
+        'MaxCapacity_m': vector('MaxCapacity_m', machines),
+        'BatchSize': vector('BatchSize', sutures),
+        'MaxEmployees': vector('MaxEmployees', lines),
+        'MaxPackagingCapacity': vector('MaxPackagingCapacity', pack_lines),
+        'SafetyStock': vector('SafetyStock', sutures),
+        'Demand': np.array([params['Demand'][s] for s in sutures], dtype=float)[:, periods - 1],
+        'Price': vector('Price', sutures),
+        'ProdCost': vector('ProdCost', sutures),
+        'LaborCost': vector('LaborCost', lines),
+        'Cost_r': vector('Cost_r', raws),
+        'NeedleCost': vector('NeedleCost', needles),
+        'PackagingCost': vector('PackagingCost', sutures),
+        'StorageCost': float(params['StorageCost']),
+        'SterilizationCost': np.array([sterilization['B'] if s in STERILIZATION_B else sterilization['A'] for s in sutures], dtype=float),
+        'CuttingCost': float(params['CuttingCost']),
+        'MaxRawInventory': vector('MaxRawInventory', raws),
+        'MaxNeedleInventory': vector('MaxNeedleInventory', needles),
+        'MinRawInventory': vector('MinRawInventory', raws),
+        'MinNeedleInventory': vector('MinNeedleInventory', needles),
+        'MaxFinishedInventory': vector('MaxFinishedInventory', sutures),
+        'ShortageCost': shortage_cost(params),
+    }
+
+#-----------------------------------------
+
+# Standard form of a maximisation MILP: columns and rows are added block-wise from index arrays
+# and the constraint matrix is assembled from COO triplets in one go
+class Formulation:
+
+    def __init__(self, name, with_names=True):
+        self.name = name
+        self.with_names = with_names
+        self.var_blocks = {}
+        self.block_items = {}
+        self.aliases = {}
+        self.constr_blocks = {}
+        self.lb = np.zeros(0)
+        self.ub = np.zeros(0)
+        self.obj = np.zeros(0)
+        self.vtype = np.zeros(0, dtype='<U1')
+        self.var_names = []
+        self.sense = np.zeros(0, dtype='<U1')
+        self.rhs = np.zeros(0)
+        self.constr_names = []
+        self._rows = []
+        self._cols = []
+        self._vals = []
+        self._A = None
+
+    @property
+    def num_vars(self):
+        return len(self.lb)
+
+    @property
+    def num_constrs(self):
+        return len(self.rhs)
+
+    # scipy is only imported once a matrix is needed, so reading parameters stays cheap
+    @property
+    def A(self):
+        if self._A is None:
+            import scipy.sparse as sp
+            rows = np.concatenate(self._rows) if self._rows else np.zeros(0, dtype=int)
+            cols = np.concatenate(self._cols) if self._cols else np.zeros(0, dtype=int)
+            vals = np.concatenate(self._vals) if self._vals else np.zeros(0)
+            self._A = sp.csr_matrix((vals, (rows, cols)), shape=(self.num_constrs, self.num_vars))
+            self._A.sort_indices()
+        return self._A
+
+    # Independent copy, e.g. to extend a shared core with a feature block
+    def copy(self):
+        other = Formulation(self.name, with_names=self.with_names)
+        for attr in ['lb', 'ub', 'obj', 'vtype', 'sense', 'rhs']:
+            setattr(other, attr, getattr(self, attr).copy())
+        for attr in ['var_names', 'constr_names', '_rows', '_cols', '_vals']:
+            setattr(other, attr, list(getattr(self, attr)))
+        for attr in ['var_blocks', 'block_items', 'aliases', 'constr_blocks']:
+            setattr(other, attr, dict(getattr(self, attr)))
+        return other
+
+    # Add a (items x periods) block of variables, named like gurobipy's addVars: Name[item,period]
+    def add_vars(self, name, items, periods, vtype, lb=0.0, ub=np.inf, obj=0.0):
+        shape = (len(items), len(periods))
+        index = np.arange(self.num_vars, self.num_vars + shape[0] * shape[1]).reshape(shape)
+        self.lb = np.concatenate([self.lb, np.broadcast_to(lb, shape).ravel()])
+        self.ub = np.concatenate([self.ub, np.broadcast_to(ub, shape).ravel()])
+        self.obj = np.concatenate([self.obj, np.broadcast_to(obj, shape).ravel()])
+        self.vtype = np.concatenate([self.vtype, np.full(index.size, vtype)])
+        if self.with_names:
+            self.var_names.extend(f"{name}[{i},{t}]" for i in items for t in periods)
+        self.var_blocks[name] = index
+        self.block_items[name] = list(items)
+        self._A = None
+        return index
+
+    # Report a block under another name without new columns, e.g. the stages of the compact formulation
+    def add_alias(self, name, source):
+        self.var_blocks[name] = self.var_blocks[source]
+        self.block_items[name] = self.block_items[source]
+        self.aliases[name] = source
+        return self.var_blocks[name]
+
+    # Variable blocks that own their columns, without the aliases
+    def own_blocks(self):
+        return {name: index for name, index in self.var_blocks.items() if name not in self.aliases}
+
+    # Add a (items x periods) block of rows, named like the legacy builders: Name_item_period
+    def add_constrs(self, name, items, periods, sense, rhs=0.0):
+        shape = (len(items), len(periods))
+        index = np.arange(self.num_constrs, self.num_constrs + shape[0] * shape[1]).reshape(shape)
+        self.sense = np.concatenate([self.sense, np.full(index.size, sense)])
+        self.rhs = np.concatenate([self.rhs, np.broadcast_to(rhs, shape).ravel().astype(float)])
+        if self.with_names:
+            self.constr_names.extend(f"{name}_{i}_{t}" for i in items for t in periods)
+        self.constr_blocks[name] = index
+        self._A = None
+        return index
+
+    # Add coefficients; rows, cols and vals are broadcast against each other
+    def add_terms(self, rows, cols, vals=1.0):
+        rows, cols, vals = np.broadcast_arrays(rows, cols, np.asarray(vals, dtype=float))
+        self._rows.append(rows.ravel())
+        self._cols.append(cols.ravel())
+        self._vals.append(vals.ravel())
+        self._A = None
+
+#-----------------------------------------
+
+# Stages after preparation; every unit passes all of them in the same period
+STAGES = ['Cutting', 'NeedleAttachment', 'Packaging', 'Sterilization']
+
+#-----------------------------------------
+
+# Variables and constraints shared by every model type.
+# compact=True builds the same model with fewer columns and rows: the stage chain is one production variable that is
+# reported under every stage name, BinaryMach is dropped (MachineOp is binary) and the single-variable inventory limits
+# become variable bounds. single_shift=True (only when no second shift is added later) also merges the ProdCap rows of
+# all lines, which share their left-hand side, into the tightest one, and drops MaxEmployees, a copy of the bound of E.
+def add_core(form, data, units_per_employee=800, demand_sense='=', compact=False, single_shift=False):
+    sutures, raws, needles = data['sutures'], data['raws'], data['needles']
+    lines, machines, pack_lines, periods = data['lines'], data['machines'], data['pack_lines'], data['time_periods']
+    storage = data['StorageCost']
+
+    if compact:
+        I_raw = form.add_vars("RawInventory", raws, periods, 'C', lb=data['MinRawInventory'][:, None], ub=data['MaxRawInventory'][:, None], obj=-storage)
+        I_needles = form.add_vars("NeedleInventory", needles, periods, 'C', lb=data['MinNeedleInventory'][:, None], ub=data['MaxNeedleInventory'][:, None], obj=-storage)
+        I_finished = form.add_vars("FinishedInventory", sutures, periods, 'C', lb=data['SafetyStock'][:, None], ub=data['MaxFinishedInventory'][:, None], obj=-storage)
+    else:
+        I_raw = form.add_vars("RawInventory", raws, periods, 'C', obj=-storage)
+        I_needles = form.add_vars("NeedleInventory", needles, periods, 'C', obj=-storage)
+        I_finished = form.add_vars("FinishedInventory", sutures, periods, 'C', obj=-storage)
+    Q_raw = form.add_vars("OrderQuantityRaw", raws, periods, 'I', obj=-data['Cost_r'][:, None])
+    Q_needles = form.add_vars("OrderQuantityNeedles", needles, periods, 'I', obj=-data['NeedleCost'][:, None])
+    D = form.add_vars("Shipping", sutures, periods, 'I', obj=data['Price'][:, None])
+
+    if compact:
+        unit_cost = data['ProdCost'] + data['CuttingCost'] + data['PackagingCost'] + data['SterilizationCost']
+        P_preparation = form.add_vars("Preparation", sutures, periods, 'I', obj=-unit_cost[:, None])
+        P_cutting, P_needle_attachment, P_packaging, P_sterilization = [form.add_alias(stage, "Preparation") for stage in STAGES]
+    else:
+        P_preparation = form.add_vars("Preparation", sutures, periods, 'I', obj=-data['ProdCost'][:, None])
+        P_cutting = form.add_vars("Cutting", sutures, periods, 'I', obj=-data['CuttingCost'])
+        P_needle_attachment = form.add_vars("NeedleAttachment", sutures, periods, 'I')
+        P_packaging = form.add_vars("Packaging", sutures, periods, 'I', obj=-data['PackagingCost'][:, None])
+        P_sterilization = form.add_vars("Sterilization", sutures, periods, 'I', obj=-data['SterilizationCost'][:, None])
+
+    B = form.add_vars("Batch", sutures, periods, 'I')
+    M = form.add_vars("MachineOp", machines, periods, 'B', ub=1.0)
+    E = form.add_vars("Employees", lines, periods, 'I', ub=data['MaxEmployees'][:, None], obj=-data['LaborCost'][:, None])
+    K = form.add_vars("PackLinesOp", pack_lines, periods, 'B', ub=1.0)
+
+    # Production Capacity: every line row carries the total preparation of the period
+    if single_shift:
+        tightest = int(np.argmin(data['MaxCapacity']))
+        rows = form.add_constrs("ProdCap", lines[tightest:tightest + 1], periods, '<', data['MaxCapacity'][tightest])
+    else:
+        rows = form.add_constrs("ProdCap", lines, periods, '<', data['MaxCapacity'][:, None])
+    form.add_terms(rows[:, :, None], P_preparation.T[None, :, :])
+
+    # Machine Availability
+    rows = form.add_constrs("MachCap", machines, periods, '<')
+    form.add_terms(rows[:, :, None], P_preparation.T[None, :, :])
+    form.add_terms(rows, M, -data['MaxCapacity_m'][:, None])
+
+    # Batch Size
+    rows = form.add_constrs("Batch", sutures, periods, '=')
+    form.add_terms(rows, B, data['BatchSize'][:, None])
+    form.add_terms(rows, P_preparation, -1.0)
+
+    # Inventory balances: stock(t) - stock(t-1) - inflow(t) + outflow(t) = initial stock (first period) or 0
+    first = np.zeros(len(periods))
+    first[0] = 1.0
+
+    rows = form.add_constrs("InvBal", sutures, periods, '=', data['InitialInventory'][:, None] * first)
+    form.add_terms(rows, I_finished)
+    form.add_terms(rows[:, 1:], I_finished[:, :-1], -1.0)
+    form.add_terms(rows, P_sterilization, -1.0)
+    form.add_terms(rows, D)
+
+    rows = form.add_constrs("RawInv", raws, periods, '=', data['InitialRawInventory'][:, None] * first)
+    form.add_terms(rows, I_raw)
+    form.add_terms(rows[:, 1:], I_raw[:, :-1], -1.0)
+    form.add_terms(rows, Q_raw, -1.0)
+    form.add_terms(rows[data['raw_of']], P_preparation)
+
+    rows = form.add_constrs("NeedleInv", needles, periods, '=', data['InitialNeedleInventory'][:, None] * first)
+    form.add_terms(rows, I_needles)
+    form.add_terms(rows[:, 1:], I_needles[:, :-1], -1.0)
+    form.add_terms(rows, Q_needles, -1.0)
+    form.add_terms(rows[:, :, None], P_needle_attachment.T[None, :, :])
+
+    # Minimum and maximum inventory limits for raw materials, needles and finished goods
+    if not compact:
+        add_inventory_limits(form, data)
+
+    # Staffing Levels
+    rows = form.add_constrs("Staff", lines, periods, '>')
+    form.add_terms(rows, E)
+    form.add_terms(rows[:, :, None], P_preparation.T[None, :, :], -1.0 / units_per_employee)
+    if not single_shift:
+        form.add_terms(form.add_constrs("MaxEmployees", lines, periods, '<', data['MaxEmployees'][:, None]), E)
+
+    # Demand Fulfillment
+    form.add_terms(form.add_constrs("Demand", sutures, periods, demand_sense, data['Demand']), D)
+
+    # Packaging Line Capacity
+    rows = form.add_constrs("PackCap", pack_lines, periods, '<')
+    form.add_terms(rows[:, :, None], P_packaging.T[None, :, :])
+    form.add_terms(rows, K, -data['MaxPackagingCapacity'][:, None])
+
+    if compact:
+        return
+
+    # Binary Machine Operation
+    form.add_terms(form.add_constrs("BinaryMach", machines, periods, '<', 1.0), M)
+
+    # Multi-stage Production Constraints
+    for name, stage, previous in [("Cutting", P_cutting, P_preparation), ("NeedleAttach", P_needle_attachment, P_cutting),
+                                  ("PackReq", P_packaging, P_needle_attachment), ("Sterilization", P_sterilization, P_packaging)]:
+        rows = form.add_constrs(name, sutures, periods, '=')
+        form.add_terms(rows, stage)
+        form.add_terms(rows, previous, -1.0)
+
+# Inventory limits as rows, as in the legacy builders
+def add_inventory_limits(form, data):
+    sutures, raws, needles, periods = data['sutures'], data['raws'], data['needles'], data['time_periods']
+    I_raw, I_needles, I_finished = form.var_blocks["RawInventory"], form.var_blocks["NeedleInventory"], form.var_blocks["FinishedInventory"]
+    form.add_terms(form.add_constrs("MinRawInv", raws, periods, '>', data['MinRawInventory'][:, None]), I_raw)
+    form.add_terms(form.add_constrs("MinNeedleInv", needles, periods, '>', data['MinNeedleInventory'][:, None]), I_needles)
+    form.add_terms(form.add_constrs("MinFinInv", sutures, periods, '>', data['SafetyStock'][:, None]), I_finished)
+    form.add_terms(form.add_constrs("MaxRawInventory", raws, periods, '<', data['MaxRawInventory'][:, None]), I_raw)
+    form.add_terms(form.add_constrs("MaxNeedleInventory", needles, periods, '<', data['MaxNeedleInventory'][:, None]), I_needles)
+    form.add_terms(form.add_constrs("MaxFinishedInventory", sutures, periods, '<', data['MaxFinishedInventory'][:, None]), I_finished)
+
+#-----------------------------------------
+
+# Second shift: doubles line, machine, packaging and staffing capacity at 1.05 x labor cost.
+# The bilinear terms of the legacy builder (M*S, K*S, E*S) are replaced by exact linearisations.
+# As in the legacy builder, machine and packaging capacity follow the shift of the last production line.
+def add_second_shift(form, data):
+    lines, machines, pack_lines, periods = data['lines'], data['machines'], data['pack_lines'], data['time_periods']
+    M = form.var_blocks["MachineOp"]
+    E = form.var_blocks["Employees"]
+    K = form.var_blocks["PackLinesOp"]
+    max_employees = data['MaxEmployees'][:, None]
+
+    S = form.add_vars("SecondShift", lines, periods, 'B', ub=1.0)
+    MS = form.add_vars("SecondShiftMachineOp", machines, periods, 'C', ub=1.0)
+    KS = form.add_vars("SecondShiftPackLinesOp", pack_lines, periods, 'C', ub=1.0)
+    ES = form.add_vars("SecondShiftEmployees", lines, periods, 'C', obj=-1.05 * data['LaborCost'][:, None])
+    S_last = S[-1][None, :]
+
+    # Capacity rows gain the second shift share
+    form.add_terms(form.constr_blocks["ProdCap"], S, -data['MaxCapacity'][:, None])
+    form.add_terms(form.constr_blocks["MachCap"], MS, -data['MaxCapacity_m'][:, None])
+    form.add_terms(form.constr_blocks["PackCap"], KS, -data['MaxPackagingCapacity'][:, None])
+    form.add_terms(form.constr_blocks["MaxEmployees"], S, -max_employees)
+    form.ub[E.ravel()] = np.inf
+
+    # MS = M * S_last and KS = K * S_last; only the upper envelopes bind since MS and KS only relax capacity
+    for name, product, operated, items in [("LinMach", MS, M, machines), ("LinPack", KS, K, pack_lines)]:
+        rows = form.add_constrs(name + "Op", items, periods, '<')
+        form.add_terms(rows, product)
+        form.add_terms(rows, operated, -1.0)
+        rows = form.add_constrs(name + "Shift", items, periods, '<')
+        form.add_terms(rows, product)
+        form.add_terms(rows, np.broadcast_to(S_last, product.shape), -1.0)
+
+    # ES = E * S; ES is a cost, so the lower envelope ES >= E - 2 * MaxEmployees * (1 - S) is exact
+    rows = form.add_constrs("LinStaffShift", lines, periods, '>', -2 * max_employees)
+    form.add_terms(rows, ES)
+    form.add_terms(rows, E, -1.0)
+    form.add_terms(rows, S, -2 * max_employees)
+
+    form.sense[form.constr_blocks["Demand"].ravel()] = '<'
+
+#-----------------------------------------
+
+# Backorders: unmet demand is tracked in Shortage and penalised with ShortageCost per unit
+def add_backorders(form, data):
+    D = form.var_blocks["Shipping"]
+    Shortage = form.add_vars("Shortage", data['sutures'], data['time_periods'], 'C', obj=-data['ShortageCost'])
+
+    rows = form.add_constrs("Shortage", data['sutures'], data['time_periods'], '=', data['Demand'])
+    form.add_terms(rows, Shortage)
+    form.add_terms(rows, D)
+
+    form.sense[form.constr_blocks["Demand"].ravel()] = '<'
+
+#-----------------------------------------
+
+# Assemble the complete formulation of a model type from the parameter dict; compact=True builds the
+# smaller formulation of add_core with the same optimal objective and the same reported blocks
+def build_formulation(params, model_type, time_periods=None, with_names=True, compact=False):
+    options = MODEL_OPTIONS[model_type]
+    if time_periods is None:
+        time_periods = options['time_periods']
+    data = compile_arrays(params, time_periods)
+
+    form = Formulation(options['name'], with_names=with_names)
+    add_core(form, data, units_per_employee=options['units_per_employee'], demand_sense=options['demand_sense'],
+             compact=compact, single_shift=compact and not options['second_shift'])
+    if options['second_shift']:
+        add_second_shift(form, data)
+    if options['backorders']:
+        add_backorders(form, data)
+    return form
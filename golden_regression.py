@@ -0,0 +1,175 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+from gurobipy import GRB
+import parameters
+from formulation import MODEL_OPTIONS
+from benchmark_scaling import quiet
+
+# Reference runs shipped with the repository: {scenario: results} in the layout of scenario_analysis
+GOLDEN_FILES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Combination-*-FIXED-PROD", "model-*.json")))
+
+# Both runs stop within Gurobi's relative MIPGap, so their objectives may differ by that much
+OBJECTIVE_TOLERANCE = 1e-4
+
+# Units two plans may differ by per entry and still count as the same plan
+PLAN_TOLERANCE = 1e-6
+
+# Alternative optima move batches between periods: the total of every stage over the horizon must stay within this
+# share of the reference total (at least one unit)
+TOTAL_TOLERANCE = 0.05
+
+# Directory of the stored harness runs
+GOLDEN_DIR = "golden"
+
+# Result status of a solve that ended without an optimal solution, by solver status (HiGHS statuses are mapped to
+# Gurobi's); scenarios rejected by the infeasibility screen have no solver status and are infeasible
+SOLVER_STATUS = {None: "infeasible", GRB.INFEASIBLE: "infeasible", GRB.INF_OR_UNBD: "infeasible", GRB.UNBOUNDED: "unbounded", GRB.TIME_LIMIT: "time_limit"}
+
+#-----------------------------------------
+
+# (model type, parameter set name) of a scenario name such as multi_period_with_backorder_penalty_parameter_set_3
+def parse_scenario(scenario):
+    for model_type in sorted(MODEL_OPTIONS, key=len, reverse=True):
+        if scenario.startswith(model_type + "_"):
+            return model_type, scenario[len(model_type) + 1:]
+    raise ValueError(f"Unknown model type in scenario {scenario}")
+
+# Golden cases of the reference files: [(file, scenario, reference results)]
+def golden_cases(files=GOLDEN_FILES):
+    cases = []
+    for path in files:
+        with open(path) as f:
+            for scenario, reference in json.load(f).items():
+                cases.append((path, scenario, reference))
+    return cases
+
+#-----------------------------------------
+
+# Compare a solved scenario with its reference. Returns (passed, details): the status must match, the objective must
+# agree within the MIP gap, the new plan must pass its own validation and every stage must ship the same total
+# within TOTAL_TOLERANCE. Plans that differ entry by entry are reported as alternative optima. Solves stopped at the
+# time limit prove nothing either way: passed is None.
+def compare_results(reference, results):
+    if results.get('status') == "time_limit":
+        return None, {'status': "time_limit", 'reference_status': reference.get('status', 'solved')}
+    if 'objective_value' not in reference or 'objective_value' not in results:
+        same = reference.get('status', 'solved') == results.get('status', 'solved')
+        return same, {'status': results.get('status', 'solved'), 'reference_status': reference.get('status', 'solved')}
+
+    difference = results['objective_value'] - reference['objective_value']
+    details = {'objective_value': results['objective_value'], 'reference_objective': reference['objective_value'], 'objective_difference': difference,
+               'valid': results.get('validation', {}).get('ok'), 'stages': {}}
+    passed = abs(difference) <= OBJECTIVE_TOLERANCE * max(1.0, abs(reference['objective_value'])) and details['valid'] is not False
+
+    identical = True
+    for stage, plan in reference.items():
+        if stage in ('objective_value', 'status') or not isinstance(plan, dict):
+            continue
+        if stage not in results:
+            details['stages'][stage] = {'missing': True}
+            passed = False
+            continue
+        items = list(plan)
+        old = np.array([plan[item] for item in items], dtype=float)
+        new = np.array([results[stage].get(item, [np.nan] * old.shape[1]) for item in items], dtype=float)
+        total_difference = float(np.nansum(new) - old.sum())
+        deviation = float(np.nanmax(np.abs(new - old))) if old.size else 0.0
+        stage_ok = bool(not np.isnan(new).any() and abs(total_difference) <= max(1.0, TOTAL_TOLERANCE * abs(old.sum())))
+        details['stages'][stage] = {'max_deviation': deviation, 'total_difference': total_difference, 'ok': stage_ok}
+        identical = identical and deviation <= PLAN_TOLERANCE
+        passed = passed and stage_ok
+    details['plan'] = "identical" if identical else "alternative optimum"
+    return passed, details
+
+# Solve a scenario like scenario_analysis does. Solves without an optimal solution are {"status": ...} by their
+# solver status (SOLVER_STATUS), e.g. "infeasible" or "time_limit"
+def solve_case(model_type, params, backend="gurobi", time_limit=None, compact=False):
+    from models import run_model
+    record = {}
+    with tempfile.TemporaryDirectory() as directory, quiet():
+        try:
+            results = run_model(params, model_type, time_limit, directory, 1, backend=backend, telemetry=record, compact=compact)
+        except ValueError:
+            results = {"status": SOLVER_STATUS.get(record.get('status'), f"status_{record.get('status')}")}
+    record.pop('gap_history', None)
+    return results, record
+
+#-----------------------------------------
+
+# Re-solve every golden case and compare it with its reference. Scenarios stored in several reference files are
+# solved once. Returns the stored run: environment, and per case the comparison and the stage times.
+def golden_regression(files=GOLDEN_FILES, backend="gurobi", time_limit=None, compact=False, output=None, match=None):
+    cases = [case for case in golden_cases(files) if match is None or match in case[1]]
+    solved, records = {}, []
+    print(f"{'reference':<28} {'scenario':<52} {'objective':>12} {'reference':>12} {'plan':>20} {'total [s]':>9}  result")
+    for path, scenario, reference in cases:
+        if scenario not in solved:
+            model_type, param_name = parse_scenario(scenario)
+            start = time.perf_counter()
+            results, record = solve_case(model_type, getattr(parameters, param_name), backend=backend, time_limit=time_limit, compact=compact)
+            record['total_time'] = time.perf_counter() - start
+            solved[scenario] = results, record
+        results, record = solved[scenario]
+        passed, details = compare_results(reference, results)
+        records.append({'reference': os.path.relpath(path, os.path.dirname(os.path.abspath(__file__))), 'scenario': scenario, 'passed': passed,
+                        **details, 'solver_status': record.get('status'),
+                        **{key: record.get(key) for key in ['build_time', 'solve_time', 'extraction_time', 'validation_time', 'total_time', 'num_vars', 'mip_gap']}})
+        objective = f"{details['objective_value']:.2f}" if 'objective_value' in details else details['status']
+        expected = f"{details['reference_objective']:.2f}" if 'reference_objective' in details else details['reference_status']
+        print(f"{os.path.basename(os.path.dirname(path)):<28} {scenario:<52} {objective:>12} {expected:>12} {details.get('plan', '-'):>20} {record['total_time']:>9.2f}  {'time limit' if passed is None else 'ok' if passed else 'FAIL'}")
+        for stage, stage_details in details.get('stages', {}).items():
+            if not stage_details.get('ok', False):
+                print(f"    {stage}: {stage_details}")
+
+    run = {'environment': {'created': datetime.now().isoformat(timespec='seconds'), 'backend': backend, 'compact': compact, 'time_limit': time_limit},
+           'passed': all(record['passed'] is not False for record in records), 'records': records}
+    if output is None:
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        output = os.path.join(GOLDEN_DIR, f"golden-{datetime.now().strftime('%Y-%m-%d-%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=4)
+    stopped = sum(record['passed'] is None for record in records)
+    print(f"{sum(record['passed'] is True for record in records)}/{len(records)} cases match the references"
+          f"{f', {stopped} stopped at the time limit' if stopped else ''}; run saved in {output}")
+    return run
+
+# Time of every case against an earlier harness run, e.g. before a change to the builders, backends or extraction
+def compare_timing(baseline, run):
+    if isinstance(baseline, str):
+        with open(baseline) as f:
+            baseline = json.load(f)
+    before = {record['scenario']: record for record in baseline['records']}
+    total_before = total_after = 0.0
+    print(f"{'scenario':<52} {'before [s]':>10} {'after [s]':>10} {'speedup':>8}")
+    for scenario in dict.fromkeys(record['scenario'] for record in run['records']):
+        after = next(record for record in run['records'] if record['scenario'] == scenario)
+        if scenario in before and before[scenario].get('total_time') and after.get('total_time'):
+            old, new = before[scenario]['total_time'], after['total_time']
+            total_before, total_after = total_before + old, total_after + new
+            print(f"{scenario:<52} {old:>10.3f} {new:>10.3f} {old / new:>8.2f}")
+    if total_after:
+        print(f"{'total':<52} {total_before:>10.3f} {total_after:>10.3f} {total_before / total_after:>8.2f}")
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-solve the Combination-*-FIXED-PROD reference runs and compare the results")
+    parser.add_argument("--backend", choices=["gurobi", "highs"], default="gurobi")
+    parser.add_argument("--compact", action="store_true", help="solve the compact formulation")
+    parser.add_argument("--time-limit", type=float)
+    parser.add_argument("--match", help="only the scenarios whose name contains this text")
+    parser.add_argument("--output", help=f"run file (default: {GOLDEN_DIR}/golden-<time>.json)")
+    parser.add_argument("--baseline", help="earlier run of this harness to compare the times with")
+    args = parser.parse_args()
+
+    run = golden_regression(backend=args.backend, time_limit=args.time_limit, compact=args.compact, output=args.output, match=args.match)
+    if args.baseline:
+        compare_timing(args.baseline, run)
+    sys.exit(0 if run['passed'] else 1)
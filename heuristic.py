@@ -0,0 +1,177 @@
+import time
+import numpy as np
+from formulation import MODEL_OPTIONS, RESULT_BLOCKS, FEATURE_RESULT_BLOCKS, compile_arrays, build_formulation
+from validation import constraint_violations, check_plan, validation_report
+
+#-----------------------------------------
+
+# Constructive plan of every variable block of a model type, as (items, periods) arrays named like the variable blocks
+# of the formulation. Production is lot-for-lot in whole batches, computed on cumulative requirements for all suture
+# types at once. Periods over capacity are levelled backwards by building batches ahead where the finished goods limit
+# allows; what is left uses the second shift, or is cut from the shipments when the model allows unmet demand.
+def construct_plan(data, model_type):
+    options = MODEL_OPTIONS[model_type]
+    demand = data['Demand']
+    n_sutures, n_periods = demand.shape
+    batch = data['BatchSize'][:, None]
+    safety, max_finished = data['SafetyStock'][:, None], data['MaxFinishedInventory'][:, None]
+    initial = data['InitialInventory'][:, None]
+    upe = options['units_per_employee']
+
+    # Smallest cumulative production in whole batches that keeps finished goods above the safety stock
+    need = np.cumsum(demand, axis=1) + safety - initial
+    batches = np.ceil(np.maximum.accumulate(np.maximum(need, 0.0), axis=1) / batch - 1e-9)
+    preparation = np.diff(batches, axis=1, prepend=0.0) * batch
+
+    # Capacity of one shift: lines, machines, packaging lines and staff all carry the total preparation
+    capacity = min(data['MaxCapacity'].min(), data['MaxCapacity_m'].min(), data['MaxPackagingCapacity'].min(), upe * data['MaxEmployees'].min())
+    capacity = np.full(n_periods, capacity)
+
+    # Backward levelling: move whole batches of an over-capacity period one period earlier
+    def level(preparation, capacity):
+        preparation = preparation.copy()
+        stock = initial + np.cumsum(preparation, axis=1) - np.cumsum(demand, axis=1)
+        for t in range(n_periods - 1, 0, -1):
+            excess = preparation[:, t].sum() - capacity[t]
+            while excess > 1e-9:
+                movable = (preparation[:, t] > 0) & (stock[:, t - 1] + batch[:, 0] <= max_finished[:, 0])
+                if not movable.any():
+                    break
+                sizes = np.where(movable, batch[:, 0], np.inf)
+                covering = np.where(sizes >= excess, sizes, np.inf)
+                s = int(np.argmin(covering)) if np.isfinite(covering).any() else int(np.argmax(np.where(movable, batch[:, 0], -np.inf)))
+                preparation[s, t] -= batch[s, 0]
+                preparation[s, t - 1] += batch[s, 0]
+                stock[s, t - 1] += batch[s, 0]
+                excess -= batch[s, 0]
+        return preparation
+
+    lot_for_lot = preparation
+    preparation = level(lot_for_lot, capacity)
+
+    # Second shift in the periods whose lot-for-lot plan is over capacity, when levelling alone is not enough
+    second_shift = np.zeros(n_periods)
+    if options['second_shift'] and (preparation.sum(axis=0) > capacity + 1e-9).any():
+        second_shift = (lot_for_lot.sum(axis=0) > capacity + 1e-9).astype(float)
+        capacity = capacity * (1 + second_shift)
+        preparation = level(lot_for_lot, capacity)
+
+    # Cut batches of the suture types with the lowest margin from periods that are still over capacity
+    over = preparation.sum(axis=0) - capacity
+    if (over > 1e-9).any():
+        if options['demand_sense'] == '=':
+            raise ValueError(f"Heuristic found no feasible plan: production capacity exceeded in periods {(np.flatnonzero(over > 1e-9) + 1).tolist()}")
+        margin = data['Price'] - data['ProdCost'] - data['CuttingCost'] - data['PackagingCost'] - data['SterilizationCost'] - data['Cost_r'][data['raw_of']]
+        # Batches that must be produced anyway to lift the initial stock to the safety stock
+        minimum = np.ceil(np.maximum(safety - initial, 0.0)[:, 0] / batch[:, 0] - 1e-9)
+        for t in np.flatnonzero(over > 1e-9):
+            for s in np.argsort(margin):
+                spare = preparation[s, :t + 1].sum() / batch[s, 0] - minimum[s]
+                cut = max(0.0, min(np.ceil(over[t] / batch[s, 0] - 1e-9), preparation[s, t] / batch[s, 0], spare))
+                preparation[s, t] -= cut * batch[s, 0]
+                over[t] -= cut * batch[s, 0]
+                if over[t] <= 1e-9:
+                    break
+
+    # Ship as much demand as the stock above the safety stock allows
+    shipping = demand.copy()
+    if options['demand_sense'] != '=':
+        available = initial + np.cumsum(preparation, axis=1) - safety
+        shipped = np.zeros(n_sutures)
+        for t in range(n_periods):
+            shipping[:, t] = np.clip(available[:, t] - shipped, 0.0, demand[:, t])
+            shipped += shipping[:, t]
+    stock = initial + np.cumsum(preparation, axis=1) - np.cumsum(shipping, axis=1)
+    if (stock < safety - 1e-6).any() or (stock > max_finished + 1e-6).any():
+        raise ValueError("Heuristic found no feasible plan: finished goods inventory limits cannot be met")
+
+    # Raw materials and needles are ordered just in time to stay above their minimum inventory
+    def order_up(initial, usage, minimum):
+        orders = np.maximum.accumulate(np.maximum(minimum - initial + np.cumsum(usage, axis=1), 0.0), axis=1)
+        orders = np.ceil(orders - 1e-9)
+        return initial + orders - np.cumsum(usage, axis=1), np.diff(orders, axis=1, prepend=0.0)
+
+    raw_usage = np.zeros((len(data['raws']), n_periods))
+    np.add.at(raw_usage, data['raw_of'], preparation)
+    raw, raw_orders = order_up(data['InitialRawInventory'][:, None], raw_usage, data['MinRawInventory'][:, None])
+    total = preparation.sum(axis=0)
+    needles, needle_orders = order_up(data['InitialNeedleInventory'][:, None], np.broadcast_to(total, (len(data['needles']), n_periods)), data['MinNeedleInventory'][:, None])
+
+    n_lines, n_machines, n_packs = len(data['lines']), len(data['machines']), len(data['pack_lines'])
+    running = (total > 0).astype(float)
+    employees = np.broadcast_to(np.ceil(total / upe - 1e-9), (n_lines, n_periods)).copy()
+    plan = {
+        'RawInventory': raw, 'NeedleInventory': needles, 'FinishedInventory': stock,
+        'OrderQuantityRaw': raw_orders, 'OrderQuantityNeedles': needle_orders, 'Shipping': shipping,
+        'Preparation': preparation, 'Cutting': preparation, 'NeedleAttachment': preparation, 'Packaging': preparation, 'Sterilization': preparation,
+        'Batch': preparation / batch,
+        'MachineOp': np.broadcast_to(running, (n_machines, n_periods)), 'Employees': employees,
+        'PackLinesOp': np.broadcast_to(running, (n_packs, n_periods)),
+    }
+    if options['second_shift']:
+        plan['SecondShift'] = np.broadcast_to(second_shift, (n_lines, n_periods))
+        plan['SecondShiftMachineOp'] = np.broadcast_to(running * second_shift, (n_machines, n_periods))
+        plan['SecondShiftPackLinesOp'] = np.broadcast_to(running * second_shift, (n_packs, n_periods))
+        plan['SecondShiftEmployees'] = employees * second_shift
+    if options['backorders']:
+        plan['Shortage'] = demand - shipping
+    return {name: np.array(block, dtype=float) for name, block in plan.items()}
+
+#-----------------------------------------
+
+# Solution vector of a formulation from the blocks of a plan
+def plan_vector(form, plan):
+    x = np.zeros(form.num_vars)
+    for name, index in form.var_blocks.items():
+        x[index] = plan[name]
+    return x
+
+# Upper bound of the maximisation from the LP relaxation: -inf when the relaxation is infeasible,
+# None when no LP solver is available or the solve fails
+def lp_bound(form):
+    try:
+        import scipy.sparse as sp
+        from scipy.optimize import linprog
+    except ImportError:
+        return None
+    A = form.A
+    upper, lower, equal = form.sense == '<', form.sense == '>', form.sense == '='
+    A_ub = sp.vstack([A[upper], -A[lower]])
+    b_ub = np.concatenate([form.rhs[upper], -form.rhs[lower]])
+    solution = linprog(-form.obj, A_ub=A_ub, b_ub=b_ub, A_eq=A[equal], b_eq=form.rhs[equal], bounds=np.column_stack([form.lb, form.ub]), method='highs')
+    if solution.status == 2:
+        return -np.inf
+    return -solution.fun if solution.status == 0 else None
+
+#-----------------------------------------
+
+# Heuristic plan of a scenario in the layout of the run_model_* results, checked against the full formulation.
+# With bound=True the gap to the LP relaxation is reported as well.
+def heuristic_plan(params, model_type, time_periods=None, bound=True):
+    options = MODEL_OPTIONS[model_type]
+    time_periods = list(time_periods) if time_periods is not None else options['time_periods']
+    start = time.perf_counter()
+    plan = construct_plan(compile_arrays(params, time_periods), model_type)
+    plan_time = time.perf_counter() - start
+
+    form = build_formulation(params, model_type, time_periods=time_periods)
+    x = plan_vector(form, plan)
+    objective = float(form.obj @ x)
+    slack = form.rhs - form.A @ x
+    results = {'objective_value': objective}
+    for name in RESULT_BLOCKS + [b for b in FEATURE_RESULT_BLOCKS if b in plan]:
+        results[name] = {item: row.tolist() for item, row in zip(form.block_items[name], plan[name])}
+
+    constraint_report = {'constraints_checked': form.num_constrs, 'constraint_violations': constraint_violations(form.constr_names, form.sense, form.rhs, slack)}
+    results['validation'] = validation_report(constraint_report, check_plan(params, results, model_type, time_periods))
+    results['heuristic'] = {'plan_time': plan_time, 'lp_bound': None, 'gap': None}
+    if bound:
+        lp = lp_bound(form)
+        results['heuristic'].update(lp_bound=lp, gap=(lp - objective) / max(abs(lp), 1e-10) if lp is not None and np.isfinite(lp) else None)
+    return results, plan
+
+# Use a heuristic plan as MIP start of a model factory
+def warm_start(factory, plan):
+    for name, variables in factory.vars.items():
+        if name in plan:
+            factory.model.setAttr("Start", list(variables.ravel()), plan[name].ravel().tolist())
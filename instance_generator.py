@@ -0,0 +1,111 @@
+import argparse
+import math
+import numpy as np
+from parameters import parameter_set_1
+from parameter_schema import ParameterSet, write_parameters
+
+# Suture types of the hand-written sets; larger catalogues add numbered variants of them
+SUTURE_TYPES = list(parameter_set_1['Demand'])
+
+# Share of the tightest capacity used by the busiest period, after rounding up to whole batches and refilling the
+# safety stock; below 1 every generated set is feasible for all model types
+UTILIZATION = 0.6
+
+# Units per employee of the single period model, the smallest of all model types
+UNITS_PER_EMPLOYEE = 700
+
+#-----------------------------------------
+
+def suture_names(n_sutures):
+    return [SUTURE_TYPES[k] if k < len(SUTURE_TYPES) else f"{SUTURE_TYPES[k % len(SUTURE_TYPES)]}_{k}" for k in range(n_sutures)]
+
+# Seeded parameter set in the layout of parameters.py with n_sutures suture types, n_raws raw materials, n_lines
+# production lines (and as many machines and packaging lines unless given) and n_periods periods.
+# Every suture type is made from its own raw material <suture>_raw, as the formulation requires; raw materials beyond
+# n_sutures are stocked but not used by any suture type, so n_raws cannot be smaller than n_sutures.
+# Demand follows a yearly season per suture type; every line, machine and packaging line can carry the busiest
+# period at the given utilization, and the staff, inventory limits and prices are derived from the demand, so the
+# set is valid (ParameterSet) and feasible.
+def generate_parameters(n_sutures, n_periods, n_raws=None, n_lines=2, n_machines=None, n_pack_lines=None, n_needles=3, seed=0, utilization=UTILIZATION):
+    n_raws = n_sutures if n_raws is None else n_raws
+    n_machines = n_lines if n_machines is None else n_machines
+    n_pack_lines = n_lines if n_pack_lines is None else n_pack_lines
+    if n_raws < n_sutures:
+        raise ValueError(f"Every suture type needs its own raw material: n_raws ({n_raws}) must be at least n_sutures ({n_sutures})")
+    if not 0 < utilization < 1:
+        raise ValueError("utilization must be between 0 and 1")
+    rng = np.random.default_rng(seed)
+
+    sutures = suture_names(n_sutures)
+    raws = [s + '_raw' for s in sutures] + [f"raw_{k + 1}" for k in range(n_raws - n_sutures)]
+    needles = [f"needle_{k + 1}" for k in range(n_needles)]
+    lines = [f"line{k + 1}" for k in range(n_lines)]
+    machines = [f"machine{k + 1}" for k in range(n_machines)]
+    pack_lines = [f"pack_line{k + 1}" for k in range(n_pack_lines)]
+
+    # Demand: a base level per suture type with a yearly season and +-10% noise, in whole units
+    base = rng.integers(200, 1000, n_sutures)
+    season = 1 + rng.uniform(0.05, 0.25, n_sutures)[:, None] * np.sin(2 * np.pi * np.arange(n_periods) / 12 + rng.uniform(0, 2 * np.pi, n_sutures)[:, None])
+    demand = np.rint(base[:, None] * season * rng.uniform(0.9, 1.1, (n_sutures, n_periods)))
+    batch = rng.integers(8, 13, n_sutures) * 10
+    safety = np.rint(rng.uniform(0.05, 0.15, n_sutures) * base)
+    initial = safety + rng.integers(0, 50, n_sutures)
+
+    # Each line, machine and packaging line row caps the total production of a period
+    peak = demand.sum(axis=0).max() + batch.sum() + safety.sum()
+    capacity = peak / utilization
+
+    # Prices cover the unit cost, including one needle of every type and the labor per unit, with a margin
+    prod_cost = rng.uniform(0.6, 1.0, n_sutures).round(2)
+    packaging_cost = rng.uniform(0.35, 0.6, n_sutures).round(2)
+    raw_cost = rng.uniform(0.25, 0.45, n_raws).round(2)
+    labor_cost = rng.integers(18, 25, n_lines)
+    needle_cost, cutting_cost, sterilization_cost = 0.1, 0.05, {'A': 0.15, 'B': 0.25}
+    unit_cost = prod_cost + packaging_cost + raw_cost[:n_sutures] + cutting_cost + sterilization_cost['B'] + needle_cost * n_needles + labor_cost.max() * n_lines / UNITS_PER_EMPLOYEE
+    price = (unit_cost * rng.uniform(1.5, 2.2, n_sutures)).round(2)
+
+    raw_limit = np.concatenate([np.maximum(3000, 3 * (demand.max(axis=1) + batch)), np.full(n_raws - n_sutures, 3000.0)])
+    needle_limit = max(10000.0, 3 * capacity)
+
+    params = {
+        'InitialInventory': dict(zip(sutures, initial.tolist())),
+        'InitialRawInventory': dict(zip(raws, rng.integers(300, 800, n_raws).tolist())),
+        'InitialNeedleInventory': dict(zip(needles, rng.integers(500, 800, n_needles).tolist())),
+        'MaxCapacity': dict(zip(lines, np.rint(capacity * rng.uniform(1.0, 1.2, n_lines)).tolist())),
+        'MaxCapacity_m': dict(zip(machines, np.rint(capacity * rng.uniform(1.0, 1.2, n_machines)).tolist())),
+        'BatchSize': dict(zip(sutures, batch.tolist())),
+        'MaxEmployees': dict(zip(lines, (math.ceil(capacity / UNITS_PER_EMPLOYEE) + rng.integers(0, 3, n_lines)).tolist())),
+        'MaxPackagingCapacity': dict(zip(pack_lines, np.rint(capacity * rng.uniform(1.0, 1.2, n_pack_lines)).tolist())),
+        'SafetyStock': dict(zip(sutures, safety.tolist())),
+        'Demand': {s: row.tolist() for s, row in zip(sutures, demand)},
+        'Price': dict(zip(sutures, price.tolist())),
+        'ProdCost': dict(zip(sutures, prod_cost.tolist())),
+        'LaborCost': dict(zip(lines, labor_cost.tolist())),
+        'Cost_r': dict(zip(raws, raw_cost.tolist())),
+        'NeedleCost': {n: needle_cost for n in needles},
+        'PackagingCost': dict(zip(sutures, packaging_cost.tolist())),
+        'StorageCost': 0.1,
+        'SterilizationCost': sterilization_cost,
+        'CuttingCost': cutting_cost,
+        'MaxRawInventory': dict(zip(raws, raw_limit.tolist())),
+        'MaxNeedleInventory': {n: needle_limit for n in needles},
+        'MinRawInventory': {r: 50 for r in raws},
+        'MinNeedleInventory': {n: 200 for n in needles},
+        'MaxFinishedInventory': dict(zip(sutures, (safety + 2 * (demand.max(axis=1) + batch)).tolist())),
+        'ShortageCost': 4,
+    }
+    ParameterSet.from_dict(params)  # Raises if the generated set is not valid
+    return params
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic parameter set")
+    parser.add_argument("output", help="parameter file (.json, .yaml or .csv)")
+    parser.add_argument("--sutures", type=int, default=12)
+    parser.add_argument("--raws", type=int, help="raw materials (default: one per suture type)")
+    parser.add_argument("--lines", type=int, default=2, help="production lines, machines and packaging lines")
+    parser.add_argument("--periods", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_parameters(generate_parameters(args.sutures, args.periods, n_raws=args.raws, n_lines=args.lines, seed=args.seed), args.output)
@@ -1,10 +1,19 @@
+import argparse
 import os
-from parameters import parameter_set_1, parameter_set_2, parameter_set_3, parameter_set_4, parameter_set_5, parameter_set_6
-from scenario_analysis import scenario_analysis, plot_scenario_analysis
+import sys
 
 # Parameter sets for sensitivity analysis
-param_sets = [parameter_set_1, parameter_set_6] # parameter_set_1, parameter_set_2 , parameter_set_3, parameter_set_4, parameter_set_5, parameter_set_6
-model_types = ["multi_period"] # "multi_period", "multi_period_with_second_shift", "multi_period_with_backorder_penalty" 
+param_sets = ["parameter_set_1", "parameter_set_6"] # parameter_set_1, parameter_set_2 , parameter_set_3, parameter_set_4, parameter_set_5, parameter_set_6
+model_types = ["multi_period"] # "multi_period", "multi_period_with_second_shift", "multi_period_with_backorder_penalty"
+n_workers = 1 # Number of solver processes; > 1 runs the scenarios in a process pool
+use_cache = True # Reuse the results of scenarios solved before with the same parameters
+time_periods = list(range(1, 7)) # Planning horizon of the multi-period models; the Demand tables hold 12 months
+rolling = None # (window, step) to solve the horizon with a rolling horizon, e.g. (6, 3)
+
+base_path = "results" # Every run writes its results to base_path/file_<run>; --results-dir overrides it
+
+# Model types of the CLI; kept here so that listing them doesn't import the formulation
+MODEL_TYPES = ["single_period", "multi_period", "multi_period_with_second_shift", "multi_period_with_backorder_penalty"]
 
 def get_next_run_number(base_path):
     if not os.path.exists(base_path):
@@ -16,11 +25,221 @@ def get_next_run_number(base_path):
     else:
         return 1
 
-if __name__ == "__main__":
+#-----------------------------------------
+
+# Every command imports the modules it needs when it runs: listing and validating parameter sets never loads
+# gurobipy or matplotlib, and only plotting loads matplotlib.
+
+# A parameter set of parameters.py by name, or a parameter file (JSON, YAML, CSV)
+def load_parameter_set(source):
+    if os.path.exists(source):
+        from parameter_schema import load_parameters
+        return load_parameters(source)
+    import parameters
+    if not source.startswith("parameter_set_") or not hasattr(parameters, source):
+        raise SystemExit(f"Unknown parameter set {source}: give a parameter_set_<n> of parameters.py or a parameter file")
+    return getattr(parameters, source)
+
+# Name of a parameter set in the results: parameter_set_<n>, or the file name without its extension
+def parameter_set_name(source):
+    return os.path.splitext(os.path.basename(source))[0] if os.path.exists(source) else source
+
+def horizon(args):
+    return list(range(1, args.periods + 1)) if args.periods else time_periods
+
+def command_list(args):
+    import parameters
+    print("Parameter sets:")
+    for name in sorted(n for n in vars(parameters) if n.startswith("parameter_set_")):
+        params = getattr(parameters, name)
+        print(f"  {name}: {len(params['Demand'])} suture types, {len(next(iter(params['Demand'].values())))} periods of demand")
+    print("Model types:")
+    for model_type in MODEL_TYPES:
+        print(f"  {model_type}")
 
-    base_path = "/Users/johnkazantzidis/dev/gurobi/results"
-    run_no = get_next_run_number(base_path)
-    results, directory = scenario_analysis(param_sets, run_no, model_types)
-    plot_scenario_analysis(results, directory, run_no)
+def command_validate(args):
+    from parameter_schema import ParameterSet
+    failed = 0
+    for source in args.sources:
+        params = load_parameter_set(source)
+        try:
+            compiled = params if isinstance(params, ParameterSet) else ParameterSet.from_dict(params, name=source)
+            compiled.check_horizon(horizon(args))
+            print(f"{source}: ok ({compiled!r})")
+        except ValueError as e:
+            failed += 1
+            print(f"{source}: {e}")
+            continue
+        if args.model_types:
+            # The infeasibility screen only needs NumPy, like the schema checks
+            from validation import feasibility_screen
+            for model_type in args.model_types:
+                reasons = feasibility_screen(compiled, model_type, [1] if model_type == "single_period" else horizon(args))
+                failed += bool(reasons)
+                print(f"    {model_type}: {'infeasible: ' + '; '.join(reasons) if reasons else 'passes the screen'}")
+    return 1 if failed else 0
+
+def command_plan(args):
+    from heuristic import heuristic_plan
+    for source in args.sources:
+        try:
+            results, _ = heuristic_plan(load_parameter_set(source), args.model_type, time_periods=None if args.model_type == "single_period" else horizon(args), bound=args.bound)
+        except ValueError as e:
+            print(f"{source}: {e}")
+            continue
+        heuristic = results['heuristic']
+        bound = f", LP bound {heuristic['lp_bound']:.2f}, gap {100 * heuristic['gap']:.2f}%" if heuristic['gap'] is not None else ""
+        print(f"{source}: objective {results['objective_value']:.2f}{bound}, planned in {1000 * heuristic['plan_time']:.1f} ms, valid: {results['validation']['ok']}")
+        if args.output:
+            import json
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=4)
+
+def command_solve(args):
+    from scenario_analysis import scenario_analysis
+    from solve_cache import SolveCache
+
+    run_no = get_next_run_number(args.results_dir)
+    cache = SolveCache() if args.cache else None
+    sets = {parameter_set_name(source): load_parameter_set(source) for source in args.sources}
+    results, directory = scenario_analysis(sets, run_no, args.model_types, n_workers=args.workers, cache=cache, backend=args.backend,
+                                           time_periods=horizon(args), rolling=tuple(args.rolling) if args.rolling else rolling, compact=args.compact,
+                                           results_dir=args.results_dir)
+    if args.plot:
+        from plotting import render_figures
+        render_figures(results, directory, run_no, n_workers=args.plot_workers)
 
     print(f"Results saved in directory: {directory}")
+
+def command_sweep(args):
+    from sweep import run_sweep, scale_axis, value_axis, demand_axis
+    from solve_cache import SolveCache
+
+    def parse(axis, spec):
+        key, values = spec.split("=", 1)
+        return axis(key, [float(v) for v in values.split(",")])
+
+    axes = [parse(scale_axis, spec) for spec in args.scale] + [parse(value_axis, spec) for spec in args.value] + [parse(demand_axis, spec) for spec in args.demand]
+    if not axes:
+        raise SystemExit("A sweep needs at least one --scale, --value or --demand axis")
+    run_sweep(load_parameter_set(args.base), axes, args.model_type, args.output, time_limit=args.time_limit, n_workers=args.workers,
+              cache=SolveCache() if args.cache else None, backend=args.backend, time_periods=horizon(args), screen=args.screen, threshold=args.threshold, compact=args.compact)
+
+def command_plot(args):
+    from plotting import render_figures
+    directory = args.directory or os.path.dirname(os.path.abspath(args.results))
+    render_figures(args.results, directory, args.run_no, n_workers=args.plot_workers, per_scenario=args.per_scenario)
+
+def command_simulate(args):
+    from simulation import simulate_plan, replay_plan, load_plans
+    params = load_parameter_set(args.source)
+    name = parameter_set_name(args.source)
+    plans = load_plans(args.results)
+    scenarios = args.scenarios or [scenario for scenario in plans if scenario.endswith(name) or len(plans) == 1]
+    if not scenarios:
+        print(f"No plans of {name} in {args.results}: give them with --scenarios")
+        return 1
+    reports = {}
+    for scenario in scenarios:
+        if 'objective_value' not in plans[scenario]:
+            print(f"{scenario}: {plans[scenario].get('status', 'no plan')}")
+            continue
+        report = reports[scenario] = simulate_plan(params, plans[scenario], n_trajectories=args.trajectories, spread=args.spread, seed=args.seed)
+        print(f"{scenario}: fill rate {100 * report['fill_rate']:.2f}%, stockout probability {100 * report['stockout_probability']:.2f}%, "
+              f"shortage cost {report['shortage_cost']['mean']:.2f} (p95 {report['shortage_cost']['p95']:.2f}), "
+              f"profit {report['profit']['mean']:.2f} (p5 {report['profit']['p5']:.2f}, planned {report['planned_profit']:.2f}), "
+              f"{report['n_trajectories']} trajectories in {report['simulation_time']:.2f} s")
+        for suture, stats in report['sutures'].items():
+            print(f"    {suture:<12} fill rate {100 * stats['fill_rate']:6.2f}%  stockout {100 * stats['stockout_probability']:6.2f}%  "
+                  f"below safety stock {100 * stats['below_safety_stock_probability']:6.2f}%  above max {100 * stats['above_max_inventory_probability']:6.2f}%")
+        for block, items in report['inventory_violations'].items():
+            print(f"    {block} outside its limits: {items}")
+        # The plan must reproduce its own objective under the demand it was planned for
+        replayed, planned = replay_plan(params, plans[scenario])
+        report['replayed_profit'] = replayed
+        if abs(replayed - planned) > 1e-6 * max(1.0, abs(planned)):
+            print(f"    Warning: the plan replayed against its planned demand earns {replayed:.2f}, not its objective {planned:.2f}")
+    if args.output:
+        import json
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=4)
+
+#-----------------------------------------
+
+def parser():
+    parser = argparse.ArgumentParser(description="Suture production planning models")
+    commands = parser.add_subparsers(dest="command")
+
+    def solver_options(command):
+        command.add_argument("--periods", type=int, help="number of periods of the multi-period models (default: time_periods of main.py)")
+        command.add_argument("--workers", type=int, default=n_workers, help="number of solver processes")
+        command.add_argument("--backend", choices=["gurobi", "highs"], default="gurobi")
+        command.add_argument("--no-cache", dest="cache", action="store_false", default=use_cache, help="solve every scenario again")
+        command.add_argument("--compact", action="store_true", help="solve the compact formulation (same results, fewer variables and rows)")
+
+    command = commands.add_parser("list", help="list the parameter sets and model types")
+    command.set_defaults(run=command_list)
+
+    command = commands.add_parser("validate", help="validate parameter sets without building a model")
+    command.add_argument("sources", nargs="*", default=param_sets, help="parameter_set_<n> of parameters.py or parameter files")
+    command.add_argument("--periods", type=int, help="horizon the demand must cover")
+    command.add_argument("--model-type", dest="model_types", nargs="+", choices=MODEL_TYPES, help="also screen the parameter sets for infeasibility for these model types")
+    command.set_defaults(run=command_validate)
+
+    command = commands.add_parser("plan", help="instant heuristic plan, without a MIP solve")
+    command.add_argument("sources", nargs="*", default=param_sets, help="parameter_set_<n> of parameters.py or parameter files")
+    command.add_argument("--model-type", choices=MODEL_TYPES, default="multi_period")
+    command.add_argument("--periods", type=int, help="number of periods of the multi-period models")
+    command.add_argument("--no-bound", dest="bound", action="store_false", help="skip the LP bound and the gap")
+    command.add_argument("--output", help="write the plan as JSON")
+    command.set_defaults(run=command_plan)
+
+    command = commands.add_parser("solve", help="solve the model types for the parameter sets and plot the results")
+    command.add_argument("sources", nargs="*", default=param_sets, help="parameter_set_<n> of parameters.py or parameter files")
+    command.add_argument("--model-types", nargs="+", choices=MODEL_TYPES, default=model_types)
+    command.add_argument("--rolling", nargs=2, type=int, metavar=("WINDOW", "STEP"), help="solve with a rolling horizon")
+    command.add_argument("--no-plot", dest="plot", action="store_false")
+    command.add_argument("--plot-workers", type=int, default=os.cpu_count(), help="processes rendering the figures")
+    command.add_argument("--results-dir", default=base_path, help="directory of the run directories (default: %(default)s)")
+    solver_options(command)
+    command.set_defaults(run=command_solve)
+
+    command = commands.add_parser("sweep", help="sensitivity sweep over a grid of parameter values")
+    command.add_argument("base", help="parameter_set_<n> of parameters.py or a parameter file")
+    command.add_argument("output", help="JSON-lines file of the results")
+    command.add_argument("--model-type", choices=MODEL_TYPES, default="multi_period")
+    command.add_argument("--scale", action="append", default=[], metavar="KEY=F1,F2", help="multiply a parameter, e.g. Cost_r=0.8,1.2")
+    command.add_argument("--value", action="append", default=[], metavar="KEY=V1,V2", help="set every entry of a parameter, e.g. LaborCost=20,40")
+    command.add_argument("--demand", action="append", default=[], metavar="SUTURE=M1,M2", help="multiply the demand of a suture type, e.g. silk=1,1.5")
+    command.add_argument("--time-limit", type=float, default=3600)
+    command.add_argument("--screen", action="store_true", help="skip the MIP solve of scenarios whose LP bound cannot beat the best scenario")
+    command.add_argument("--threshold", type=float, help="skip the MIP solve of scenarios whose LP bound is below this profit")
+    solver_options(command)
+    command.set_defaults(run=command_sweep)
+
+    command = commands.add_parser("simulate", help="replay solved plans against sampled demand trajectories")
+    command.add_argument("source", help="parameter_set_<n> of parameters.py or the parameter file the plans were solved for")
+    command.add_argument("results", help="results of a run (JSON file or columnar store) or a plan file")
+    command.add_argument("--scenarios", nargs="+", help="scenarios to simulate (default: every plan of the parameter set)")
+    command.add_argument("--trajectories", type=int, default=100_000)
+    command.add_argument("--spread", type=float, default=0.2, help="log standard deviation of the demand around the planned demand")
+    command.add_argument("--seed", type=int, default=0)
+    command.add_argument("--output", help="write the reports as JSON")
+    command.set_defaults(run=command_simulate)
+
+    command = commands.add_parser("plot", help="plot saved results (JSON file or columnar store)")
+    command.add_argument("results")
+    command.add_argument("--run-no", type=int, default=0)
+    command.add_argument("--directory", help="output directory of the figures (default: next to the results)")
+    command.add_argument("--plot-workers", type=int, default=os.cpu_count(), help="processes rendering the figures")
+    command.add_argument("--no-per-scenario", dest="per_scenario", action="store_false", help="skip the production plan of every scenario")
+    command.set_defaults(run=command_plot)
+    return parser
+
+if __name__ == "__main__":
+    # Without a command, solve the configuration at the top of this file as before
+    args = parser().parse_args(sys.argv[1:] or ["solve"])
+    if args.command is None:
+        parser().print_help()
+        sys.exit(2)
+    sys.exit(args.run(args) or 0)
@@ -0,0 +1,34 @@
+import gurobipy as gp
+from gurobipy import GRB
+from formulation import build_formulation, RESULT_BLOCKS, FEATURE_RESULT_BLOCKS
+
+#-----------------------------------------
+
+# Load a formulation into Gurobi in bulk through the matrix API
+def load_formulation(form, model=None):
+    if model is None:
+        model = gp.Model(form.name)
+    names = form.var_names if form.with_names else None
+    x = model.addMVar(form.num_vars, lb=form.lb, ub=form.ub, obj=form.obj, vtype=form.vtype, name=names)
+    names = form.constr_names if form.with_names else None
+    model.addMConstr(form.A, x, form.sense, form.rhs, name=names)
+    model.ModelSense = GRB.MAXIMIZE
+    return model, x
+
+#-----------------------------------------
+
+# Build a model type with the vectorized builder; same formulation as the run_model_* builders
+def build_matrix_model(params, model_type, time_periods=None, with_names=True, compact=False):
+    form = build_formulation(params, model_type, time_periods=time_periods, with_names=with_names, compact=compact)
+    model, x = load_formulation(form)
+    return model, x, form
+
+#-----------------------------------------
+
+# Per-item time series of every reported block from a solution vector
+def solution_to_results(form, values):
+    results = {}
+    for name in RESULT_BLOCKS + [b for b in FEATURE_RESULT_BLOCKS if b in form.var_blocks]:
+        block = values[form.var_blocks[name]]
+        results[name] = {item: block[i].tolist() for i, item in enumerate(form.block_items[name])}
+    return results
@@ -0,0 +1,230 @@
+import numpy as np
+import gurobipy as gp
+from formulation import Formulation, MODEL_OPTIONS, compile_arrays, add_core, add_second_shift, add_backorders
+from matrix_models import load_formulation, RESULT_BLOCKS, FEATURE_RESULT_BLOCKS
+
+#-----------------------------------------
+
+# Optional feature blocks on top of the shared core, in the order they are reported
+FEATURES = {
+    'second_shift': add_second_shift,
+    'backorders': add_backorders,
+}
+
+# Model name suffix of each feature, matching the names of the legacy builders
+FEATURE_SUFFIX = {
+    'second_shift': "_With_Second_Shift",
+    'backorders': "_With_Backorder_Penalty",
+}
+
+# Arrays of a formulation that can change between parameter sets
+def _arrays(form):
+    return {'obj': form.obj, 'lb': form.lb, 'ub': form.ub, 'rhs': form.rhs, 'A': form.A}
+
+#-----------------------------------------
+
+# One Gurobi model per parameter set and horizon. The core (inventories, production stages, capacities,
+# demand) is built once; second shift and backorders are added to or removed from the live model.
+# compact=True uses the compact core of add_core; its capacity rows stay per line so the second shift can be added.
+class ModelFactory:
+
+    def __init__(self, params, time_periods=None, units_per_employee=800, compact=False):
+        self.params = params
+        self.time_periods = list(time_periods) if time_periods is not None else list(range(1, 7))
+        self.units_per_employee = units_per_employee
+        self.compact = compact
+        self.data = compile_arrays(params, self.time_periods)
+
+        self.core = Formulation("Multi_Period_Model" if len(self.time_periods) > 1 else "Single_Period_Model")
+        add_core(self.core, self.data, units_per_employee=units_per_employee, compact=compact)
+        self.model, x = load_formulation(self.core)
+        self.model.update()
+
+        self.core_vars = np.array(x.tolist(), dtype=object)
+        self.core_constrs = np.array(self.model.getConstrs(), dtype=object)
+        self.vars = {name: self.core_vars[index] for name, index in self.core.var_blocks.items()}
+        self.block_items = dict(self.core.block_items)
+        self.enabled = {}
+        self._deltas = {}
+
+    # Factory preset of one of the four model types
+    @classmethod
+    def for_model_type(cls, params, model_type, time_periods=None, compact=False):
+        options = MODEL_OPTIONS[model_type]
+        factory = cls(params, time_periods=time_periods if time_periods is not None else options['time_periods'], units_per_employee=options['units_per_employee'], compact=compact)
+        factory.configure(second_shift=options['second_shift'], backorders=options['backorders'])
+        return factory
+
+    #-----------------------------------------
+
+    # Difference between the core and the core extended with a feature, computed once per feature
+    def _delta(self, feature):
+        if feature not in self._deltas:
+            extended = self.core.copy()
+            FEATURES[feature](extended, self.data)
+            n0, m0 = self.core.num_vars, self.core.num_constrs
+            A = extended.A
+            core_terms = A[:m0, n0:].tocoo()
+            sense_rows = np.flatnonzero(extended.sense[:m0] != self.core.sense)
+            ub_cols = np.flatnonzero(extended.ub[:n0] != self.core.ub)
+            self._deltas[feature] = {
+                'lb': extended.lb[n0:], 'ub': extended.ub[n0:], 'obj': extended.obj[n0:], 'vtype': extended.vtype[n0:],
+                'var_names': extended.var_names[n0:],
+                'A': A[m0:], 'sense': extended.sense[m0:], 'rhs': extended.rhs[m0:], 'constr_names': extended.constr_names[m0:],
+                'core_terms': (core_terms.row, core_terms.col, core_terms.data),
+                'sense_overrides': (sense_rows, extended.sense[sense_rows]),
+                'ub_overrides': (ub_cols, extended.ub[ub_cols]),
+                'var_blocks': {name: index - n0 for name, index in extended.var_blocks.items() if name not in self.core.var_blocks},
+                'block_items': {name: items for name, items in extended.block_items.items() if name not in self.core.block_items},
+            }
+        return self._deltas[feature]
+
+    # Add a feature block to the live model
+    def enable(self, feature):
+        if feature in self.enabled:
+            return
+        delta = self._delta(feature)
+        x = self.model.addMVar(len(delta['lb']), lb=delta['lb'], ub=delta['ub'], obj=delta['obj'], vtype=delta['vtype'], name=delta['var_names'])
+        new_vars = np.array(x.tolist(), dtype=object)
+        columns = gp.MVar.fromlist(list(self.core_vars) + list(new_vars))
+        new_constrs = self.model.addMConstr(delta['A'], columns, delta['sense'], delta['rhs'], name=delta['constr_names'])
+
+        # Coefficients of the new variables in core rows (e.g. second shift capacity in ProdCap)
+        for row, col, value in zip(*delta['core_terms']):
+            self.model.chgCoeff(self.core_constrs[row], new_vars[col], value)
+
+        for name, index in delta['var_blocks'].items():
+            self.vars[name] = new_vars[index]
+            self.block_items[name] = delta['block_items'][name]
+        self.enabled[feature] = (list(new_vars), new_constrs.tolist())
+        self._apply_overrides()
+
+    # Remove a feature block from the live model; its variables take their core coefficients with them
+    def disable(self, feature):
+        if feature not in self.enabled:
+            return
+        new_vars, new_constrs = self.enabled.pop(feature)
+        self.model.remove(new_vars + new_constrs)
+        for name in self._delta(feature)['var_blocks']:
+            del self.vars[name]
+            del self.block_items[name]
+        self._apply_overrides()
+
+    # Core senses and bounds, overridden by the enabled features (demand becomes <=, employees unbounded)
+    def _apply_overrides(self):
+        for feature in self._deltas:
+            delta = self._deltas[feature]
+            rows, _ = delta['sense_overrides']
+            cols, _ = delta['ub_overrides']
+            self.model.setAttr("Sense", list(self.core_constrs[rows]), list(self.core.sense[rows]))
+            self.model.setAttr("UB", list(self.core_vars[cols]), list(self.core.ub[cols]))
+        for feature in self.enabled:
+            delta = self._delta(feature)
+            rows, senses = delta['sense_overrides']
+            cols, bounds = delta['ub_overrides']
+            self.model.setAttr("Sense", list(self.core_constrs[rows]), list(senses))
+            self.model.setAttr("UB", list(self.core_vars[cols]), list(bounds))
+        self.model.ModelName = self.core.name + "".join(FEATURE_SUFFIX[f] for f in FEATURES if f in self.enabled)
+        self.model.update()
+
+    # Switch the feature blocks on or off to match the requested model
+    def configure(self, second_shift=False, backorders=False):
+        for feature, wanted in [('second_shift', second_shift), ('backorders', backorders)]:
+            if wanted:
+                self.enable(feature)
+            else:
+                self.disable(feature)
+
+    #-----------------------------------------
+
+    # Apply differences in objective coefficients, bounds, right-hand sides and matrix coefficients
+    # of one part of the model (the core or a feature block) to its live variables and constraints
+    def _apply_changes(self, variables, constrs, columns, old, new):
+        changes = 0
+        for attr, key in [("Obj", 'obj'), ("LB", 'lb'), ("UB", 'ub')]:
+            index = np.flatnonzero(old[key] != new[key])
+            if len(index):
+                self.model.setAttr(attr, list(variables[index]), list(new[key][index]))
+                changes += len(index)
+        index = np.flatnonzero(old['rhs'] != new['rhs'])
+        if len(index):
+            self.model.setAttr("RHS", list(constrs[index]), list(new['rhs'][index]))
+            changes += len(index)
+
+        A_old, A_new = old['A'], new['A']
+        if not (np.array_equal(A_old.indptr, A_new.indptr) and np.array_equal(A_old.indices, A_new.indices)):
+            raise ValueError("The sparsity pattern of the model changed; build a new ModelFactory for these parameters")
+        index = np.flatnonzero(A_old.data != A_new.data)
+        rows = np.repeat(np.arange(A_new.shape[0]), np.diff(A_new.indptr))[index]
+        for row, col, value in zip(rows, A_new.indices[index], A_new.data[index]):
+            self.model.chgCoeff(constrs[row], columns[col], value)
+        changes += len(index)
+        return changes
+
+    # Move the live model to another parameter set with the same index sets. Only the changed coefficients,
+    # right-hand sides and bounds are touched, and the previous solution is passed on as MIP start.
+    def update_parameters(self, params, warm_start=True):
+        if params is self.params:
+            return 0
+        data = compile_arrays(params, self.time_periods)
+        for key in ['sutures', 'raws', 'needles', 'lines', 'machines', 'pack_lines']:
+            if data[key] != self.data[key]:
+                raise ValueError(f"The {key} of the new parameter set differ from the model; build a new ModelFactory")
+
+        all_vars = self.model.getVars()
+        start = self.model.getAttr("X", all_vars) if warm_start and self.model.SolCount > 0 else None
+
+        core = Formulation(self.core.name)
+        add_core(core, data, units_per_employee=self.units_per_employee, compact=self.compact)
+        changes = self._apply_changes(self.core_vars, self.core_constrs, self.core_vars, _arrays(self.core), _arrays(core))
+
+        old_deltas = self._deltas
+        self.params, self.data, self.core, self._deltas = params, data, core, {}
+        for feature, (new_vars, new_constrs) in self.enabled.items():
+            old, new = old_deltas[feature], self._delta(feature)
+            new_vars, new_constrs = np.array(new_vars, dtype=object), np.array(new_constrs, dtype=object)
+            changes += self._apply_changes(new_vars, new_constrs, np.concatenate([self.core_vars, new_vars]), old, new)
+            index = np.flatnonzero(old['core_terms'][2] != new['core_terms'][2])
+            for row, col, value in zip(new['core_terms'][0][index], new['core_terms'][1][index], new['core_terms'][2][index]):
+                self.model.chgCoeff(self.core_constrs[row], new_vars[col], value)
+            changes += len(index)
+        self._apply_overrides()
+
+        if start is not None:
+            self.model.setAttr("Start", all_vars, start)
+        return changes
+
+    #-----------------------------------------
+
+    # Solution values of a variable block, shaped (items, periods)
+    def values(self, name):
+        return np.array(self.model.getAttr("X", list(self.vars[name].ravel()))).reshape(self.vars[name].shape)
+
+    # Solution of every result block as an (items, periods) array, from a single bulk X query
+    def solution_arrays(self):
+        names = RESULT_BLOCKS + [b for b in FEATURE_RESULT_BLOCKS if b in self.vars]
+        values = np.array(self.model.getAttr("X", [var for name in names for var in self.vars[name].ravel()]))
+        arrays, offset = {}, 0
+        for name in names:
+            shape = self.vars[name].shape
+            arrays[name] = values[offset:offset + self.vars[name].size].reshape(shape)
+            offset += self.vars[name].size
+        return arrays
+
+    # Results in the layout of the run_model_* functions
+    def results(self):
+        results = {'objective_value': self.model.objVal}
+        for name, block in self.solution_arrays().items():
+            results[name] = {item: row.tolist() for item, row in zip(self.block_items[name], block)}
+        return results
+
+    # Objective of the solution split by period; sums to the objective value
+    def period_objective(self):
+        total = np.zeros(len(self.time_periods))
+        for name, block in self.vars.items():
+            if name in self.core.aliases:
+                continue
+            variables = list(block.ravel())
+            contribution = np.array(self.model.getAttr("Obj", variables)) * np.array(self.model.getAttr("X", variables))
+            total += contribution.reshape(block.shape).sum(axis=0)
+        return total
@@ -0,0 +1,207 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from formulation import MODEL_OPTIONS, RESULT_BLOCKS, FEATURE_RESULT_BLOCKS, build_formulation, shortage_cost
+from parameter_schema import write_parameters
+
+# Layout version of the name map next to every model file; bump when it changes
+MAP_VERSION = 1
+
+# Model file formats written by Gurobi; compressed MPS by default
+FORMATS = ["mps.gz", "mps", "lp.gz", "lp"]
+
+# Results of a batch solve, written into the solved directory
+RESULTS_FILE = "results.json"
+
+#-----------------------------------------
+
+# A scenario is exported as three files: the model (<scenario>.mps.gz), its name map (<scenario>.map.json) and its
+# parameters (<scenario>.params.json). The name map takes solver variable names back to (stage, SKU, period), so a
+# batch of files can be solved by any process with a solver, without building the formulation again.
+
+def _model_path(directory, scenario, file_format):
+    return os.path.join(directory, f"{scenario}.{file_format}")
+
+def _scenario_of(path):
+    name = os.path.basename(path)
+    for file_format in FORMATS:
+        if name.endswith("." + file_format):
+            return name[:-len(file_format) - 1]
+    raise ValueError(f"Unsupported model file {path}: use one of {', '.join(FORMATS)}")
+
+# Name map of a formulation: every variable of a reported block as [block, item, period], and the blocks that are
+# reported through another one (the stages of the compact formulation)
+def name_map(form, model_type, scenario, time_periods):
+    blocks = [b for b in RESULT_BLOCKS + FEATURE_RESULT_BLOCKS if b in form.var_blocks]
+    variables = {}
+    for block in blocks:
+        if block in form.aliases:
+            continue
+        index = form.var_blocks[block]
+        for i, item in enumerate(form.block_items[block]):
+            for t in range(index.shape[1]):
+                variables[form.var_names[index[i, t]]] = [block, item, t]
+    return {
+        'version': MAP_VERSION,
+        'scenario': scenario,
+        'model_type': model_type,
+        'periods': list(time_periods),
+        'blocks': {block: form.block_items[block] for block in blocks},
+        'aliases': {block: form.aliases[block] for block in blocks if block in form.aliases},
+        'variables': variables,
+    }
+
+# Write the model of one scenario, its name map and its parameters into directory
+def export_scenario(params, model_type, directory, scenario, time_periods=None, compact=False, file_format="mps.gz"):
+    from matrix_models import load_formulation
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported model file format {file_format}: use one of {', '.join(FORMATS)}")
+    os.makedirs(directory, exist_ok=True)
+    options = MODEL_OPTIONS[model_type]
+    time_periods = list(time_periods) if time_periods is not None else options['time_periods']
+    form = build_formulation(params, model_type, time_periods=time_periods, compact=compact)
+    model, _ = load_formulation(form)
+    model.write(_model_path(directory, scenario, file_format))
+    model.dispose()
+
+    mapping = name_map(form, model_type, scenario, time_periods)
+    if options['backorders']:
+        mapping['shortage_cost'] = shortage_cost(params)
+    with open(os.path.join(directory, f"{scenario}.map.json"), 'w') as f:
+        json.dump(mapping, f)
+    write_parameters(params, os.path.join(directory, f"{scenario}.params.json"))
+    return _model_path(directory, scenario, file_format)
+
+# Export every (model type, parameter set) pair, named like the scenarios of scenario_analysis
+def export_scenarios(param_sets, model_types, directory, time_periods=None, compact=False, file_format="mps.gz"):
+    from scenario_analysis import named_parameter_sets
+    paths = []
+    for model_type in model_types:
+        horizon = time_periods if time_periods is not None and model_type != "single_period" else None
+        for param_name, params in named_parameter_sets(param_sets):
+            paths.append(export_scenario(params, model_type, directory, f"{model_type}_{param_name}", time_periods=horizon, compact=compact, file_format=file_format))
+    return paths
+
+#-----------------------------------------
+
+# Results in the run_model_* layout from the solver variable names and values of a solved model file
+def map_solution(mapping, names, values):
+    arrays = {block: np.zeros((len(items), len(mapping['periods']))) for block, items in mapping['blocks'].items() if block not in mapping['aliases']}
+    positions = {block: {item: i for i, item in enumerate(items)} for block, items in mapping['blocks'].items()}
+    for name, value in zip(names, values):
+        target = mapping['variables'].get(name)
+        if target is not None:
+            block, item, t = target
+            arrays[block][positions[block][item], t] = value
+    for block, source in mapping['aliases'].items():
+        arrays[block] = arrays[source]
+    results = {}
+    for block, items in mapping['blocks'].items():
+        results[block] = {item: row.tolist() for item, row in zip(items, arrays[block])}
+    if 'shortage_cost' in mapping:
+        results['shortage_cost'] = mapping['shortage_cost']
+    return results
+
+# Solve one model file in a worker process and map its solution back. The plan is re-checked against the exported
+# parameters, the constraints against the model itself.
+def solve_file(path, time_limit=None, threads=None, quiet=True):
+    import gurobipy as gp
+    from gurobipy import GRB
+    from parameter_schema import load_parameters
+    from validation import model_constraint_report, check_plan, validation_report
+
+    scenario = _scenario_of(path)
+    directory = os.path.dirname(path)
+    with open(os.path.join(directory, f"{scenario}.map.json")) as f:
+        mapping = json.load(f)
+    record = {'scenario': scenario, 'model_type': mapping['model_type'], 'file': os.path.basename(path)}
+
+    start = time.perf_counter()
+    env = gp.Env(params={'OutputFlag': 0}) if quiet else None
+    model = gp.read(path, env=env) if env is not None else gp.read(path)
+    record['read_time'] = time.perf_counter() - start
+    if time_limit is not None:
+        model.Params.TimeLimit = time_limit
+    if threads:
+        model.Params.Threads = threads
+    start = time.perf_counter()
+    model.optimize()
+    record.update(solve_time=time.perf_counter() - start, status=model.Status)
+
+    if model.SolCount == 0 or model.Status in (GRB.INFEASIBLE, GRB.INF_OR_UNBD, GRB.UNBOUNDED):
+        results = {"status": "infeasible" if model.Status in (GRB.INFEASIBLE, GRB.INF_OR_UNBD) else f"no solution (status {model.Status})"}
+    else:
+        variables = model.getVars()
+        results = {'objective_value': model.ObjVal, **map_solution(mapping, model.getAttr("VarName", variables), model.getAttr("X", variables))}
+        params_path = os.path.join(directory, f"{scenario}.params.json")
+        plan_report = check_plan(load_parameters(params_path), results, mapping['model_type'], mapping['periods']) if os.path.exists(params_path) else {}
+        results['validation'] = validation_report(model_constraint_report(model), plan_report)
+        record['objective_value'] = model.ObjVal
+    model.dispose()
+    if env is not None:
+        env.dispose()
+    return scenario, results, record
+
+# Solve every model file of a directory in a pool of n_workers solver processes. The results are written to
+# results.json in the layout of scenario_analysis, and to a columnar store next to it.
+def solve_directory(directory, n_workers=1, time_limit=None, quiet=True, results_format="both"):
+    from scenario_analysis import solver_threads_per_worker
+    from results_store import save_results
+    paths = sorted(path for file_format in FORMATS for path in glob.glob(os.path.join(directory, f"*.{file_format}"))
+                   if _scenario_of(path) + "." + file_format == os.path.basename(path))
+    if not paths:
+        raise ValueError(f"No model files ({', '.join(FORMATS)}) in {directory}")
+
+    results, records = {}, []
+    if n_workers > 1:
+        threads = solver_threads_per_worker(n_workers)
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            solved = executor.map(solve_file, paths, [time_limit] * len(paths), [threads] * len(paths), [quiet] * len(paths))
+            for scenario, solution, record in solved:
+                results[scenario] = solution
+                records.append(record)
+                print(f"{scenario}: {solution.get('objective_value', solution.get('status'))}")
+    else:
+        for path in paths:
+            scenario, solution, record = solve_file(path, time_limit=time_limit, quiet=quiet)
+            results[scenario] = solution
+            records.append(record)
+            print(f"{scenario}: {solution.get('objective_value', solution.get('status'))}")
+
+    if results_format in ("json", "both"):
+        with open(os.path.join(directory, RESULTS_FILE), 'w') as f:
+            json.dump(results, f, indent=4)
+    if results_format in ("columnar", "both"):
+        save_results(os.path.join(directory, "results.results"), results)
+    return results, records
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export scenarios to model files, or solve a directory of model files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("export", help="write the model of every (model type, parameter set) pair")
+    command.add_argument("directory")
+    command.add_argument("sources", nargs="+", help="parameter_set_<n> of parameters.py or parameter files")
+    command.add_argument("--model-types", nargs="+", choices=list(MODEL_OPTIONS), default=["multi_period"])
+    command.add_argument("--periods", type=int, help="number of periods of the multi-period models")
+    command.add_argument("--compact", action="store_true", help="export the compact formulation")
+    command.add_argument("--format", choices=FORMATS, default="mps.gz")
+    command = commands.add_parser("solve", help="solve every model file of a directory")
+    command.add_argument("directory")
+    command.add_argument("--workers", type=int, default=os.cpu_count())
+    command.add_argument("--time-limit", type=float)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from main import load_parameter_set, parameter_set_name
+        sets = {parameter_set_name(source): load_parameter_set(source) for source in args.sources}
+        paths = export_scenarios(sets, args.model_types, args.directory, time_periods=list(range(1, args.periods + 1)) if args.periods else None,
+                                 compact=args.compact, file_format=args.format)
+        print(f"Exported {len(paths)} models to {args.directory}")
+    else:
+        solve_directory(args.directory, n_workers=args.workers, time_limit=args.time_limit)
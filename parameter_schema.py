@@ -0,0 +1,286 @@
+import csv
+import json
+import os
+from collections.abc import Mapping
+import numpy as np
+from formulation import STERILIZATION_B, shortage_cost
+
+#-----------------------------------------
+
+# Index set of every parameter: a 1-d array over that set, None for scalars. Demand is (sutures, periods).
+PARAMETER_SCHEMA = {
+    'InitialInventory': 'sutures',
+    'InitialRawInventory': 'raws',
+    'InitialNeedleInventory': 'needles',
+    'MaxCapacity': 'lines',
+    'MaxCapacity_m': 'machines',
+    'BatchSize': 'sutures',
+    'MaxEmployees': 'lines',
+    'MaxPackagingCapacity': 'pack_lines',
+    'SafetyStock': 'sutures',
+    'Demand': 'sutures',
+    'Price': 'sutures',
+    'ProdCost': 'sutures',
+    'LaborCost': 'lines',
+    'Cost_r': 'raws',
+    'NeedleCost': 'needles',
+    'PackagingCost': 'sutures',
+    'StorageCost': None,
+    'SterilizationCost': 'methods',
+    'CuttingCost': None,
+    'MaxRawInventory': 'raws',
+    'MaxNeedleInventory': 'needles',
+    'MinRawInventory': 'raws',
+    'MinNeedleInventory': 'needles',
+    'MaxFinishedInventory': 'sutures',
+    'ShortageCost': None,
+}
+
+# Parameter whose keys define each index set, in the order of the model
+INDEX_SETS = {
+    'sutures': 'Demand',
+    'raws': 'InitialRawInventory',
+    'needles': 'InitialNeedleInventory',
+    'lines': 'MaxCapacity',
+    'machines': 'MaxCapacity_m',
+    'pack_lines': 'MaxPackagingCapacity',
+    'methods': 'SterilizationCost',
+}
+
+# Parameters that must be strictly positive; every other parameter must be non-negative
+POSITIVE = ['BatchSize']
+
+# (lower, upper) limits that must be ordered item by item
+ORDERED = [('MinRawInventory', 'MaxRawInventory'), ('MinNeedleInventory', 'MaxNeedleInventory'), ('SafetyStock', 'MaxFinishedInventory')]
+
+#-----------------------------------------
+
+# Dense, read-only arrays of one parameter set, indexed by the index sets of the model. Validated once when it is
+# built; deltas only copy and re-check the parameters they change and share every other array with their base.
+# It also reads like the parameter dicts of parameters.py (params['Demand']['silk']), so it can be passed to
+# everything that takes a parameter dict.
+class ParameterSet(Mapping):
+
+    __slots__ = ('name', 'index', 'arrays', '_views')
+
+    def __init__(self, index, arrays, name=None, check=None):
+        self.name = name
+        self.index = index
+        self.arrays = arrays
+        self._views = {}
+        for array in arrays.values():
+            array.setflags(write=False)
+        self._validate(PARAMETER_SCHEMA if check is None else check)
+
+    # Compile a parameter dict in the layout of parameters.py
+    @classmethod
+    def from_dict(cls, params, name=None):
+        missing = [key for key in PARAMETER_SCHEMA if key not in params and key != 'ShortageCost']
+        if missing:
+            raise ValueError(f"Parameter validation failed: missing parameters {missing}")
+        index = {name: tuple(params[key]) for name, key in INDEX_SETS.items()}
+        arrays = {key: _array(key, params.get(key), index) for key in PARAMETER_SCHEMA}
+        return cls(index, arrays, name=name)
+
+    # Vectorized checks of the given parameters: shapes, finite values, signs and ordered limits
+    def _validate(self, keys):
+        try:
+            for key in keys:
+                array = self.arrays[key]
+                kind = PARAMETER_SCHEMA[key]
+                length = len(self.index[kind]) if kind is not None else None
+                assert kind is None or array.shape[0] == length, f"{key} must have one entry per {kind} ({length})"
+                assert np.isfinite(array).all(), f"{key} must be finite"
+                assert (array > 0).all() if key in POSITIVE else (array >= 0).all(), f"{key} must be {'positive' if key in POSITIVE else 'non-negative'}"
+            for low, high in ORDERED:
+                if low in keys or high in keys:
+                    assert (self.arrays[low] <= self.arrays[high]).all(), f"{low} must not exceed {high}"
+            if 'Demand' in keys:
+                assert self.arrays['Demand'].ndim == 2, "Demand must have the same number of periods for every suture type"
+            raws = set(self.index['raws'])
+            assert all(s + '_raw' in raws for s in self.index['sutures']), "Every suture type needs its raw material <suture>_raw"
+            assert {'A', 'B'} <= set(self.index['methods']), "SterilizationCost needs methods A and B"
+        except AssertionError as e:
+            raise ValueError(f"Parameter validation failed: {e}")
+
+    @property
+    def n_periods(self):
+        return self.arrays['Demand'].shape[1]
+
+    # Demand must cover the horizon
+    def check_horizon(self, time_periods):
+        if time_periods is not None and self.n_periods < max(time_periods):
+            raise ValueError(f"Parameter validation failed: Demand must cover all {max(time_periods)} periods of the horizon")
+
+    # New parameter set that overrides some parameters. Indexed parameters may be given for a subset of their items
+    # ({'Demand': {'silk': [...]}}); only the overridden arrays are copied and validated.
+    def with_delta(self, delta, name=None):
+        arrays = dict(self.arrays)
+        for key, value in delta.items():
+            if key not in PARAMETER_SCHEMA:
+                raise ValueError(f"Parameter validation failed: unknown parameter {key}")
+            kind = PARAMETER_SCHEMA[key]
+            if kind is None or not isinstance(value, Mapping):
+                arrays[key] = _array(key, value, self.index)
+                continue
+            array = np.array(arrays[key], dtype=float)
+            position = {item: i for i, item in enumerate(self.index[kind])}
+            for item, item_value in value.items():
+                if item not in position:
+                    raise ValueError(f"Parameter validation failed: {key} has no {kind[:-1]} {item}")
+                if key == 'Demand' and len(item_value) != array.shape[1]:
+                    raise ValueError(f"Parameter validation failed: Demand of {item} must have {array.shape[1]} periods")
+                array[position[item]] = item_value
+            arrays[key] = array
+        return ParameterSet(self.index, arrays, name=name, check=list(delta))
+
+    # Dense arrays of the model in the layout of formulation.compile_arrays, without going through dicts
+    def compile(self, time_periods):
+        a, index = self.arrays, self.index
+        raw_position = {r: i for i, r in enumerate(index['raws'])}
+        method = {m: i for i, m in enumerate(index['methods'])}
+        periods = np.asarray(time_periods)
+        data = {name: list(index[name]) for name in ['sutures', 'raws', 'needles', 'lines', 'machines', 'pack_lines']}
+        data['time_periods'] = list(time_periods)
+        data['raw_of'] = np.array([raw_position[s + '_raw'] for s in index['sutures']])
+        for key in PARAMETER_SCHEMA:
+            data[key] = float(a[key]) if PARAMETER_SCHEMA[key] is None else a[key]
+        data['Demand'] = a['Demand'][:, periods - 1]
+        data['SterilizationCost'] = a['SterilizationCost'][[method['B'] if s in STERILIZATION_B else method['A'] for s in index['sutures']]]
+        return data
+
+    # Parameter dict in the layout of parameters.py
+    def to_dict(self):
+        return {key: self[key] for key in PARAMETER_SCHEMA}
+
+    # Mapping interface: the dict view of a parameter is built once, on first access
+    def __getitem__(self, key):
+        if key not in self._views:
+            if key not in PARAMETER_SCHEMA:
+                raise KeyError(key)
+            array, kind = self.arrays[key], PARAMETER_SCHEMA[key]
+            self._views[key] = float(array) if kind is None else dict(zip(self.index[kind], array.tolist()))
+        return self._views[key]
+
+    def __iter__(self):
+        return iter(PARAMETER_SCHEMA)
+
+    def __len__(self):
+        return len(PARAMETER_SCHEMA)
+
+    def __repr__(self):
+        sizes = ", ".join(f"{len(items)} {kind}" for kind, items in self.index.items())
+        return f"ParameterSet({self.name!r}: {sizes}, {self.n_periods} periods)"
+
+# Dense array of one parameter value: dicts follow the order of their index set
+def _array(key, value, index):
+    kind = PARAMETER_SCHEMA[key]
+    if key == 'ShortageCost':
+        return np.array(shortage_cost({} if value is None else {'ShortageCost': value}))
+    if kind is None:
+        return np.array(float(value))
+    if not isinstance(value, Mapping):
+        raise ValueError(f"Parameter validation failed: {key} must map every {kind[:-1]} to a value")
+    missing = [item for item in index[kind] if item not in value]
+    if missing:
+        raise ValueError(f"Parameter validation failed: {key} is missing {missing}")
+    if key == 'Demand':
+        lengths = {len(value[item]) for item in index[kind]}
+        if len(lengths) > 1:
+            raise ValueError("Parameter validation failed: Demand must have the same number of periods for every suture type")
+    return np.array([value[item] for item in index[kind]], dtype=float)
+
+#-----------------------------------------
+
+# Base parameter set and named scenarios stored as deltas over it. Scenarios are compiled one at a time when they
+# are accessed, so thousands of them cost one base set plus their (small) deltas.
+class ScenarioSet(Mapping):
+
+    __slots__ = ('base', 'deltas')
+
+    def __init__(self, base, deltas):
+        self.base = base if isinstance(base, ParameterSet) else ParameterSet.from_dict(base)
+        self.deltas = dict(deltas)
+
+    def __getitem__(self, name):
+        return self.base.with_delta(self.deltas[name], name=name)
+
+    def __iter__(self):
+        return iter(self.deltas)
+
+    def __len__(self):
+        return len(self.deltas)
+
+#-----------------------------------------
+
+# Parameter dict from a JSON, YAML or CSV file. The CSV layout is long: one row per value with the columns
+# parameter, item, period, value (item empty for scalars, period only for Demand).
+def read_parameters(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        with open(path) as f:
+            return json.load(f)
+    if extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("Reading YAML parameter files requires PyYAML (pip install pyyaml)")
+        with open(path) as f:
+            return yaml.safe_load(f)
+    if extension == '.csv':
+        params = {}
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                key, item, period, value = row['parameter'], row['item'], row['period'], float(row['value'])
+                if not item:
+                    params[key] = value
+                elif period:
+                    demand = params.setdefault(key, {}).setdefault(item, [])
+                    demand.extend([0.0] * (int(period) - len(demand)))
+                    demand[int(period) - 1] = value
+                else:
+                    params.setdefault(key, {})[item] = value
+        return params
+    raise ValueError(f"Unsupported parameter file {path}: use .json, .yaml, .yml or .csv")
+
+# Validated parameter set from a file
+def load_parameters(path, name=None):
+    return ParameterSet.from_dict(read_parameters(path), name=name or os.path.splitext(os.path.basename(path))[0])
+
+# Scenario file (JSON or YAML) with a base parameter set, inline or as a path relative to the file,
+# and the deltas of the scenarios: {'base': ..., 'scenarios': {name: {parameter: value}}}
+def load_scenarios(path):
+    content = read_parameters(path)
+    base = content['base']
+    if isinstance(base, str):
+        base = load_parameters(os.path.join(os.path.dirname(path), base))
+    return ScenarioSet(base, content.get('scenarios', {}))
+
+# Write a parameter set (dict or ParameterSet) as JSON, YAML or CSV
+def write_parameters(params, path):
+    params = params.to_dict() if isinstance(params, ParameterSet) else {key: params[key] for key in PARAMETER_SCHEMA if key in params}
+    params['ShortageCost'] = shortage_cost(params)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        with open(path, 'w') as f:
+            json.dump(params, f, indent=4)
+    elif extension in ('.yaml', '.yml'):
+        import yaml
+        with open(path, 'w') as f:
+            yaml.safe_dump(params, f, sort_keys=False)
+    elif extension == '.csv':
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['parameter', 'item', 'period', 'value'])
+            for key, value in params.items():
+                if not isinstance(value, Mapping):
+                    writer.writerow([key, '', '', value])
+                    continue
+                for item, item_value in value.items():
+                    if isinstance(item_value, (list, tuple)):
+                        writer.writerows([key, item, t, v] for t, v in enumerate(item_value, start=1))
+                    else:
+                        writer.writerow([key, item, '', item_value])
+    else:
+        raise ValueError(f"Unsupported parameter file {path}: use .json, .yaml, .yml or .csv")
+    return path
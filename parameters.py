@@ -48,7 +48,7 @@ parameter_set_1 = {
     'MinRawInventory': {r: 50 for r in raw_material_types},
     'MinNeedleInventory': {n: 200 for n in needle_types},
     'MaxFinishedInventory': {s: 3000 for s in suture_types},
-    'ShortageCost': {4}
+    'ShortageCost': 4
 }
 
 #-----------------------------------------
@@ -95,7 +95,7 @@ parameter_set_2 = {
     'MinRawInventory': {r: 50 for r in raw_material_types},
     'MinNeedleInventory': {n: 200 for n in needle_types},
     'MaxFinishedInventory': {s: 3000 for s in suture_types},
-    'ShortageCost': {4}
+    'ShortageCost': 4
 }
 
 #-----------------------------------------
@@ -142,7 +142,7 @@ parameter_set_3 = {
     'MinRawInventory': {r: 50 for r in raw_material_types},
     'MinNeedleInventory': {n: 200 for n in needle_types},
     'MaxFinishedInventory': {s: 3000 for s in suture_types},
-    'ShortageCost': {4}    
+    'ShortageCost': 4    
 }
 
 #-----------------------------------------
@@ -189,7 +189,7 @@ parameter_set_4 = {
     'MinRawInventory': {r: 50 for r in raw_material_types},
     'MinNeedleInventory': {n: 200 for n in needle_types},
     'MaxFinishedInventory': {s: 3000 for s in suture_types},
-    'ShortageCost': {4}
+    'ShortageCost': 4
 }
 
 #-----------------------------------------
@@ -238,7 +238,7 @@ parameter_set_5 = {
     'MinRawInventory': {r: 50 for r in raw_material_types},
     'MinNeedleInventory': {n: 200 for n in needle_types},
     'MaxFinishedInventory': {s: 3000 for s in suture_types},
-    'ShortageCost': {4}
+    'ShortageCost': 4
 }
 
 #-----------------------------------------
@@ -285,7 +285,7 @@ parameter_set_6 = {
     'MinRawInventory': {r: 50 for r in raw_material_types},
     'MinNeedleInventory': {n: 200 for n in needle_types},
     'MaxFinishedInventory': {s: 3000 for s in suture_types},
-    'ShortageCost': {4}
+    'ShortageCost': 4
 }
 
 
@@ -0,0 +1,73 @@
+import sys
+import time
+from gurobipy import GRB
+from parameters import parameter_set_1, parameter_set_2, parameter_set_3, parameter_set_4, parameter_set_5, parameter_set_6
+from backends import BACKENDS
+
+# Parameter sets and model types compared between the solver backends
+PARITY_SETS = {
+    'parameter_set_1': parameter_set_1,
+    'parameter_set_2': parameter_set_2,
+    'parameter_set_3': parameter_set_3,
+    'parameter_set_4': parameter_set_4,
+    'parameter_set_5': parameter_set_5,
+    'parameter_set_6': parameter_set_6,
+}
+PARITY_MODEL_TYPES = ["multi_period", "multi_period_with_second_shift", "multi_period_with_backorder_penalty"]
+
+# Gurobi's presolve may stop at "infeasible or unbounded"; every model here has a bounded objective
+INFEASIBLE = (GRB.INFEASIBLE, GRB.INF_OR_UNBD)
+
+# Slack on the comparison of objective intervals, relative to the objective
+RELATIVE_TOLERANCE = 1e-6
+
+#-----------------------------------------
+
+# (status, objective, bound, seconds) of one scenario on one backend. A solve stopped by the time limit keeps its
+# incumbent and bound, so backends can be compared even when one of them cannot close the gap in time.
+def solve_interval(params, model_type, backend, time_limit):
+    factory = BACKENDS[backend].for_model_type(params, model_type)
+    start = time.perf_counter()
+    if backend == "gurobi":
+        model = factory.model
+        model.Params.OutputFlag = 0
+        model.Params.TimeLimit = time_limit
+        model.optimize()
+        status = model.Status
+        objective, bound = (model.ObjVal, model.ObjBound) if model.SolCount > 0 else (None, None)
+    else:
+        status = factory.solve(time_limit=time_limit)
+        objective, bound = factory.objective_value, factory.bound
+    return status, objective, bound, time.perf_counter() - start
+
+# Two backends agree when both find the scenario infeasible, or when their [objective, bound] intervals overlap,
+# i.e. there is an optimal value consistent with both solves
+def intervals_agree(first, second):
+    (status_a, objective_a, bound_a, _), (status_b, objective_b, bound_b, _) = first, second
+    if objective_a is None or objective_b is None:
+        return objective_a is None and objective_b is None and (status_a in INFEASIBLE) == (status_b in INFEASIBLE)
+    slack = RELATIVE_TOLERANCE * max(1.0, abs(objective_a))
+    return max(objective_a, objective_b) <= min(bound_a, bound_b) + slack
+
+#-----------------------------------------
+
+# Solve every (parameter set, model type) pair on each backend and compare it with the first backend
+def parity_check(backends=("gurobi", "highs"), param_sets=PARITY_SETS, model_types=PARITY_MODEL_TYPES, time_limit=60):
+    rows = []
+    for param_name, params in param_sets.items():
+        for model_type in model_types:
+            solved = [solve_interval(params, model_type, backend, time_limit) for backend in backends]
+            match = all(intervals_agree(solved[0], other) for other in solved[1:])
+            rows.append((param_name, model_type, solved, match))
+            columns = " ".join(f"{'infeasible' if objective is None else f'{objective:.2f}':>12} {'' if bound is None else f'{bound:.2f}':>12} {seconds:>7.2f}"
+                               for _, objective, bound, seconds in solved)
+            print(f"{param_name:<16} {model_type:<36} {columns}  {'ok' if match else 'MISMATCH'}")
+    return rows
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    backends = ("gurobi", "highs")
+    print(f"{'parameter set':<16} {'model type':<36} " + " ".join(f"{b + ' obj':>12} {b + ' bound':>12} {'[s]':>7}" for b in backends) + "  match")
+    rows = parity_check(backends)
+    sys.exit(0 if all(match for _, _, _, match in rows) else 1)
@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from formulation import DEFAULT_SHORTAGE_COST
+from results_store import ResultsStore, load_results
+
+# Bump when the look of the figures changes, so that every figure is rendered again
+PLOT_VERSION = 1
+
+# Input hashes of the rendered figures, kept next to them
+MANIFEST_FILE = "figures.json"
+
+#-----------------------------------------
+
+# Figures are rendered from small jobs (file name, kind, inputs) in worker processes on the Agg backend. A figure is
+# skipped when the hash of its kind and inputs matches the manifest, so re-plotting a sweep only renders what changed.
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def _finish(plt, path, xlabel, ylabel, title, periods=None, legend=True):
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    plt.title(title)
+    if legend and plt.gca().get_legend_handles_labels()[0]:
+        plt.legend()
+    if periods is not None:
+        plt.xticks(periods)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def _objective_values(plt, path, inputs):
+    plt.figure(figsize=(10, 6))
+    plt.bar(inputs['scenarios'], inputs['values'])
+    plt.xticks(rotation=45, ha="right")
+    _finish(plt, path, 'Parameter Set', 'Objective Value (Profit)', 'Comparison of Objective Values Across Models and Scenarios', legend=False)
+
+def _series(plt, path, inputs):
+    plt.figure(figsize=(10, 6))
+    for label, values in inputs['series'].items():
+        plt.plot(inputs['periods'], values, label=label)
+    _finish(plt, path, 'Month', inputs['ylabel'], inputs['title'], inputs['periods'])
+
+def _penalty(plt, path, inputs):
+    plt.figure(figsize=(10, 6))
+    bottom = np.zeros(len(inputs['periods']))
+    for label, values in inputs['series'].items():
+        if inputs['stacked']:
+            plt.bar(inputs['periods'], values, bottom=bottom, label=label)
+            bottom += np.asarray(values)
+        else:
+            plt.bar(inputs['periods'], values, label=label, alpha=0.7)
+    _finish(plt, path, 'Month', 'Shortage Penalty', inputs['title'], inputs['periods'])
+
+def _production_plan(plt, path, inputs):
+    plt.figure(figsize=(10, 6))
+    bottom = np.zeros(len(inputs['periods']))
+    for label, values in inputs['series'].items():
+        plt.bar(inputs['periods'], values, bottom=bottom, label=label)
+        bottom += np.asarray(values)
+    plt.legend(ncol=2, fontsize='small')
+    _finish(plt, path, 'Month', 'Production (Sterilization)', inputs['title'], inputs['periods'], legend=False)
+
+FIGURES = {
+    'objective_values': _objective_values,
+    'series': _series,
+    'penalty': _penalty,
+    'production_plan': _production_plan,
+}
+
+# Render one job in a worker process
+def render_figure(job):
+    path, kind, inputs = job
+    FIGURES[kind](_pyplot(), path, inputs)
+    return path
+
+#-----------------------------------------
+
+# Rows of a (scenario, item, period) array for plotting: scenarios without the item are drawn as zeros, as before
+def _rows(array):
+    array = np.asarray(array, dtype=float)
+    missing = np.isnan(array).all(axis=-1)
+    array = np.where(missing[..., None], 0.0, array)
+    return array
+
+def _file_name(text):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', text)
+
+# Figure jobs of a results store: objective values, production and shipping of every suture type across scenarios,
+# shortage penalties, second shift usage and the production plan of every scenario
+def figure_jobs(store, directory, run_no, shortage_cost=DEFAULT_SHORTAGE_COST, per_scenario=True):
+    scenarios = store.scenarios
+    periods = store.periods
+    prefix = os.path.join(directory, f"file_{run_no}_")
+    jobs = []
+
+    objective = np.nan_to_num(np.asarray(store.objective_values, dtype=float))
+    jobs.append((f"{prefix}objective_values.png", 'objective_values', {'scenarios': scenarios, 'values': objective.tolist()}))
+
+    if 'Sterilization' in store.items:
+        production = _rows(store['Sterilization'])
+        shipping = _rows(store['Shipping'])
+        for i, suture in enumerate(store.items['Sterilization']):
+            jobs.append((f"{prefix}total_production_{suture}.png", 'series', {
+                'periods': periods, 'series': dict(zip(scenarios, production[:, i].tolist())),
+                'ylabel': f'Total Production of {suture}', 'title': f'Total Production of {suture} Across Models and Scenarios'}))
+        for i, suture in enumerate(store.items['Shipping']):
+            jobs.append((f"{prefix}shipping_{suture}.png", 'series', {
+                'periods': periods, 'series': dict(zip(scenarios, shipping[:, i].tolist())),
+                'ylabel': f'Shipping of {suture}', 'title': f'Shipping of {suture} Over Time Across Models'}))
+
+        if per_scenario:
+            sutures = store.items['Sterilization']
+            for k, scenario in enumerate(scenarios):
+                if np.isnan(store.objective_values[k]):
+                    continue
+                jobs.append((f"{prefix}production_plan_{_file_name(scenario)}.png", 'production_plan', {
+                    'periods': periods, 'series': dict(zip(sutures, production[k].tolist())), 'title': f'Production Plan of {scenario}'}))
+
+    # Shortage penalty per scenario and period, summed over the suture types in one reduction. Every scenario uses the
+    # ShortageCost it was solved with; shortage_cost only covers results saved without it.
+    if 'Shortage' in store.items:
+        shortage = np.asarray(store['Shortage'], dtype=float)
+        with_shortage = ~np.isnan(shortage).all(axis=(1, 2))
+        costs = np.array([info.get('shortage_cost', shortage_cost) for info in store.metadata['info']], dtype=float)
+        penalty = costs[:, None] * np.nansum(shortage, axis=1)
+        series = {scenario: penalty[k].tolist() for k, scenario in enumerate(scenarios) if with_shortage[k]}
+        jobs.append((f"{prefix}stacked_shortage_penalty.png", 'penalty', {'periods': periods, 'series': series, 'stacked': True, 'title': 'Stacked Shortage Penalty Over Time'}))
+        jobs.append((f"{prefix}shortage_penalty.png", 'penalty', {'periods': periods, 'series': series, 'stacked': False, 'title': 'Shortage Penalty Over Time'}))
+
+    if 'SecondShift' in store.items and any("second_shift" in scenario for scenario in scenarios):
+        shift = _rows(store['SecondShift'])
+        series = {f"{scenario}_{line}": shift[k, i].tolist() for k, scenario in enumerate(scenarios) if "second_shift" in scenario
+                  for i, line in enumerate(store.items['SecondShift'])}
+        jobs.append((f"{prefix}second_shift_usage.png", 'series', {'periods': periods, 'series': series, 'ylabel': 'Second Shift Usage', 'title': 'Second Shift Usage Over Time (Both Lines)'}))
+    return jobs
+
+def job_hash(job):
+    _, kind, inputs = job
+    content = json.dumps({'version': PLOT_VERSION, 'kind': kind, 'inputs': inputs}, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+#-----------------------------------------
+
+# Results dict, results JSON file or columnar store directory as a store
+def as_store(results):
+    if isinstance(results, ResultsStore):
+        return results
+    if isinstance(results, dict):
+        return ResultsStore.from_results(results)
+    if os.path.isdir(results):
+        return load_results(results)
+    with open(results) as f:
+        return ResultsStore.from_results(json.load(f))
+
+# Render the figures of a set of results into directory, in a process pool when n_workers > 1. Figures whose inputs
+# are unchanged since the last run are skipped.
+def render_figures(results, directory, run_no, shortage_cost=DEFAULT_SHORTAGE_COST, n_workers=1, per_scenario=True):
+    os.makedirs(directory, exist_ok=True)
+    store = as_store(results)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    jobs, hashes = [], {}
+    for job in figure_jobs(store, directory, run_no, shortage_cost=shortage_cost, per_scenario=per_scenario):
+        name = os.path.basename(job[0])
+        hashes[name] = job_hash(job)
+        if manifest.get(name) != hashes[name] or not os.path.exists(job[0]):
+            jobs.append(job)
+
+    if n_workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            rendered = list(executor.map(render_figure, jobs, chunksize=max(1, len(jobs) // (4 * n_workers))))
+    else:
+        rendered = [render_figure(job) for job in jobs]
+
+    manifest.update(hashes)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    print(f"Rendered {len(rendered)} figures, {len(hashes) - len(rendered)} unchanged")
+    return rendered
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the figures of saved results")
+    parser.add_argument("results", help="results JSON file or columnar store directory")
+    parser.add_argument("--directory", help="output directory (default: next to the results)")
+    parser.add_argument("--run-no", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--no-per-scenario", dest="per_scenario", action="store_false", help="skip the production plan of every scenario")
+    args = parser.parse_args()
+    render_figures(args.results, args.directory or os.path.dirname(os.path.abspath(args.results)), args.run_no, n_workers=args.workers, per_scenario=args.per_scenario)
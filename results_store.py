@@ -0,0 +1,155 @@
+import json
+import os
+import numpy as np
+from formulation import RESULT_BLOCKS, FEATURE_RESULT_BLOCKS
+
+# Layout version of the store; bump when the file layout changes
+STORE_VERSION = 1
+
+METADATA_FILE = "metadata.json"
+
+#-----------------------------------------
+
+# Columnar results store: a directory with one .npy array per stage shaped (scenario, item, period), the objective
+# values as a (scenario,) array and a small JSON sidecar with the scenario names and the item and period labels.
+# Scenarios without a block (e.g. Shortage outside the backorder model), infeasible scenarios and shorter horizons
+# are padded with NaN. Plain .npy files are used instead of .npz because only they can be memory-mapped.
+
+# Scenario fields that are not time series and are kept in the sidecar
+def _info(results):
+    info = {key: value for key, value in results.items() if key not in RESULT_BLOCKS + FEATURE_RESULT_BLOCKS + ['objective_value', 'validation']}
+    if 'validation' in results:
+        validation = results['validation']
+        info['validation_ok'] = validation.get('ok')
+        info['violations'] = len(validation.get('constraint_violations', [])) + len(validation.get('plan_violations', []))
+    return info
+
+# Scenario names, sidecar fields, item positions per block and number of periods of a sequence of (name, results)
+def _layout(records):
+    names, infos, items, n_periods = [], [], {}, 0
+    for name, results in records:
+        names.append(name)
+        infos.append(_info(results))
+        for block in RESULT_BLOCKS + FEATURE_RESULT_BLOCKS:
+            for item, series in results.get(block, {}).items():
+                items.setdefault(block, {}).setdefault(item, len(items[block]))
+                n_periods = max(n_periods, len(series))
+    metadata = {
+        'version': STORE_VERSION,
+        'scenarios': names,
+        'items': {block: list(positions) for block, positions in items.items()},
+        'periods': list(range(1, n_periods + 1)),
+        'info': infos,
+    }
+    return metadata, items
+
+# Copy the results into NaN-initialised arrays laid out by _layout
+def _fill(arrays, objective, items, records):
+    for array in arrays.values():
+        array[:] = np.nan
+    objective[:] = np.nan
+    for index, (_, results) in enumerate(records):
+        if results.get('objective_value') is not None:
+            objective[index] = results['objective_value']
+        for block, array in arrays.items():
+            for item, series in results.get(block, {}).items():
+                array[index, items[block][item], :len(series)] = series
+
+# Write the (name, results) pairs produced by iterate() to a store. iterate is called twice, once to lay out the
+# arrays and once to fill them, so records can be streamed from disk without holding every scenario in memory.
+def _write(path, iterate):
+    os.makedirs(path, exist_ok=True)
+    metadata, items = _layout(iterate())
+    shape = (len(metadata['scenarios']), len(metadata['periods']))
+    arrays = {block: np.lib.format.open_memmap(os.path.join(path, f"{block}.npy"), mode='w+', dtype=np.float64, shape=(shape[0], len(positions), shape[1]))
+              for block, positions in items.items()}
+    objective = np.lib.format.open_memmap(os.path.join(path, "objective_value.npy"), mode='w+', dtype=np.float64, shape=(shape[0],))
+    _fill(arrays, objective, items, iterate())
+
+    for array in list(arrays.values()) + [objective]:
+        array.flush()
+    with open(os.path.join(path, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f)
+    return path
+
+# Save the {scenario: results} dict of a scenario analysis
+def save_results(path, results):
+    return _write(path, lambda: iter(results.items()))
+
+# Convert a sweep file (JSON lines) to a store without loading the whole sweep
+def save_sweep(sweep_path, path):
+    from sweep import read_sweep
+    return _write(path, lambda: ((record['scenario'], record) for record in read_sweep(sweep_path)))
+
+#-----------------------------------------
+
+# Read access to a store. Arrays are memory-mapped on first use, so slicing one stage of thousands of scenarios
+# only reads the pages that are touched and never builds per-scenario Python objects.
+class ResultsStore:
+
+    def __init__(self, path, mmap_mode='r', metadata=None, arrays=None):
+        self.path = path
+        self.mmap_mode = mmap_mode
+        if metadata is None:
+            with open(os.path.join(path, METADATA_FILE)) as f:
+                metadata = json.load(f)
+        self.metadata = metadata
+        if self.metadata['version'] != STORE_VERSION:
+            raise ValueError(f"Results store version {self.metadata['version']} is not supported (expected {STORE_VERSION})")
+        self.scenarios = self.metadata['scenarios']
+        self.items = self.metadata['items']
+        self.periods = self.metadata['periods']
+        self.index = {name: i for i, name in enumerate(self.scenarios)}
+        self._arrays = dict(arrays or {})
+
+    # The same arrays for a {scenario: results} dict, kept in memory
+    @classmethod
+    def from_results(cls, results):
+        metadata, items = _layout(results.items())
+        shape = (len(metadata['scenarios']), len(metadata['periods']))
+        arrays = {block: np.empty((shape[0], len(positions), shape[1])) for block, positions in items.items()}
+        objective = np.empty(shape[0])
+        _fill(arrays, objective, items, results.items())
+        return cls(None, metadata=metadata, arrays={**arrays, 'objective_value': objective})
+
+    @property
+    def blocks(self):
+        return list(self.items)
+
+    # (scenario, item, period) array of a stage
+    def __getitem__(self, block):
+        if block not in self._arrays:
+            if block != 'objective_value' and block not in self.items:
+                raise KeyError(block)
+            self._arrays[block] = np.load(os.path.join(self.path, f"{block}.npy"), mmap_mode=self.mmap_mode)
+        return self._arrays[block]
+
+    @property
+    def objective_values(self):
+        return self['objective_value']
+
+    # (scenario, period) time series of one item of a stage
+    def series(self, block, item):
+        return self[block][:, self.items[block].index(item), :]
+
+    # One scenario in the layout of the run_model_* results, without the NaN padding. Scenarios without an objective
+    # keep the status they were saved with (e.g. "infeasible", or "pruned" in a screened sweep).
+    def scenario(self, name):
+        index = self.index[name]
+        objective = float(self.objective_values[index])
+        if np.isnan(objective):
+            return {"status": self.metadata['info'][index].get('status', "infeasible")}
+        results = {'objective_value': objective}
+        for block, items in self.items.items():
+            values = np.asarray(self[block][index])
+            if np.isnan(values).all():
+                continue
+            results[block] = {item: row[~np.isnan(row)].tolist() for item, row in zip(items, values)}
+        return results
+
+    # All scenarios as {scenario: results}, e.g. for plot_scenario_analysis
+    def to_results(self):
+        return {name: self.scenario(name) for name in self.scenarios}
+
+def load_results(path, mmap_mode='r'):
+    return ResultsStore(path, mmap_mode=mmap_mode)
@@ -0,0 +1,84 @@
+from formulation import MODEL_OPTIONS, shortage_cost
+from matrix_models import RESULT_BLOCKS, FEATURE_RESULT_BLOCKS
+from backends import BACKENDS
+from models import validate_parameters
+from validation import check_plan, validation_report
+
+# Ending inventories carried into the next window as its initial inventories
+CARRIED_INVENTORIES = {
+    'FinishedInventory': 'InitialInventory',
+    'RawInventory': 'InitialRawInventory',
+    'NeedleInventory': 'InitialNeedleInventory',
+}
+
+#-----------------------------------------
+
+# Parameters of the window that starts after period `start`: demand shifted to the window and the carried inventories
+def window_parameters(params, start, length, inventories):
+    window = {**params, 'Demand': {s: list(demand[start:start + length]) for s, demand in params['Demand'].items()}}
+    for key, values in inventories.items():
+        window[key] = values
+    return window
+
+# Solve the horizon with overlapping windows of `window` periods. The first `step` periods of every window are fixed,
+# their ending inventories become the initial inventories of the next window, and the next window starts after them.
+# Windows of the same length share one model, moved from window to window as a diff of the demand and inventories,
+# so the solve time grows with the number of windows instead of with the size of one long MIP.
+def solve_rolling_horizon(params, model_type, n_periods, window=6, step=3, time_limit=None, threads=None, backend="gurobi", quiet=False, compact=False):
+    if not 0 < step <= window:
+        raise ValueError("The step of a rolling horizon must be between 1 and the window length")
+    validate_parameters(params, list(range(1, n_periods + 1)), model_type)
+    options = MODEL_OPTIONS[model_type]
+
+    factories = {}
+    inventories = {}
+    plan = {}
+    objective = 0.0
+    start = 0
+    while start < n_periods:
+        length = min(window, n_periods - start)
+        window_params = window_parameters(params, start, length, inventories)
+        if length not in factories:
+            factory = BACKENDS[backend](window_params, time_periods=list(range(1, length + 1)), units_per_employee=options['units_per_employee'], compact=compact)
+            factory.configure(second_shift=options['second_shift'], backorders=options['backorders'])
+            if hasattr(factory, 'model'):
+                factory.model.Params.OutputFlag = 0 if quiet else 1
+            factories[length] = factory
+        else:
+            factory = factories[length]
+            factory.update_parameters(window_params, warm_start=False)
+
+        # The last window is fixed completely
+        fixed = length if start + length >= n_periods else step
+        if hasattr(factory, 'model'):
+            if time_limit is not None:
+                factory.model.Params.TimeLimit = time_limit
+            if threads:
+                factory.model.Params.Threads = threads
+            factory.model.optimize()
+            status, solved = factory.model.Status, factory.model.SolCount > 0
+        else:
+            status = factory.solve(time_limit=time_limit, threads=threads)
+            solved = factory.x is not None
+        if not solved:
+            raise ValueError(f"Window of periods {start + 1}-{start + length} has no solution. Status code: {status}")
+
+        objective += factory.period_objective()[:fixed].sum()
+        results = factory.results()
+        for name in RESULT_BLOCKS + [b for b in FEATURE_RESULT_BLOCKS if b in results]:
+            block = plan.setdefault(name, {item: [] for item in results[name]})
+            for item, values in results[name].items():
+                block[item].extend(values[:fixed])
+        for name, key in CARRIED_INVENTORIES.items():
+            inventories[key] = {item: max(0.0, round(values[fixed - 1], 6)) for item, values in results[name].items()}
+
+        if not quiet:
+            print(f"Fixed periods {start + 1}-{start + fixed} of {n_periods}")
+        start += fixed
+
+    # The stitched plan is re-checked against the full horizon, including the inventories carried between windows
+    results = {'objective_value': float(objective), **plan}
+    if options['backorders']:
+        results['shortage_cost'] = shortage_cost(params)
+    results['validation'] = validation_report({}, check_plan(params, plan, model_type, list(range(1, n_periods + 1))))
+    return results
@@ -1,44 +1,96 @@
-import matplotlib.pyplot as plt
 import json
 import os
-import numpy as np
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from run_model import run_selected_model
-from parameters import parameter_set_1, parameter_set_2, parameter_set_3, parameter_set_4, parameter_set_5, parameter_set_6
+from rolling_horizon import solve_rolling_horizon
+from formulation import MODEL_OPTIONS
+from backends import BACKENDS
+from solve_cache import scenario_key
+from telemetry import TelemetryLog
+from results_store import save_results
+
+# Solver time limit of every scenario, in seconds
+TIME_LIMIT = 3600
+
+# Directory holding one file_<run> directory per run; relative to the working directory unless absolute
+RESULTS_DIR = "results"
 
 #-----------------------------------------
 
-def scenario_analysis(param_sets, run_no, model_types):
-    
-    results = {}
+# (name, params) pairs of the parameter sets of a run: a {name: params} dict, or a list of parameter sets named
+# after their variable in parameters.py (parameter_set_<n>), their ParameterSet name or their position
+def named_parameter_sets(param_sets):
+    if isinstance(param_sets, dict):
+        return list(param_sets.items())
+    import parameters
+    names = {id(value): name for name, value in vars(parameters).items() if name.startswith("parameter_set_")}
+    return [(names.get(id(params)) or getattr(params, 'name', None) or f"parameter_set_{i+1}", params) for i, params in enumerate(param_sets)]
+
+#-----------------------------------------
+
+# Split the machine's cores between the pool workers so parallel solves don't oversubscribe the CPU
+def solver_threads_per_worker(n_workers):
+    return max(1, (os.cpu_count() or 1) // n_workers)
+
+#-----------------------------------------
 
-    # Create a dictionary of parameter set names to actual parameter sets
-    param_sets_dict = {
-        'parameter_set_1': parameter_set_1,
-        # 'parameter_set_2': parameter_set_2
-        # 'parameter_set_3': parameter_set_3
-        # 'parameter_set_4': parameter_set_4
-        # 'parameter_set_5': parameter_set_5
-        'parameter_set_6': parameter_set_6
+# Run a single (model_type, parameter set) pair; top-level so it can be shipped to pool workers.
+# With a solve cache, scenarios that were solved before with the same inputs are returned without solving.
+# time_periods sets the horizon; rolling=(window, step) solves it with a rolling horizon instead of one model.
+# A telemetry dict is filled with the stage times and solver statistics of the scenario.
+# compact=True solves the compact formulation (formulation.add_core), with the same results.
+def run_scenario(model_type, param_name, params, directory, param_set_index, threads=None, factory=None, cache=None, time_limit=TIME_LIMIT, backend="gurobi",
+                 time_periods=None, rolling=None, telemetry=None, compact=False):
+    record = telemetry if telemetry is not None else {}
+    record.update(scenario=f"{model_type}_{param_name}", model_type=model_type, param_set=param_name, backend=backend, cached=False)
+    if cache is not None:
+        key = scenario_key(params, model_type, time_periods=time_periods, time_limit=time_limit, backend=backend, rolling=rolling, compact=compact)
+        results = cache.get(key)
+        if results is not None:
+            print(f"Cached {model_type} with {param_name}")
+            record.update(cached=True, objective_value=results.get('objective_value'))
+            return results
+    print(f"Running {model_type} with {param_name}")
+    try:
+        if rolling is not None:
+            n_periods = len(time_periods) if time_periods is not None else len(MODEL_OPTIONS[model_type]['time_periods'])
+            window, step = rolling
+            start = time.perf_counter()
+            results = solve_rolling_horizon(params, model_type, n_periods, window=window, step=step, time_limit=time_limit, threads=threads, backend=backend, compact=compact)
+            record.update(solve_time=time.perf_counter() - start, objective_value=results['objective_value'])
+        else:
+            results = run_selected_model(params, model_type, time_limit=time_limit, directory=directory, param_set_index=param_set_index, threads=threads, factory=factory,
+                                         backend=backend, time_periods=time_periods, telemetry=record, compact=compact)
+    except ValueError as e:
+        # Log the infeasible case and continue with the next parameter set
+        print(f"Error with {model_type} and {param_name}: {e}")
+        results = {"status": "infeasible"}
+    if cache is not None:
+        cache.put(key, results, model_type=model_type)
+    return results
+
+# run_scenario for pool workers: the telemetry record is sent back with the results
+def run_scenario_with_telemetry(*args, **kwargs):
+    record = {}
+    return run_scenario(*args, telemetry=record, **kwargs), record
 
-    }
+#-----------------------------------------
 
-    param_sets_list = list(param_sets_dict.items())
+# Solve every model type for the given parameter sets: a {name: params} dict or a list (see named_parameter_sets).
+# The results of the run are written to <results_dir>/file_<run_no>.
+def scenario_analysis(param_sets, run_no, model_types, n_workers=1, incremental=False, cache=None, backend="gurobi", time_periods=None, rolling=None, telemetry=True, results_format="both", compact=False,
+                      results_dir=RESULTS_DIR):
+    
+    results = {}
+
+    # Parameter sets of the run, named as in the results (e.g. multi_period_parameter_set_1)
+    param_sets_list = named_parameter_sets(param_sets)
 
     # Create directory for results if it doesn't exist
-    directory = f"/Users/johnkazantzidis/dev/gurobi/results/file_{run_no}"
+    directory = os.path.join(results_dir, f"file_{run_no}")
     os.makedirs(directory, exist_ok=True)
-    
-    for model_type in model_types:
-        for i, (param_name, params) in enumerate(param_sets_list):
-            print(f"Running {model_type} with {param_name}")
-            try:
-                result = run_selected_model(params, model_type, time_limit=3600, directory=directory, param_set_index=i+1)
-                results[f"{model_type}_{param_name}"] = result
-            except ValueError as e:
-                # Log the infeasible case and continue with the next parameter set
-                print(f"Error with {model_type} and {param_name}: {e}")
-                results[f"{model_type}_{param_name}"] = {"status": "infeasible"}
 
     # Create a unique filename
     now = datetime.now()
@@ -46,123 +98,89 @@ def scenario_analysis(param_sets, run_no, model_types):
     filename = f"{directory}/model-{timestamp}-{run_no}"
     results_filename = f"{filename}.json"
 
-    # Save results to a file
-    with open(results_filename, 'w') as f:
-        json.dump(results, f, indent=4)
+    # One telemetry record per scenario, written next to the results as soon as the scenario is done
+    telemetry_log = TelemetryLog(f"{directory}/telemetry-{timestamp}-{run_no}.jsonl") if telemetry else None
+
+    # Horizon of a model type: time_periods for the multi-period models, the single period model keeps its one period
+    def horizon(model_type):
+        return time_periods if time_periods is not None and model_type != "single_period" else MODEL_OPTIONS[model_type]['time_periods']
+
+    # factory_time is the time spent building a factory for this scenario outside run_model; it counts as build time
+    def solve(model_type, param_name, params, index, factory=None, factory_time=0.0):
+        record = {}
+        solution = run_scenario(model_type, param_name, params, directory, index, factory=factory, cache=cache, backend=backend,
+                                time_periods=horizon(model_type), rolling=rolling, telemetry=record, compact=compact)
+        if 'build_time' in record:
+            record['build_time'] += factory_time
+        if telemetry_log is not None:
+            telemetry_log.write(record)
+        return solution
+
+    # Every (model_type, parameter set) pair is an independent solve
+    scenarios = [(model_type, param_name, params, i+1) for model_type in model_types for i, (param_name, params) in enumerate(param_sets_list)]
+
+    if n_workers > 1:
+        # Process pool mode: each worker gets an equal share of the solver threads
+        threads = solver_threads_per_worker(n_workers)
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = {f"{model_type}_{param_name}": executor.submit(run_scenario_with_telemetry, model_type, param_name, params, directory, index, threads, cache=cache, backend=backend,
+                                                                       time_periods=horizon(model_type), rolling=rolling, compact=compact)
+                       for model_type, param_name, params, index in scenarios}
+            # Collect in submission order so the JSON layout matches a sequential run
+            for key, future in futures.items():
+                results[key], record = future.result()
+                if telemetry_log is not None:
+                    telemetry_log.write(record)
+    elif rolling is not None:
+        # Rolling horizon mode: every scenario is solved window by window
+        for model_type, param_name, params, index in scenarios:
+            results[f"{model_type}_{param_name}"] = solve(model_type, param_name, params, index)
+    elif incremental:
+        # Incremental mode: one model per model type; each parameter set is applied as a diff of the
+        # changed coefficients and re-optimized from the previous solution as MIP start
+        for model_type in model_types:
+            options = MODEL_OPTIONS[model_type]
+            start = time.perf_counter()
+            factory = BACKENDS[backend](param_sets_list[0][1], time_periods=horizon(model_type), units_per_employee=options['units_per_employee'], compact=compact)
+            factory_time = time.perf_counter() - start
+            for i, (param_name, params) in enumerate(param_sets_list):
+                results[f"{model_type}_{param_name}"] = solve(model_type, param_name, params, i+1, factory=factory, factory_time=factory_time if i == 0 else 0.0)
+    else:
+        # Sequential mode: the model types of a parameter set share one factory per horizon,
+        # so only the second shift and backorder blocks are swapped between them
+        solved = {}
+        for i, (param_name, params) in enumerate(param_sets_list):
+            factories = {}
+            for model_type in model_types:
+                options = MODEL_OPTIONS[model_type]
+                core = (tuple(horizon(model_type)), options['units_per_employee'])
+                # Cached scenarios don't need a model at all
+                cached = cache is not None and cache.get(scenario_key(params, model_type, time_periods=horizon(model_type), time_limit=TIME_LIMIT, backend=backend,
+                                                                      rolling=rolling, compact=compact)) is not None
+                factory_time = 0.0
+                if not cached and core not in factories:
+                    start = time.perf_counter()
+                    factories[core] = BACKENDS[backend](params, time_periods=horizon(model_type), units_per_employee=options['units_per_employee'], compact=compact)
+                    factory_time = time.perf_counter() - start
+                solved[f"{model_type}_{param_name}"] = solve(model_type, param_name, params, i+1, factory=None if cached else factories[core], factory_time=factory_time)
+        for model_type, param_name, params, index in scenarios:
+            results[f"{model_type}_{param_name}"] = solved[f"{model_type}_{param_name}"]
+
+    if cache is not None:
+        cache.evict()
+
+    # Save results to a file: nested JSON and/or a columnar store with one (scenario, item, period) array per stage
+    if results_format in ("json", "both"):
+        with open(results_filename, 'w') as f:
+            json.dump(results, f, indent=4)
+    if results_format in ("columnar", "both"):
+        save_results(f"{filename}.results", results)
     
     return results, directory
 
 #-----------------------------------------
 
-def plot_scenario_analysis(results, directory, run_no):
-
-    suture_types = ['propylen', 'polyamid', 'silk', 'polyester', 'profimed', 'steel', 'supramid', 'pga', 'pgla', 'rapid_pgla', 'monosorb', 'monofast']
-    ShortageCost = 4
-
-    # Objective Value comparison across scenarios
-    objective_values = {k: results[k].get('objective_value', 0) for k in results}
-    plt.figure(figsize=(10, 6))
-    plt.bar(objective_values.keys(), objective_values.values())
-    plt.xlabel('Parameter Set')
-    plt.ylabel('Objective Value (Profit)')
-    plt.title('Comparison of Objective Values Across Models and Scenarios')
-    plt.xticks(rotation=45, ha="right")
-    # plt.gca().autoscale(enable=True, axis='y', tight=True)  # Autoscale the y-axis
-    plt.tight_layout()
-    plt.savefig(os.path.join(directory, f"file_{run_no}_objective_values.png"))
-    plt.close()
-
-    # Compare Production of 'silk' across models
-    suture_type = 'silk'
-    final_stage = 'Sterilization'  # Use the final stage to reflect completed production
-    plt.figure(figsize=(10, 6))
-    for k in results:
-        production = results[k].get(final_stage, {}).get(suture_type, [0]*6)  # Directly fetch the values for 'Sterilization'
-        plt.plot(range(1, 7), production, label=k)
-    plt.xlabel('Month')
-    plt.ylabel(f'Total Production of {suture_type}')
-    plt.title(f'Total Production of {suture_type} Across Models and Scenarios')
-    plt.legend()
-    plt.xticks(range(1, 7))
-    plt.tight_layout()
-    plt.savefig(os.path.join(directory, f"file_{run_no}_total_production_{suture_type}.png"))
-    plt.close()
-
-    # Compare Shipping of 'silk' across models
-    plt.figure(figsize=(10, 6))
-    for k in results:
-        shipping = results[k].get('Shipping', {}).get(suture_type, [0]*6)[:6]
-        plt.plot(range(1, 7), shipping, label=k)
-    plt.xlabel('Month')
-    plt.ylabel(f'Shipping of {suture_type}')
-    plt.title(f'Shipping of {suture_type} Over Time Across Models')
-    plt.legend()
-    plt.xticks(range(1, 7))
-    plt.tight_layout()
-    plt.savefig(os.path.join(directory, f"file_{run_no}_shipping_{suture_type}.png"))
-    plt.close()
-
-
-    # Stacked Shortage Penalty Plot
-    plt.figure(figsize=(10, 6))
-    cumulative_penalty = np.zeros(6)  # Initialize an array to hold the cumulative penalties for stacked bars
-    for k in results:
-        if 'Shortage' in results[k]:
-            # Calculate shortage penalty for each month
-            shortage_penalty = [
-                sum( ShortageCost * results[k].get('Shortage', {}).get(s, [0]*6)[t] for s in suture_types) 
-                for t in range(6)
-            ]
-            # Plot shortage penalty over the months
-            plt.bar(range(1, 7), shortage_penalty, bottom=cumulative_penalty, label=k)
-            cumulative_penalty += shortage_penalty
-    plt.xlabel('Month')
-    plt.ylabel('Shortage Penalty')
-    plt.title('Stacked Shortage Penalty Over Time')
-    plt.legend()
-    plt.xticks(range(1, 7))
-    plt.tight_layout()
-    plt.savefig(os.path.join(directory, f"file_{run_no}_stacked_shortage_penalty.png"))
-    plt.close()
-
-
-    # Shortage Penalty Plot
-    plt.figure(figsize=(10, 6))
-    for k in results:
-        if 'Shortage' in results[k]:
-            # Calculate shortage penalty for each month
-            shortage_penalty = [
-                sum( ShortageCost * results[k].get('Shortage', {}).get(s, [0]*6)[t] for s in suture_types) 
-                for t in range(6)
-            ]
-            # Plot shortage penalty over the months
-            plt.bar(range(1, 7), shortage_penalty, label=k, alpha=0.7)
-    plt.xlabel('Month')
-    plt.ylabel('Shortage Penalty')
-    plt.title('Shortage Penalty Over Time')
-    plt.legend()
-    plt.xticks(range(1, 7))
-    plt.tight_layout()
-    plt.savefig(os.path.join(directory, f"file_{run_no}_shortage_penalty.png"))
-    plt.close()
-
-
-    # Plot second shift usage for both lines
-    if any("second_shift" in k for k in results):
-        plt.figure(figsize=(10, 6))
-        for k in results:
-            if "second_shift" in k:
-                second_shift_line1 = results[k].get('SecondShift', {}).get('line1', [0]*6)[:6]
-                second_shift_line2 = results[k].get('SecondShift', {}).get('line2', [0]*6)[:6]
-                plt.plot(range(1, 7), second_shift_line1, label=f"{k}_line1")
-                plt.plot(range(1, 7), second_shift_line2, label=f"{k}_line2")
-        plt.xlabel('Month')
-        plt.ylabel('Second Shift Usage')
-        plt.title('Second Shift Usage Over Time (Both Lines)')
-        plt.legend()
-        plt.xticks(range(1, 7))
-        plt.tight_layout()
-        plt.savefig(os.path.join(directory, f"file_{run_no}_second_shift_usage.png"))
-        plt.close()
-
-
+# Figures of a scenario analysis; rendered headless by plotting.py, in a process pool when n_workers > 1
+def plot_scenario_analysis(results, directory, run_no, n_workers=1):
+    from plotting import render_figures
+    return render_figures(results, directory, run_no, n_workers=n_workers)
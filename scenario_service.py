@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import getpass
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from formulation import MODEL_OPTIONS
+from validation import check_feasibility
+
+# Directory of the service: the queue database and one results file per job
+SERVICE_DIR = "service"
+DATABASE_FILE = "queue.sqlite"
+
+# Seconds between two looks at the queue, and at the events of a watched job
+POLL_INTERVAL = 0.5
+
+# Solver time limit of a job, in seconds
+TIME_LIMIT = 3600
+
+# At most one incumbent event per job and interval, in seconds; the final objective is always reported
+PROGRESS_INTERVAL = 1.0
+
+# Job states; queued and running jobs are pending, the others are final
+FINAL_STATES = ['done', 'infeasible', 'failed', 'cancelled']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, planner TEXT NOT NULL, model_type TEXT NOT NULL, base TEXT NOT NULL,
+    delta TEXT NOT NULL, options TEXT NOT NULL, status TEXT NOT NULL, submitted REAL NOT NULL, started REAL,
+    finished REAL, objective_value REAL, results TEXT, error TEXT);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, job INTEGER NOT NULL, time REAL NOT NULL, kind TEXT NOT NULL, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, planner, id);
+CREATE INDEX IF NOT EXISTS events_job ON events (job, id);
+"""
+
+#-----------------------------------------
+
+# The queue is a SQLite file, so planners submit and watch jobs from their own processes while one service solves
+# them. WAL mode lets the readers continue while a worker writes its progress.
+
+def connect(directory=SERVICE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(os.path.join(directory, DATABASE_FILE), timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+def add_event(connection, job, kind, **data):
+    connection.execute("INSERT INTO events (job, time, kind, data) VALUES (?, ?, ?, ?)", (job, time.time(), kind, json.dumps(data)))
+
+def _job(row):
+    job = dict(row)
+    job['delta'] = json.loads(job['delta'])
+    job['options'] = json.loads(job['options'])
+    return job
+
+# Parameter set of a job: a parameter_set_<n> of parameters.py or a parameter file, with the job's changes applied
+def job_parameters(base, delta):
+    from main import load_parameter_set
+    from parameter_schema import ParameterSet
+    params = load_parameter_set(base)
+    if not isinstance(params, ParameterSet):
+        params = ParameterSet.from_dict(params, name=base)
+    return params.with_delta(delta, name=params.name) if delta else params
+
+#-----------------------------------------
+
+# Queue a scenario: a base parameter set, the parameters it changes ({'LaborCost': {'line1': 30}}) and a model type.
+# The scenario is validated and screened for infeasibility (validation.check_feasibility) before it is queued, so a
+# planner sees a wrong delta, or one that leaves no feasible plan, at once. Returns the job id.
+def submit(base, model_type, delta=None, planner=None, directory=SERVICE_DIR, time_periods=None, time_limit=TIME_LIMIT, backend="gurobi", compact=False):
+    if model_type not in MODEL_OPTIONS:
+        raise ValueError(f"Unknown model type {model_type}: use one of {', '.join(MODEL_OPTIONS)}")
+    base = os.path.abspath(base) if os.path.exists(base) else base
+    delta = delta or {}
+    params = job_parameters(base, delta)
+    if time_periods is not None:
+        params.check_horizon(time_periods)
+    check_feasibility(params, model_type, time_periods)
+    options = {'time_periods': list(time_periods) if time_periods is not None else None, 'time_limit': time_limit, 'backend': backend, 'compact': compact}
+    connection = connect(directory)
+    try:
+        job = connection.execute("INSERT INTO jobs (planner, model_type, base, delta, options, status, submitted) VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+                                 (planner or getpass.getuser(), model_type, base, json.dumps(delta), json.dumps(options), time.time())).lastrowid
+        add_event(connection, job, 'queued')
+    finally:
+        connection.close()
+    return job
+
+# Cancel a job that has not started yet; returns whether it was cancelled
+def cancel(job, directory=SERVICE_DIR):
+    connection = connect(directory)
+    try:
+        cancelled = connection.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'", (time.time(), job)).rowcount > 0
+        if cancelled:
+            add_event(connection, job, 'finished', status='cancelled')
+    finally:
+        connection.close()
+    return cancelled
+
+def list_jobs(directory=SERVICE_DIR, planner=None, status=None):
+    connection = connect(directory)
+    try:
+        query, args = "SELECT * FROM jobs WHERE 1 = 1", []
+        if planner is not None:
+            query, args = query + " AND planner = ?", args + [planner]
+        if status is not None:
+            query, args = query + " AND status = ?", args + [status]
+        return [_job(row) for row in connection.execute(query + " ORDER BY id", args)]
+    finally:
+        connection.close()
+
+# Events of a job as they are written: queued, started, incumbent (runtime, objective, bound, gap) and finished.
+# Ends after the finished event.
+async def watch(job, directory=SERVICE_DIR, poll=POLL_INTERVAL):
+    connection = connect(directory)
+    try:
+        last = 0
+        while True:
+            rows = connection.execute("SELECT * FROM events WHERE job = ? AND id > ? ORDER BY id", (job, last)).fetchall()
+            for row in rows:
+                last = row['id']
+                event = {'job': job, 'time': row['time'], 'kind': row['kind'], **json.loads(row['data'])}
+                yield event
+                if row['kind'] == 'finished':
+                    return
+            await asyncio.sleep(poll)
+    finally:
+        connection.close()
+
+#-----------------------------------------
+
+# Claim the next job with fair scheduling between planners: the planner with the fewest running jobs goes first,
+# ties go to the planner that was served least recently, and each planner's jobs run in submission order.
+# The claim is one write transaction, so two services on the same queue never start the same job.
+def claim_job(connection):
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        row = connection.execute("""
+            SELECT j.* FROM jobs j WHERE j.status = 'queued' ORDER BY
+                (SELECT COUNT(*) FROM jobs r WHERE r.planner = j.planner AND r.status = 'running'),
+                COALESCE((SELECT MAX(s.started) FROM jobs s WHERE s.planner = j.planner), 0),
+                j.id
+            LIMIT 1""").fetchone()
+        if row is not None:
+            connection.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (time.time(), row['id']))
+            add_event(connection, row['id'], 'started')
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    return _job(row) if row is not None else None
+
+# Solve one job in a pool worker. Incumbent updates go straight from the solver callback to the queue database;
+# the results are written to results/job_<id>.json in the layout of scenario_analysis.
+def run_job(directory, job, threads=None):
+    from models import run_model
+    connection = connect(directory)
+    try:
+        row = _job(connection.execute("SELECT * FROM jobs WHERE id = ?", (job,)).fetchone())
+        options = row['options']
+        last = [0.0, None]
+
+        def progress(runtime, incumbent, bound, gap):
+            # Every new incumbent is reported; bound-only updates at most once per PROGRESS_INTERVAL
+            now = time.perf_counter()
+            if incumbent != last[1] or now - last[0] >= PROGRESS_INTERVAL:
+                last[:] = [now, incumbent]
+                add_event(connection, job, 'incumbent', runtime=runtime, objective_value=incumbent, bound=bound, gap=gap)
+
+        results_dir = os.path.join(directory, "results")
+        os.makedirs(results_dir, exist_ok=True)
+        record = {}
+        try:
+            params = job_parameters(row['base'], row['delta'])
+            results = run_model(params, row['model_type'], options['time_limit'], results_dir, f"job_{job}", threads=threads, backend=options['backend'],
+                                time_periods=options['time_periods'], telemetry=record, compact=options['compact'], progress=progress)
+            status, error = 'done', None
+        except (ValueError, OSError, SystemExit) as e:
+            # Solver statuses other than optimal raise ValueError and are reported as infeasible, like in scenario_analysis;
+            # parameters that no longer load or validate fail the job
+            infeasible = isinstance(e, ValueError) and not str(e).startswith("Parameter validation failed")
+            results, status, error = {"status": "infeasible" if infeasible else "failed"}, 'infeasible' if infeasible else 'failed', str(e)
+
+        path = os.path.join(results_dir, f"job_{job}.json")
+        with open(path, 'w') as f:
+            json.dump({f"{row['model_type']}_job_{job}": results}, f, indent=4)
+        summary = {'status': status, 'objective_value': results.get('objective_value'), 'results': path, 'error': error,
+                   'build_time': record.get('build_time'), 'solve_time': record.get('solve_time')}
+        connection.execute("UPDATE jobs SET status = ?, finished = ?, objective_value = ?, results = ?, error = ? WHERE id = ?",
+                           (status, time.time(), summary['objective_value'], path, error, job))
+        add_event(connection, job, 'finished', **summary)
+        return summary
+    finally:
+        connection.close()
+
+#-----------------------------------------
+
+# Local scenario service: claims queued jobs fairly and solves them in a bounded pool of solver processes, each with
+# an equal share of the cores. Jobs left running by a stopped service are queued again when it starts.
+class ScenarioService:
+
+    def __init__(self, directory=SERVICE_DIR, n_workers=1):
+        from scenario_analysis import solver_threads_per_worker
+        self.directory = directory
+        self.n_workers = n_workers
+        self.threads = solver_threads_per_worker(n_workers)
+        self.connection = connect(directory)
+        requeued = self.connection.execute("UPDATE jobs SET status = 'queued', started = NULL WHERE status = 'running'").rowcount
+        if requeued:
+            print(f"Queued {requeued} interrupted jobs again")
+
+    async def _run(self, executor, job):
+        loop = asyncio.get_running_loop()
+        print(f"Job {job['id']} ({job['planner']}): {job['model_type']} on {os.path.basename(job['base'])}")
+        try:
+            summary = await loop.run_in_executor(executor, run_job, self.directory, job['id'], self.threads)
+        except Exception as e:
+            # A crashed worker must not stop the service; the job is marked failed
+            self.connection.execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE id = ?", (time.time(), repr(e), job['id']))
+            add_event(self.connection, job['id'], 'finished', status='failed', error=repr(e))
+            summary = {'status': 'failed'}
+        print(f"Job {job['id']}: {summary['status']} {summary.get('objective_value') or ''}")
+        return summary
+
+    # Serve until cancelled; with until_idle=True, stop once the queue is empty and every job is finished
+    async def serve(self, until_idle=False):
+        running = set()
+        with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+            try:
+                while True:
+                    while len(running) < self.n_workers:
+                        job = claim_job(self.connection)
+                        if job is None:
+                            break
+                        running.add(asyncio.ensure_future(self._run(executor, job)))
+                    if until_idle and not running:
+                        return
+                    if running:
+                        _, running = await asyncio.wait(running, timeout=POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+                    else:
+                        await asyncio.sleep(POLL_INTERVAL)
+            finally:
+                if running:
+                    await asyncio.gather(*running, return_exceptions=True)
+
+    def close(self):
+        self.connection.close()
+
+#-----------------------------------------
+
+def _print_event(event):
+    if event['kind'] == 'incumbent':
+        objective = f"{event['objective_value']:.2f}" if event['objective_value'] is not None else "-"
+        gap = f"{event['gap']:.2e}" if event['gap'] is not None else "-"
+        print(f"job {event['job']} {event['runtime']:8.2f}s incumbent {objective} bound {event['bound']:.2f} gap {gap}")
+    else:
+        details = {key: value for key, value in event.items() if key not in ('job', 'time', 'kind') and value is not None}
+        print(f"job {event['job']} {event['kind']} {json.dumps(details) if details else ''}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local scenario service: a shared job queue solved by a pool of solver processes")
+    parser.add_argument("--directory", default=SERVICE_DIR, help="queue and results directory (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("serve", help="solve queued jobs until interrupted")
+    command.add_argument("--workers", type=int, default=os.cpu_count())
+    command.add_argument("--until-idle", action="store_true", help="stop when the queue is empty")
+    command = commands.add_parser("submit", help="queue a scenario")
+    command.add_argument("base", help="parameter_set_<n> of parameters.py or a parameter file")
+    command.add_argument("--model-type", choices=list(MODEL_OPTIONS), default="multi_period")
+    command.add_argument("--delta", default="{}", help='changed parameters as JSON, e.g. {"LaborCost": {"line1": 30}}, or a JSON/YAML file')
+    command.add_argument("--planner", help="name used for fair scheduling (default: the user name)")
+    command.add_argument("--periods", type=int, help="number of periods of the multi-period models")
+    command.add_argument("--time-limit", type=float, default=TIME_LIMIT)
+    command.add_argument("--backend", choices=["gurobi", "highs"], default="gurobi")
+    command.add_argument("--compact", action="store_true")
+    command.add_argument("--watch", action="store_true", help="stream the progress of the job")
+    command = commands.add_parser("watch", help="stream the progress of a job")
+    command.add_argument("job", type=int)
+    command = commands.add_parser("list", help="list the jobs")
+    command.add_argument("--planner")
+    command.add_argument("--status", choices=['queued', 'running'] + FINAL_STATES)
+    command = commands.add_parser("cancel", help="cancel a queued job")
+    command.add_argument("job", type=int)
+    args = parser.parse_args()
+
+    async def stream(job):
+        async for event in watch(job, directory=args.directory):
+            _print_event(event)
+
+    if args.command == "serve":
+        service = ScenarioService(args.directory, n_workers=args.workers)
+        try:
+            asyncio.run(service.serve(until_idle=args.until_idle))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.close()
+    elif args.command == "submit":
+        if os.path.exists(args.delta):
+            from parameter_schema import read_parameters
+            delta = read_parameters(args.delta)
+        else:
+            delta = json.loads(args.delta)
+        job = submit(args.base, args.model_type, delta=delta, planner=args.planner, directory=args.directory,
+                     time_periods=list(range(1, args.periods + 1)) if args.periods else None, time_limit=args.time_limit, backend=args.backend, compact=args.compact)
+        print(f"Queued job {job}")
+        if args.watch:
+            asyncio.run(stream(job))
+    elif args.command == "watch":
+        asyncio.run(stream(args.job))
+    elif args.command == "list":
+        for job in list_jobs(args.directory, planner=args.planner, status=args.status):
+            objective = f"{job['objective_value']:.2f}" if job['objective_value'] is not None else ""
+            print(f"{job['id']:>5} {job['planner']:<12} {job['status']:<10} {job['model_type']:<40} {os.path.basename(job['base']):<24} {objective:>12} {json.dumps(job['delta'])}")
+    else:
+        print(f"Cancelled job {args.job}" if cancel(args.job, directory=args.directory) else f"Job {args.job} is not queued")
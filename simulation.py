@@ -0,0 +1,162 @@
+import json
+import os
+import time
+import numpy as np
+from formulation import shortage_cost
+
+# Trajectories of the default simulation and the standard deviation of their log demand factor
+N_TRAJECTORIES = 100_000
+DEMAND_SPREAD = 0.2
+
+# Trajectories simulated at once; bounds the memory of a simulation to a few (CHUNK, sutures) arrays per period
+CHUNK = 20_000
+
+# Percentiles reported for the distributions over the trajectories
+PERCENTILES = [5, 50, 95]
+
+# Units an inventory may be off its limit before it counts as a violation
+INVENTORY_TOLERANCE = 1e-6
+
+#-----------------------------------------
+
+# (n, sutures, periods) demand trajectories: every suture type and period of the planned demand scaled by an
+# independent lognormal factor with mean 1 and the given log standard deviation, rounded to whole units
+def sample_demand(demand, n, spread=DEMAND_SPREAD, rng=None):
+    rng = np.random.default_rng(rng)
+    demand = np.asarray(demand, dtype=float)
+    return np.rint(demand * np.exp(rng.normal(-spread ** 2 / 2, spread, (n,) + demand.shape)))
+
+def _distribution(values):
+    return {'mean': float(values.mean()), 'std': float(values.std()), **{f"p{q}": float(v) for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}}
+
+def _plan_array(results, block, items, n_periods):
+    return np.array([results[block][item][:n_periods] for item in items], dtype=float)
+
+# Replay a solved plan (results of run_model_* or of a saved run) against demand trajectories. Production and orders
+# are executed as planned; every period ships what the demand asks for from the finished stock, and demand that the
+# stock cannot serve is lost, as in the backorder model. trajectories are (n, sutures, periods) demands; without them
+# n_trajectories are sampled around the demand of params (sample_demand).
+# Reports the fill rate, the shortage cost (ShortageCost per unit short), the stockout probability and expected
+# shortage per suture type, how often the finished stock falls below the safety stock or exceeds its maximum, the
+# raw material and needle inventories of the plan outside their limits, and the operating profit of the plan under
+# every trajectory. Trajectories are simulated in chunks of whole-array operations, one step per period.
+# keep_safety_stock=True ships only the stock above the safety stock, as the models do (see replay_plan).
+def simulate_plan(params, results, n_trajectories=N_TRAJECTORIES, spread=DEMAND_SPREAD, seed=0, trajectories=None, chunk=CHUNK, keep_safety_stock=False):
+    if 'Sterilization' not in results or 'Shipping' not in results:
+        raise ValueError("Only solved plans can be simulated: the results have no Sterilization and Shipping")
+    start = time.perf_counter()
+    sutures = list(params['Demand'])
+    n_periods = len(results['Shipping'][sutures[0]])
+    finished = _plan_array(results, 'Sterilization', sutures, n_periods)
+    planned_shipping = _plan_array(results, 'Shipping', sutures, n_periods)
+    initial = np.array([params['InitialInventory'][s] for s in sutures], dtype=float)
+    safety = np.array([params['SafetyStock'][s] for s in sutures], dtype=float)
+    maximum = np.array([params['MaxFinishedInventory'][s] for s in sutures], dtype=float)
+    price = np.array([params['Price'][s] for s in sutures], dtype=float)
+    storage, penalty = float(params['StorageCost']), shortage_cost(params)
+    planned_demand = np.array([params['Demand'][s][:n_periods] for s in sutures], dtype=float)
+    if trajectories is not None:
+        trajectories = np.asarray(trajectories, dtype=float)
+        if trajectories.shape[1:] != (len(sutures), n_periods):
+            raise ValueError(f"Demand trajectories must be (n, {len(sutures)} sutures, {n_periods} periods), not {trajectories.shape}")
+        n_trajectories = trajectories.shape[0]
+    rng = np.random.default_rng(seed)
+
+    # Profit of the plan as solved, without the terms the demand changes: revenue, storage of finished goods and the
+    # shortage penalty of backorder plans, which is charged again for the simulated shortage
+    planned_inventory = initial[:, None] + np.cumsum(finished - planned_shipping, axis=1)
+    fixed_profit = results['objective_value'] - price @ planned_shipping.sum(axis=1) + storage * planned_inventory.sum()
+    if 'Shortage' in results:
+        fixed_profit += penalty * _plan_array(results, 'Shortage', sutures, n_periods).sum()
+
+    shipped = np.zeros(len(sutures))
+    short = np.zeros(len(sutures))
+    stockouts = np.zeros(len(sutures))
+    below = np.zeros(len(sutures))
+    above = np.zeros(len(sutures))
+    any_stockout = 0
+    shortage_costs, profits = np.empty(n_trajectories), np.empty(n_trajectories)
+    for first in range(0, n_trajectories, chunk):
+        n = min(chunk, n_trajectories - first)
+        demand = trajectories[first:first + n] if trajectories is not None else sample_demand(planned_demand, n, spread, rng)
+        inventory = np.broadcast_to(initial, (n, len(sutures))).copy()
+        chunk_shipped = np.zeros((n, len(sutures)))
+        chunk_short = np.zeros((n, len(sutures)))
+        stocked = np.zeros((n, len(sutures)))
+        stockout = np.zeros((n, len(sutures)), dtype=bool)
+        low = np.zeros((n, len(sutures)), dtype=bool)
+        high = np.zeros((n, len(sutures)), dtype=bool)
+        for t in range(n_periods):
+            inventory += finished[:, t]
+            ship = np.minimum(demand[:, :, t], np.maximum(inventory - safety, 0.0) if keep_safety_stock else inventory)
+            inventory -= ship
+            missing = demand[:, :, t] - ship
+            chunk_shipped += ship
+            chunk_short += missing
+            stocked += inventory
+            stockout |= missing > 0
+            low |= inventory < safety - INVENTORY_TOLERANCE
+            high |= inventory > maximum + INVENTORY_TOLERANCE
+        shipped += chunk_shipped.sum(axis=0)
+        short += chunk_short.sum(axis=0)
+        stockouts += stockout.sum(axis=0)
+        below += low.sum(axis=0)
+        above += high.sum(axis=0)
+        any_stockout += int(stockout.any(axis=1).sum())
+        shortage_costs[first:first + n] = penalty * chunk_short.sum(axis=1)
+        profits[first:first + n] = fixed_profit + chunk_shipped @ price - storage * stocked.sum(axis=1)
+        if 'Shortage' in results:
+            profits[first:first + n] -= shortage_costs[first:first + n]
+
+    demanded = shipped + short
+    report = {
+        'n_trajectories': n_trajectories,
+        'fill_rate': float(shipped.sum() / demanded.sum()) if demanded.sum() > 0 else 1.0,
+        'stockout_probability': any_stockout / n_trajectories,
+        'shortage_cost': _distribution(shortage_costs),
+        'profit': _distribution(profits),
+        'planned_profit': results['objective_value'],
+        'sutures': {s: {'fill_rate': float(shipped[i] / demanded[i]) if demanded[i] > 0 else 1.0,
+                        'stockout_probability': float(stockouts[i] / n_trajectories),
+                        'expected_shortage': float(short[i] / n_trajectories),
+                        'below_safety_stock_probability': float(below[i] / n_trajectories),
+                        'above_max_inventory_probability': float(above[i] / n_trajectories)} for i, s in enumerate(sutures)},
+        'inventory_violations': _plan_violations(params, results, n_periods),
+    }
+    report['simulation_time'] = time.perf_counter() - start
+    return report
+
+# Profit of the plan replayed against its own planned demand, shipping as the models do, with the safety stock kept.
+# A plan of any model type reproduces its objective_value; returns (replayed profit, objective_value).
+def replay_plan(params, results):
+    sutures = list(params['Demand'])
+    n_periods = len(results['Shipping'][sutures[0]])
+    planned_demand = np.array([[params['Demand'][s][:n_periods] for s in sutures]], dtype=float)
+    report = simulate_plan(params, results, trajectories=planned_demand, keep_safety_stock=True)
+    return report['profit']['mean'], results['objective_value']
+
+# Periods in which the raw material and needle inventories of the plan are outside their limits; the demand does not
+# change them, so they hold for every trajectory. Plans saved without inventories have none to check.
+def _plan_violations(params, results, n_periods):
+    violations = {}
+    for block, low_key, high_key in [('RawInventory', 'MinRawInventory', 'MaxRawInventory'), ('NeedleInventory', 'MinNeedleInventory', 'MaxNeedleInventory')]:
+        if block not in results:
+            continue
+        for item, values in results[block].items():
+            values = np.asarray(values[:n_periods], dtype=float)
+            periods = np.flatnonzero((values < params[low_key][item] - INVENTORY_TOLERANCE) | (values > params[high_key][item] + INVENTORY_TOLERANCE))
+            if periods.size:
+                violations.setdefault(block, {})[item] = (periods + 1).tolist()
+    return violations
+
+#-----------------------------------------
+
+# Solved plans of a results file: a run of scenario_analysis ({scenario: results}, JSON or columnar store) or a
+# single plan (main.py plan --output)
+def load_plans(path):
+    if os.path.isdir(path):
+        from results_store import load_results
+        return load_results(path).to_results()
+    with open(path) as f:
+        results = json.load(f)
+    return {os.path.splitext(os.path.basename(path))[0]: results} if 'objective_value' in results or 'status' in results else results
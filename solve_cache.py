@@ -0,0 +1,156 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections.abc import Mapping
+import numpy as np
+import gurobipy as gp
+from formulation import MODEL_OPTIONS
+
+# Bump when the formulation changes in a way that changes the solutions of unchanged scenarios, or when the results
+# gain or change keys (2: validation report and shortage_cost), so older entries are not served
+CACHE_VERSION = 2
+
+# Default location and limits of the solve cache
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solve_cache")
+MAX_CACHE_BYTES = 512 * 1024**2
+MAX_CACHE_AGE = 30 * 24 * 3600  # seconds
+
+#-----------------------------------------
+
+# Canonical JSON form of a parameter value: dict keys as sorted strings, sets and tuples as (sorted) lists
+# and every number as a float, so that 4, 4.0 and np.int64(4) hash the same
+def normalize(value):
+    if isinstance(value, Mapping):
+        return {str(k): normalize(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (set, frozenset)):
+        return sorted((normalize(v) for v in value), key=repr)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [normalize(v) for v in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    return value
+
+# Stable hash of everything that determines the result of a solve
+def scenario_key(params, model_type, time_periods=None, time_limit=None, backend="gurobi", rolling=None, compact=False):
+    if time_periods is None:
+        time_periods = MODEL_OPTIONS[model_type]['time_periods']
+    content = {
+        'version': CACHE_VERSION,
+        'backend': backend,
+        'gurobi': list(gp.gurobi.version()),
+        'model_type': model_type,
+        'time_periods': [int(t) for t in time_periods],
+        'time_limit': time_limit,
+        'rolling': list(rolling) if rolling is not None else None,
+        'compact': bool(compact),
+        'params': normalize(params),
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+#-----------------------------------------
+
+# Content-addressed store of solve results, one JSON file per scenario key. Entries are evicted oldest-used
+# first once the cache grows beyond max_bytes, and entries not used for max_age seconds are dropped.
+class SolveCache:
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, max_age=MAX_CACHE_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    # Cached results of a scenario, or None; a hit refreshes the entry's last use
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        os.utime(path)
+        return entry['results']
+
+    # Store the results of a scenario; written to a temporary file first so parallel workers never see partial entries
+    def put(self, key, results, model_type=None):
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump({'key': key, 'model_type': model_type, 'created': time.time(), 'results': results}, f)
+        os.replace(temporary, path)
+
+    # (path, size, last use) of every entry, least recently used first
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    # Drop entries older than max_age, then the least recently used ones until the cache fits in max_bytes
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.max_age if self.max_age is not None else None
+        removed = 0
+        for path, size, last_use in entries:
+            expired = cutoff is not None and last_use < cutoff
+            oversized = self.max_bytes is not None and total > self.max_bytes
+            if not (expired or oversized):
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    # Remove cached results: one key, every entry of a model type, or the whole cache
+    def invalidate(self, key=None, model_type=None):
+        if key is not None:
+            paths = [self._path(key)] if os.path.exists(self._path(key)) else []
+        elif model_type is not None:
+            paths = []
+            for path, _, _ in self.entries():
+                with open(path) as f:
+                    if json.load(f).get('model_type') == model_type:
+                        paths.append(path)
+        else:
+            paths = [path for path, _, _ in self.entries()]
+        for path in paths:
+            os.remove(path)
+        return len(paths)
+
+    # Number of entries and their total size in bytes
+    def stats(self):
+        entries = self.entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect, evict or invalidate the solve cache")
+    parser.add_argument("command", choices=["info", "evict", "invalidate"])
+    parser.add_argument("--dir", default=CACHE_DIR, help="cache directory")
+    parser.add_argument("--model-type", choices=list(MODEL_OPTIONS), help="only invalidate the entries of this model type")
+    parser.add_argument("--key", help="only invalidate this scenario key")
+    parser.add_argument("--max-mb", type=float, default=MAX_CACHE_BYTES / 1024**2, help="size limit for evict")
+    parser.add_argument("--max-days", type=float, default=MAX_CACHE_AGE / (24 * 3600), help="age limit for evict")
+    args = parser.parse_args()
+
+    cache = SolveCache(args.dir, max_bytes=args.max_mb * 1024**2, max_age=args.max_days * 24 * 3600)
+    if args.command == "evict":
+        print(f"Evicted {cache.evict()} entries")
+    elif args.command == "invalidate":
+        print(f"Invalidated {cache.invalidate(key=args.key, model_type=args.model_type)} entries")
+    count, size = cache.stats()
+    print(f"{count} entries, {size / 1024**2:.1f} MB in {args.dir}")
@@ -0,0 +1,340 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from formulation import build_formulation, shortage_cost
+from matrix_models import solution_to_results
+from parameter_schema import ParameterSet, ScenarioSet
+from simulation import DEMAND_SPREAD, sample_demand
+
+# Two-stage stochastic backorder model: the raw material and needle orders are decided before demand is known and
+# shared by every scenario; production, shipping, inventories and shortages are the recourse of each scenario.
+MODEL_TYPE = "multi_period_with_backorder_penalty"
+FIRST_STAGE = ["OrderQuantityRaw", "OrderQuantityNeedles"]
+
+# Progressive hedging: the proximal penalty rho/2 (Q - consensus)^2 of every order column is its unit cost over the
+# spread of its orders in the first iteration, times RHO_FACTOR (cost-proportional rho)
+RHO_FACTOR = 3.0
+MAX_ITERATIONS = 50
+
+# Gurobi adds the proximal penalty as an exact quadratic term, so its subproblems are MIQPs. HiGHS solves no MIQPs:
+# there the penalty is piecewise linear on each side of the consensus, so its subproblems stay MILPs: SEGMENTS pieces,
+# exact at their breakpoints, each twice as wide as the one before. The first is a quarter of the first spread wide,
+# so the pieces cover 2^SEGMENTS / 4 spreads before the last one continues linearly.
+SEGMENTS = 8
+
+# Expected L1 distance of the scenario orders from the consensus, relative to the consensus orders
+CONVERGENCE_TOLERANCE = 1e-3
+
+# Relative MIP gap of every subproblem. The hedging terms are small next to the profit of a scenario, so a looser gap
+# lets the subproblems return orders that ignore them and the iterations stop converging.
+MIP_GAP = 1e-4
+SUBPROBLEM_TIME_LIMIT = 60
+
+# Directory of the stored stochastic runs
+STOCHASTIC_DIR = "stochastic"
+
+#-----------------------------------------
+
+# Scenarios are a ScenarioSet (base parameters plus one delta per scenario) and a probability per scenario name
+
+# Equally likely scenarios with lognormal demand around the base demand (simulation.sample_demand)
+def demand_scenarios(params, n_scenarios, spread=DEMAND_SPREAD, seed=0):
+    base = params if isinstance(params, ParameterSet) else ParameterSet.from_dict(params)
+    trajectories = sample_demand(base.arrays['Demand'], n_scenarios, spread, seed)
+    deltas = {f"demand_{k + 1}": {'Demand': dict(zip(base.index['sutures'], demand.tolist()))} for k, demand in enumerate(trajectories)}
+    return ScenarioSet(base, deltas), {name: 1.0 / n_scenarios for name in deltas}
+
+# Scenarios from whole parameter sets, e.g. the demand and cost shocks of parameters.py, stored as their differences
+# from the first one. They must share its index sets; probabilities default to equally likely.
+def parameter_scenarios(param_sets, probabilities=None):
+    sets = {name: params if isinstance(params, ParameterSet) else ParameterSet.from_dict(params, name=name) for name, params in param_sets.items()}
+    base = next(iter(sets.values()))
+    for name, params in sets.items():
+        if params.index != base.index:
+            raise ValueError(f"Parameter validation failed: scenario {name} does not have the suture types, materials and lines of the other scenarios")
+    deltas = {name: {key: params[key] for key, array in params.arrays.items() if not np.array_equal(array, base.arrays[key])} for name, params in sets.items()}
+    if probabilities is None:
+        probabilities = {name: 1.0 / len(sets) for name in sets}
+    return ScenarioSet(base, deltas), dict(probabilities)
+
+#-----------------------------------------
+
+# Subproblem state of a worker process: the scenarios and, per scenario, its formulation and solver model. Every
+# worker builds a scenario once and then only changes objective, consensus and bounds between iterations.
+_WORKER = {}
+
+def _init_worker(scenarios, time_periods, backend, compact, threads, time_limit):
+    _WORKER.clear()
+    _WORKER.update(scenarios=scenarios, time_periods=time_periods, backend=backend, compact=compact, threads=threads,
+                   time_limit=time_limit, subproblems={})
+
+def _close_worker():
+    for subproblem in _WORKER.get('subproblems', {}).values():
+        if 'model' in subproblem:
+            subproblem['model'].dispose()
+    if 'env' in _WORKER:
+        _WORKER['env'].dispose()
+    _WORKER.clear()
+
+# Formulation and solver model of one scenario. Gurobi takes the proximal term as a quadratic objective. scipy's
+# HiGHS interface only takes linear objectives, so there every order column Q gets SEGMENTS deviation columns above
+# and below the consensus and a row Q - sum(Up) + sum(Down) = consensus; without costs on the deviations the rows
+# do not bind and the subproblem is the scenario model itself.
+def _subproblem(name):
+    subproblems = _WORKER['subproblems']
+    if name in subproblems:
+        return subproblems[name]
+    params = _WORKER['scenarios'][name]
+    periods = _WORKER['time_periods']
+    form = build_formulation(params, MODEL_TYPE, time_periods=periods, with_names=False, compact=_WORKER['compact'])
+    subproblem = {'form': form, 'base_obj': form.obj.copy(), 'orders': np.concatenate([form.var_blocks[block].ravel() for block in FIRST_STAGE]), 'start': None}
+    if _WORKER['backend'] == "gurobi":
+        import gurobipy as gp
+        from matrix_models import load_formulation
+        if 'env' not in _WORKER:
+            _WORKER['env'] = gp.Env(params={'OutputFlag': 0})
+        model, x = load_formulation(form, gp.Model(form.name, env=_WORKER['env']))
+        if _WORKER['threads']:
+            model.Params.Threads = _WORKER['threads']
+        if _WORKER['time_limit'] is not None:
+            model.Params.TimeLimit = _WORKER['time_limit']
+        subproblem.update(model=model, x=x)
+    else:
+        n_vars = form.num_vars
+        up, down, rows = [], [], []
+        for block in FIRST_STAGE:
+            items = form.block_items[block]
+            prox = form.add_constrs(block + "Prox", items, periods, '=')
+            form.add_terms(prox, form.var_blocks[block])
+            block_up = [form.add_vars(f"{block}ProxUp{k}", items, periods, 'C') for k in range(SEGMENTS)]
+            block_down = [form.add_vars(f"{block}ProxDown{k}", items, periods, 'C') for k in range(SEGMENTS)]
+            for k in range(SEGMENTS):
+                form.add_terms(prox, block_up[k], -1.0)
+                form.add_terms(prox, block_down[k])
+            up.append(np.array([segment.ravel() for segment in block_up]))
+            down.append(np.array([segment.ravel() for segment in block_down]))
+            rows.append(prox.ravel())
+        # (SEGMENTS, orders) column indices of the deviations
+        subproblem.update(up=np.concatenate(up, axis=1), down=np.concatenate(down, axis=1), rows=np.concatenate(rows),
+                          base_obj=np.concatenate([subproblem['base_obj'], np.zeros(form.num_vars - n_vars)]), lb=form.lb.copy(), ub=form.ub.copy())
+    subproblems[name] = subproblem
+    return subproblem
+
+# Solve the subproblem of one scenario: maximise profit - w * Q - rho/2 * (Q - consensus)^2, or the scenario model
+# with the orders fixed. With Gurobi the subproblem is an MIQP with the exact quadratic term; with HiGHS it is a MILP
+# with the piecewise linear term of SEGMENTS pieces. Returns the profit of the scenario itself (without the hedging
+# terms), its dual bound and the orders; with_results adds the plan in the layout of run_model_*.
+def solve_subproblem(name, w=None, consensus=None, rho=None, step=None, fixed=None, mip_gap=MIP_GAP, with_results=False):
+    subproblem = _subproblem(name)
+    form, orders = subproblem['form'], subproblem['orders']
+    if _WORKER['backend'] == "gurobi":
+        values, status, bound = _solve_gurobi(subproblem, w, consensus, rho, fixed, mip_gap)
+    else:
+        values, status, bound = _solve_highs(subproblem, w, consensus, rho, step, fixed, mip_gap)
+    if values is None:
+        return {'name': name, 'status': status}
+    subproblem['start'] = values
+    profit = float(subproblem['base_obj'] @ values)
+    # The hedging terms only lower the objective, so the bound of the subproblem also bounds the profit of a
+    # scenario whose terms are zero (the first iteration and the evaluation)
+    solved = {'name': name, 'status': status, 'objective_value': profit, 'bound': bound if bound is not None else profit, 'orders': values[orders]}
+    if with_results:
+        params = _WORKER['scenarios'][name]
+        solved['results'] = {'objective_value': profit, **solution_to_results(form, values), 'shortage_cost': shortage_cost(params)}
+    return solved
+
+def _solve_gurobi(subproblem, w, consensus, rho, fixed, mip_gap):
+    import scipy.sparse as sp
+    from gurobipy import GRB
+    model, x, orders = subproblem['model'], subproblem['x'], subproblem['orders']
+    c = subproblem['base_obj'].copy()
+    Q, constant = None, 0.0
+    if w is not None:
+        c[orders] -= w
+    if consensus is not None:
+        # -rho/2 (Q - consensus)^2 = -rho/2 Q^2 + rho consensus Q - rho/2 consensus^2
+        Q = sp.coo_matrix((-rho / 2, (orders, orders)), shape=(len(c), len(c)))
+        c[orders] += rho * consensus
+        constant = float(-rho / 2 @ consensus ** 2)
+    model.setMObjective(Q, c, constant, sense=GRB.MAXIMIZE)
+    lb, ub = subproblem['form'].lb.copy(), subproblem['form'].ub.copy()
+    if fixed is not None:
+        lb[orders] = ub[orders] = fixed
+    x.LB, x.UB = lb, ub
+    model.Params.MIPGap = mip_gap
+    if subproblem['start'] is not None:
+        start = subproblem['start'].copy()
+        if fixed is not None:
+            start[orders] = fixed
+        x.Start = start
+    model.optimize()
+    if model.SolCount == 0:
+        return None, model.Status, None
+    return x.X, model.Status, model.ObjBound
+
+def _solve_highs(subproblem, w, consensus, rho, step, fixed, mip_gap):
+    from backends import solve_milp
+    form, orders = subproblem['form'], subproblem['orders']
+    obj = subproblem['base_obj'].copy()
+    rhs = form.rhs.copy()
+    lb, ub = subproblem['lb'].copy(), subproblem['ub'].copy()
+    if w is not None:
+        obj[orders] -= w
+    if consensus is not None:
+        # Piece k runs from (2^k - 1) to (2^(k+1) - 1) steps away from the consensus, at the mean slope of the
+        # quadratic over it
+        breakpoints = step * (2.0 ** np.arange(SEGMENTS + 1) - 1)[:, None]
+        obj[subproblem['up']] = obj[subproblem['down']] = -rho * (breakpoints[:-1] + breakpoints[1:]) / 2
+        ub[subproblem['up'][:-1]] = ub[subproblem['down'][:-1]] = np.diff(breakpoints, axis=0)[:-1]
+        rhs[subproblem['rows']] = consensus
+    if fixed is not None:
+        lb[orders] = ub[orders] = fixed
+    form.obj, form.rhs, form.lb, form.ub = obj, rhs, lb, ub
+    status, result = solve_milp(form, time_limit=_WORKER['time_limit'], mip_gap=mip_gap)
+    bound = -result.mip_dual_bound if getattr(result, 'mip_dual_bound', None) is not None else None
+    return result.x, status, bound
+
+# Solve a batch of subproblems in the pool, or in this process without one
+def _solve_all(executor, names, w=None, **kwargs):
+    calls = [dict(kwargs, w=None if w is None else w[k]) for k in range(len(names))]
+    if executor is None:
+        return [solve_subproblem(name, **call) for name, call in zip(names, calls)]
+    futures = [executor.submit(solve_subproblem, name, **call) for name, call in zip(names, calls)]
+    return [future.result() for future in futures]
+
+#-----------------------------------------
+
+# Order blocks in the layout of run_model_* from one vector in the column order of the FIRST_STAGE blocks
+def _order_blocks(base, time_periods, vector):
+    n_periods = len(time_periods)
+    blocks, start = {}, 0
+    for block, kind in zip(FIRST_STAGE, ['raws', 'needles']):
+        items = base.index[kind]
+        values = np.asarray(vector[start:start + len(items) * n_periods]).reshape(len(items), n_periods)
+        blocks[block] = {item: row.tolist() for item, row in zip(items, values)}
+        start += len(items) * n_periods
+    return blocks
+
+# Solve the two-stage model by progressive hedging. Every scenario is solved on its own, in n_workers processes;
+# the orders are pulled towards their probability-weighted consensus by the multipliers w and the proximal term
+# until all scenarios order the same. The rounded consensus orders are then fixed and every scenario is solved once
+# more, which gives the expected profit of an implementable plan. The first iteration, without hedging terms, gives
+# the wait-and-see bound: no plan that orders before demand is known earns more in expectation.
+def progressive_hedging(scenarios, probabilities, time_periods=None, n_workers=1, backend="gurobi", compact=True, rho_factor=RHO_FACTOR,
+                        max_iterations=MAX_ITERATIONS, tolerance=CONVERGENCE_TOLERANCE, mip_gap=MIP_GAP, time_limit=SUBPROBLEM_TIME_LIMIT, quiet=False):
+    from scenario_analysis import solver_threads_per_worker
+    names = list(scenarios)
+    p = np.array([probabilities[name] for name in names], dtype=float)
+    if len(names) == 0 or (p < 0).any() or abs(p.sum() - 1.0) > 1e-6:
+        raise ValueError("Scenario probabilities must be non-negative and sum to 1")
+    base = scenarios.base
+    time_periods = list(time_periods) if time_periods is not None else list(range(1, base.n_periods + 1))
+    base.check_horizon(time_periods)
+
+    unit_cost = np.concatenate([np.repeat(base.arrays['Cost_r'], len(time_periods)), np.repeat(base.arrays['NeedleCost'], len(time_periods))])
+
+    start_time = time.perf_counter()
+    threads = solver_threads_per_worker(n_workers) if n_workers > 1 else None
+    worker = (scenarios, time_periods, backend, compact, threads, time_limit)
+    executor = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=worker) if n_workers > 1 else None
+    if executor is None:
+        _init_worker(*worker)
+
+    def solve(**kwargs):
+        solved = _solve_all(executor, names, **kwargs)
+        for s in solved:
+            if 'orders' not in s:
+                raise ValueError(f"Scenario {s['name']} has no solution. Status code: {s['status']}")
+        return np.array([s['orders'] for s in solved]), np.array([s['objective_value'] for s in solved]), np.array([s['bound'] for s in solved])
+
+    try:
+        orders, profits, bounds = solve(mip_gap=mip_gap)
+        wait_and_see = float(p @ bounds)
+        consensus = p @ orders
+        # Cost-proportional rho: an order column whose scenarios disagree more gets a weaker pull
+        spread = np.maximum(1.0, p @ np.abs(orders - consensus))
+        rho = rho_factor * np.maximum(unit_cost, 1e-2) / spread
+        step = spread / 4
+        w = rho * (orders - consensus)
+        history = [{'iteration': 0, 'distance': None, 'expected_profit': float(p @ profits)}]
+        converged = False
+        for iteration in range(1, max_iterations + 1):
+            orders, profits, _ = solve(w=w, consensus=consensus, rho=rho, step=step, mip_gap=mip_gap)
+            consensus = p @ orders
+            distance = float(p @ np.abs(orders - consensus).sum(axis=1) / max(1.0, np.abs(consensus).sum()))
+            w = w + rho * (orders - consensus)
+            history.append({'iteration': iteration, 'distance': distance, 'expected_profit': float(p @ profits)})
+            if not quiet:
+                print(f"Iteration {iteration}: distance {distance:.5f}, expected scenario profit {p @ profits:.2f}")
+            if distance <= tolerance:
+                converged = True
+                break
+
+        # Evaluate the consensus orders; orders are integer, so the consensus is rounded first
+        fixed = np.rint(consensus)
+        evaluated = _solve_all(executor, names, fixed=fixed, mip_gap=mip_gap, with_results=True)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        else:
+            _close_worker()
+
+    scenario_results, infeasible = {}, []
+    for name, probability, s in zip(names, p, evaluated):
+        if 'results' in s:
+            scenario_results[name] = {'probability': float(probability), **s['results']}
+        else:
+            scenario_results[name] = {'probability': float(probability), 'status': "infeasible"}
+            infeasible.append(name)
+    objective = None if infeasible else float(sum(probability * s['objective_value'] for probability, s in zip(p, evaluated)))
+    results = {
+        'objective_value': objective,
+        'wait_and_see': wait_and_see,
+        'gap': (wait_and_see - objective) / max(1.0, abs(wait_and_see)) if objective is not None else None,
+        'iterations': len(history) - 1,
+        'converged': converged,
+        'solve_time': time.perf_counter() - start_time,
+        'history': history,
+        **_order_blocks(base, time_periods, fixed),
+        'scenarios': scenario_results,
+    }
+    if infeasible and not quiet:
+        print(f"The consensus orders leave {len(infeasible)} scenarios without a feasible recourse: {', '.join(infeasible[:5])}")
+    return results
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Two-stage stochastic backorder model: shared orders, recourse per demand scenario, solved by progressive hedging")
+    parser.add_argument("sources", nargs="+", help="parameter_set_<n> of parameters.py or parameter files; one source is the base of sampled demand scenarios, several are the scenarios")
+    parser.add_argument("--scenarios", type=int, default=20, help="sampled demand scenarios around a single base set")
+    parser.add_argument("--spread", type=float, default=DEMAND_SPREAD, help="log standard deviation of the sampled demand")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--periods", type=int, help="number of periods (default: all periods of the demand)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--backend", choices=["gurobi", "highs"], default="gurobi")
+    parser.add_argument("--full", action="store_true", help="solve the full instead of the compact formulation")
+    parser.add_argument("--max-iterations", type=int, default=MAX_ITERATIONS)
+    parser.add_argument("--output", help=f"results file (default: {STOCHASTIC_DIR}/stochastic-<time>.json)")
+    args = parser.parse_args()
+
+    from datetime import datetime
+    from main import load_parameter_set, parameter_set_name
+    if len(args.sources) == 1:
+        scenarios, probabilities = demand_scenarios(load_parameter_set(args.sources[0]), args.scenarios, spread=args.spread, seed=args.seed)
+    else:
+        scenarios, probabilities = parameter_scenarios({parameter_set_name(source): load_parameter_set(source) for source in args.sources})
+    results = progressive_hedging(scenarios, probabilities, time_periods=list(range(1, args.periods + 1)) if args.periods else None, n_workers=args.workers,
+                                  backend=args.backend, compact=not args.full, max_iterations=args.max_iterations)
+    print(f"Expected profit {results['objective_value']}, wait-and-see bound {results['wait_and_see']:.2f} after {results['iterations']} iterations"
+          f" ({'converged' if results['converged'] else 'not converged'}, {results['solve_time']:.1f} s)")
+    output = args.output
+    if output is None:
+        os.makedirs(STOCHASTIC_DIR, exist_ok=True)
+        output = os.path.join(STOCHASTIC_DIR, f"stochastic-{datetime.now().strftime('%Y-%m-%d-%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f"Results saved in {output}")
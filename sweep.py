@@ -0,0 +1,193 @@
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from formulation import MODEL_OPTIONS, build_formulation
+from backends import BACKENDS
+from models import run_model
+from solve_cache import scenario_key
+from heuristic import lp_bound
+
+#-----------------------------------------
+
+# Sweep axes are (label, values, apply) tuples; apply(params, value) returns a new parameter dict that
+# only replaces the swept entry and shares everything else with the base set
+
+# Multiply every entry of a parameter (e.g. Cost_r x0.8 ... x1.6)
+def scale_axis(key, factors):
+    def apply(params, factor):
+        value = params[key]
+        scaled = {k: v * factor for k, v in value.items()} if isinstance(value, dict) else value * factor
+        return {**params, key: scaled}
+    return (f"{key}*", list(factors), apply)
+
+# Set every entry of a parameter to the same value (e.g. LaborCost 20 ... 60 on both lines)
+def value_axis(key, values):
+    def apply(params, value):
+        current = params[key]
+        return {**params, key: {k: value for k in current} if isinstance(current, dict) else value}
+    return (key, list(values), apply)
+
+# Multiply the demand of one suture type, rounded to whole units
+def demand_axis(suture, multipliers):
+    def apply(params, factor):
+        demand = dict(params['Demand'])
+        demand[suture] = [round(d * factor) for d in demand[suture]]
+        return {**params, 'Demand': demand}
+    return (f"Demand[{suture}]*", list(multipliers), apply)
+
+#-----------------------------------------
+
+# Number of scenarios in the full grid
+def sweep_size(axes):
+    size = 1
+    for _, values, _ in axes:
+        size *= len(values)
+    return size
+
+# Lazily generate every combination of the axes as (scenario name, axis values, parameter set)
+def scenario_grid(base, axes):
+    labels = [label for label, _, _ in axes]
+    for combination in itertools.product(*[values for _, values, _ in axes]):
+        params = base
+        for (_, _, apply), value in zip(axes, combination):
+            params = apply(params, value)
+        values = {label: float(value) for label, value in zip(labels, combination)}
+        name = "|".join(f"{label}={value:g}" for label, value in values.items())
+        yield name, values, params
+
+#-----------------------------------------
+
+# Factories kept alive inside each worker process, so consecutive scenarios are solved incrementally
+_worker_factories = {}
+
+def _factory_for(params, model_type, quiet, backend="gurobi", time_periods=None, compact=False):
+    options = MODEL_OPTIONS[model_type]
+    time_periods = time_periods if time_periods is not None else options['time_periods']
+    key = (model_type, backend, tuple(time_periods), compact)
+    if key not in _worker_factories:
+        factory = BACKENDS[backend](params, time_periods=time_periods, units_per_employee=options['units_per_employee'], compact=compact)
+        if quiet and hasattr(factory, 'model'):
+            factory.model.Params.OutputFlag = 0
+        _worker_factories[key] = factory
+    return _worker_factories[key]
+
+# Solve one scenario of the sweep; infeasible scenarios are recorded instead of stopping the sweep.
+# With a cutoff the scenario is screened first: it is only solved when its LP bound can beat the cutoff.
+def solve_scenario(name, values, params, model_type, time_limit, directory, index, threads=None, quiet=True, cache=None, backend="gurobi", time_periods=None, compact=False,
+                   cutoff=None):
+    record = {'scenario': name, 'values': values, 'model_type': model_type}
+    if cache is not None:
+        key = scenario_key(params, model_type, time_periods=time_periods, time_limit=time_limit, backend=backend, compact=compact)
+        results = cache.get(key)
+        if results is not None:
+            record.update(results, cached=True)
+            return record
+    if cutoff is not None:
+        bound = scenario_bound(params, model_type, time_periods)
+        # JSON has no infinity: an infeasible relaxation is written as a null bound with the infeasible flag
+        record['lp_bound'] = bound if bound is None or math.isfinite(bound) else None
+        record['infeasible'] = bound == -math.inf
+        if bound is not None and not can_improve(bound, cutoff):
+            record['status'] = "pruned" if math.isfinite(bound) else "infeasible"
+            return record
+    try:
+        factory = _factory_for(params, model_type, quiet, backend, time_periods, compact)
+        results = run_model(params, model_type, time_limit, directory, index, threads=threads, factory=factory, backend=backend, time_periods=time_periods, compact=compact)
+    except ValueError as e:
+        print(f"Error with {model_type} and {name}: {e}")
+        results = {'status': "infeasible"}
+    if cache is not None:
+        cache.put(key, results, model_type=model_type)
+    record.update(results)
+    return record
+
+#-----------------------------------------
+
+# A scenario is pruned when its LP bound does not beat the threshold or the best solved scenario by this share
+SCREEN_TOLERANCE = 1e-6
+
+# Upper bound on the profit of a scenario from the LP relaxation of its (compact) formulation, -inf when infeasible
+def scenario_bound(params, model_type, time_periods=None):
+    return lp_bound(build_formulation(params, model_type, time_periods=time_periods, with_names=False, compact=True))
+
+# Whether a scenario with this LP bound can beat the cutoff. An infeasible relaxation never can; nothing is pruned
+# against a cutoff of -inf, i.e. before the first scenario is solved when there is no threshold.
+def can_improve(bound, cutoff):
+    if bound == -math.inf:
+        return False
+    if not math.isfinite(cutoff):
+        return True
+    return bound > cutoff + SCREEN_TOLERANCE * max(1.0, abs(cutoff))
+
+#-----------------------------------------
+
+# Run a sensitivity sweep over the grid spanned by the axes. Scenarios are generated lazily and every result
+# is appended to output_path as one JSON line as soon as it finishes, so memory stays flat for any grid size.
+# With a solve cache, only the scenarios that changed since an earlier sweep are solved again.
+# With screen=True every scenario first gets the LP bound of its relaxation, computed by the worker that would solve it;
+# scenarios whose bound cannot beat the best scenario solved so far are written as "pruned" without a MIP solve.
+# A threshold prunes every scenario whose bound is below it.
+# compact=True solves the compact formulation of every scenario (see formulation.add_core).
+def run_sweep(base, axes, model_type, output_path, time_limit=3600, n_workers=1, quiet=True, cache=None, backend="gurobi", time_periods=None, screen=False, threshold=None, compact=False):
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    total = sweep_size(axes)
+    scenarios = scenario_grid(base, axes)
+    done = 0
+
+    screening = screen or threshold is not None
+    best = threshold if threshold is not None else -math.inf
+    counts = dict.fromkeys(["solved", "cached", "pruned", "infeasible"], 0)
+
+    # Cutoff of the next scenario: the threshold, raised to the best objective so far when screening
+    def cutoff():
+        return best if screening else None
+
+    with open(output_path, 'w') as f:
+
+        def write(record):
+            nonlocal done, best
+            if screen and record.get('objective_value') is not None:
+                best = max(best, record['objective_value'])
+            # Cached scenarios were not solved in this sweep; infeasible ones were pruned by their relaxation or failed the MIP
+            kind = "cached" if record.get('cached') else record.get('status') if record.get('status') in ("pruned", "infeasible") else "solved"
+            counts[kind] += 1
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            done += 1
+            print(f"[{done}/{total}] {record['scenario']}: {record.get('objective_value', record.get('status'))}")
+
+        if n_workers > 1:
+            # Keep at most two scenarios per worker in flight; the bounds are computed in the workers as well
+            from scenario_analysis import solver_threads_per_worker
+            threads = solver_threads_per_worker(n_workers)
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                pending = set()
+                for index, (name, values, params) in enumerate(scenarios, start=1):
+                    pending.add(executor.submit(solve_scenario, name, values, params, model_type, time_limit, directory, index, threads, quiet, cache, backend, time_periods, compact, cutoff()))
+                    if len(pending) >= 2 * n_workers:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            write(future.result())
+                for future in pending:
+                    write(future.result())
+        else:
+            for index, (name, values, params) in enumerate(scenarios, start=1):
+                write(solve_scenario(name, values, params, model_type, time_limit, directory, index, quiet=quiet, cache=cache, backend=backend, time_periods=time_periods,
+                                     compact=compact, cutoff=cutoff()))
+
+    print(f"Sweep of {total} scenarios: {counts['solved']} solved, {counts['cached']} cached, {counts['pruned']} pruned, {counts['infeasible']} infeasible")
+    if cache is not None:
+        cache.evict()
+    return output_path
+
+#-----------------------------------------
+
+# Iterate over the records of a sweep file without loading the whole file
+def read_sweep(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,105 @@
+import argparse
+import json
+import math
+from gurobipy import GRB
+
+# Time columns of a telemetry record, in the order of the solve pipeline
+STAGES = ['build_time', 'solve_time', 'validation_time', 'extraction_time']
+
+#-----------------------------------------
+
+# Gurobi callback recording presolve reductions and the MIP gap over time on the model (model._gap_history).
+# Every new [runtime, incumbent, bound, gap] entry is also passed to model._progress when one is set.
+def solver_callback(model, where):
+    if where == GRB.Callback.PRESOLVE:
+        model._presolve = (model.cbGet(GRB.Callback.PRE_ROWDEL), model.cbGet(GRB.Callback.PRE_COLDEL))
+    elif where == GRB.Callback.MIP:
+        incumbent = model.cbGet(GRB.Callback.MIP_OBJBST)
+        bound = model.cbGet(GRB.Callback.MIP_OBJBND)
+        incumbent = incumbent if abs(incumbent) < GRB.INFINITY else None
+        history = model._gap_history
+        if not history or history[-1][1:3] != [incumbent, bound]:
+            gap = abs(bound - incumbent) / max(abs(incumbent), 1e-10) if incumbent is not None else None
+            history.append([model.cbGet(GRB.Callback.RUNTIME), incumbent, bound, gap])
+            if model._progress is not None:
+                model._progress(*history[-1])
+
+# Reset the callback state of a model before a solve; progress(runtime, incumbent, bound, gap) streams the MIP gap
+def reset_callback(model, progress=None):
+    model._presolve = (0, 0)
+    model._gap_history = []
+    model._progress = progress
+
+#-----------------------------------------
+
+# Size and solve statistics of a solved Gurobi model
+def model_statistics(model):
+    statistics = {
+        'num_vars': model.NumVars, 'num_int_vars': model.NumIntVars, 'num_constrs': model.NumConstrs, 'num_nonzeros': model.NumNZs,
+        'presolve_rows_removed': model._presolve[0], 'presolve_cols_removed': model._presolve[1],
+        'status': model.Status, 'solve_time': model.Runtime, 'gap_history': model._gap_history,
+    }
+    if model.IsMIP:
+        statistics['node_count'] = model.NodeCount
+    if model.SolCount > 0:
+        statistics['objective_value'] = model.ObjVal
+        statistics['mip_gap'] = model.MIPGap if model.IsMIP else 0.0
+    return statistics
+
+# The same statistics for a model solved by an open-source backend
+def backend_statistics(factory):
+    form = factory.form
+    return {
+        'num_vars': form.num_vars, 'num_int_vars': int((form.vtype != 'C').sum()), 'num_constrs': form.num_constrs, 'num_nonzeros': form.A.nnz,
+        'status': factory.status, 'solve_time': factory.solve_time, 'node_count': factory.node_count,
+        'objective_value': factory.objective_value, 'mip_gap': factory.mip_gap,
+    }
+
+#-----------------------------------------
+
+# Telemetry file with one JSON record per scenario, written as soon as the scenario is done
+class TelemetryLog:
+
+    def __init__(self, path):
+        self.path = path
+        open(path, 'w').close()
+
+    def write(self, record):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+
+def read_telemetry(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+#-----------------------------------------
+
+# Rank the scenarios of a telemetry file by their total time (or by objective) and show where the time goes
+def telemetry_report(path, top=None, by='total_time'):
+    records = read_telemetry(path)
+    for record in records:
+        record['total_time'] = sum(record.get(stage) or 0.0 for stage in STAGES)
+    ranked = sorted(records, key=lambda record: record.get(by) if record.get(by) is not None else -math.inf, reverse=True)
+
+    print(f"{'scenario':<56} {'objective':>12} {'total [s]':>9} " + " ".join(f"{stage[:-5] + ' [s]':>14}" for stage in STAGES) + f" {'vars':>7} {'nodes':>8} {'gap':>8}")
+    for record in ranked[:top]:
+        times = " ".join(f"{record.get(stage) or 0.0:>14.3f}" for stage in STAGES)
+        gap = record.get('mip_gap')
+        gap = f"{gap:.2e}" if gap is not None and math.isfinite(gap) else "cached" if record.get('cached') else "-"
+        objective = record.get('objective_value')
+        objective = f"{objective:.2f}" if objective is not None else "infeasible"
+        print(f"{record['scenario']:<56} {objective:>12} {record['total_time']:>9.3f} {times} {record.get('num_vars', 0):>7} {record.get('node_count', 0) or 0:>8.0f} {gap:>8}")
+
+    total = sum(record['total_time'] for record in records) or 1.0
+    print("Share of the total time: " + ", ".join(f"{stage[:-5]} {100 * sum(record.get(stage) or 0.0 for record in records) / total:.1f}%" for stage in STAGES))
+    return ranked
+
+#-----------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank the scenarios of a telemetry file by solve cost")
+    parser.add_argument("path")
+    parser.add_argument("--top", type=int, help="only show the most expensive scenarios")
+    parser.add_argument("--by", choices=["total_time", "solve_time", "build_time", "objective_value"], default="total_time", help="ranking key")
+    args = parser.parse_args()
+    telemetry_report(args.path, top=args.top, by=args.by)
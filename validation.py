@@ -0,0 +1,204 @@
+import numpy as np
+from formulation import MODEL_OPTIONS, compile_arrays
+
+# Absolute feasibility tolerance per constraint sense, scaled by max(1, |rhs|) of the row
+SENSE_TOLERANCE = {'<': 1e-6, '>': 1e-6, '=': 1e-6}
+
+# Tolerance of the plan re-check, and of integrality for batches and implied order quantities, relative to max(1, |limit|)
+PLAN_TOLERANCE = 1e-6
+INTEGRALITY_TOLERANCE = 1e-5
+
+# Units a screened quantity may be off its limit, for parameters read from text files
+SCREEN_TOLERANCE = 1e-6
+
+#-----------------------------------------
+
+# Rows whose slack (rhs - activity) is on the wrong side of their sense. A <= row is violated when the slack is
+# negative, a >= row when it is positive and an equality when it is nonzero, each beyond the tolerance of its sense.
+def constraint_violations(names, senses, rhs, slack, tolerance=SENSE_TOLERANCE):
+    senses = np.asarray(senses)
+    rhs = np.asarray(rhs, dtype=float)
+    slack = np.asarray(slack, dtype=float)
+    violation = np.select([senses == '<', senses == '>'], [-slack, slack], np.abs(slack))
+    limit = np.select([senses == '<', senses == '>'], [tolerance['<'], tolerance['>']], tolerance['=']) * np.maximum(1.0, np.abs(rhs))
+    return [{'name': names[i], 'sense': str(senses[i]), 'rhs': float(rhs[i]), 'slack': float(slack[i]), 'violation': float(violation[i])}
+            for i in np.flatnonzero(violation > limit)]
+
+# Constraint check of a solved Gurobi model from one bulk query of slacks, senses, right-hand sides and names
+def model_constraint_report(model, tolerance=SENSE_TOLERANCE):
+    constrs = model.getConstrs()
+    slack = model.getAttr("Slack", constrs)
+    senses = model.getAttr("Sense", constrs)
+    rhs = model.getAttr("RHS", constrs)
+    names = model.getAttr("ConstrName", constrs)
+    return {'constraints_checked': len(constrs), 'constraint_violations': constraint_violations(names, senses, rhs, slack, tolerance)}
+
+#-----------------------------------------
+
+# Re-check a returned plan against the parameter dict, independently of the model that produced it: stage chain,
+# batch multiples, inventory balances (with the orders they imply), inventory limits, demand and capacities
+def check_plan(params, results, model_type, time_periods=None, tol=PLAN_TOLERANCE):
+    options = MODEL_OPTIONS[model_type]
+    periods = list(time_periods) if time_periods is not None else options['time_periods']
+    sutures = list(results['Shipping'])
+    raws = list(results['RawInventory'])
+    needles = list(results['NeedleInventory'])
+    lines = list(params['MaxCapacity'])
+    violations = []
+
+    def block(name, items):
+        return np.array([results[name][item] for item in items], dtype=float).reshape(len(items), len(periods))
+
+    def column(key, items):
+        return np.array([params[key][item] for item in items], dtype=float)[:, None]
+
+    def check(name, items, excess, value, limit, threshold=tol):
+        value, limit = np.broadcast_arrays(value, limit)
+        for i, t in zip(*np.nonzero(excess > threshold * np.maximum(1.0, np.abs(limit)))):
+            violations.append({'check': name, 'item': items[i], 'period': periods[t], 'value': float(value[i, t]), 'limit': float(limit[i, t])})
+
+    def previous(stock, initial):
+        return np.concatenate([initial, stock[:, :-1]], axis=1)
+
+    stages = {name: block(name, sutures) for name in ['Preparation', 'Cutting', 'NeedleAttachment', 'Packaging', 'Sterilization']}
+    shipping = block('Shipping', sutures)
+    finished = block('FinishedInventory', sutures)
+    raw = block('RawInventory', raws)
+    needle = block('NeedleInventory', needles)
+    preparation = stages['Preparation']
+
+    # Every stage processes what the previous stage produced in the same period
+    chain = list(stages)
+    for name, before in zip(chain[1:], chain[:-1]):
+        check(name, sutures, np.abs(stages[name] - stages[before]), stages[name], stages[before])
+
+    # Preparation in whole batches
+    batch = column('BatchSize', sutures)
+    nearest = batch * np.round(preparation / batch)
+    check('BatchMultiple', sutures, np.abs(preparation - nearest), preparation, nearest, INTEGRALITY_TOLERANCE)
+
+    # Finished goods balance
+    expected = previous(finished, column('InitialInventory', sutures)) + stages['Sterilization'] - shipping
+    check('InvBal', sutures, np.abs(finished - expected), finished, expected)
+
+    # Raw material and needle balances: the orders they imply must be non-negative whole units
+    raw_usage = np.array([preparation[[s + '_raw' == r for s in sutures]].sum(axis=0) for r in raws])
+    raw_orders = raw - previous(raw, column('InitialRawInventory', raws)) + raw_usage
+    check('RawOrder', raws, -raw_orders, raw_orders, 0.0)
+    check('RawOrderIntegral', raws, np.abs(raw_orders - np.round(raw_orders)), raw_orders, np.round(raw_orders), INTEGRALITY_TOLERANCE)
+    needle_orders = needle - previous(needle, column('InitialNeedleInventory', needles)) + stages['NeedleAttachment'].sum(axis=0)
+    check('NeedleOrder', needles, -needle_orders, needle_orders, 0.0)
+    check('NeedleOrderIntegral', needles, np.abs(needle_orders - np.round(needle_orders)), needle_orders, np.round(needle_orders), INTEGRALITY_TOLERANCE)
+
+    # Inventory limits
+    for name, items, stock, low, high in [('FinishedInventory', sutures, finished, 'SafetyStock', 'MaxFinishedInventory'),
+                                          ('RawInventory', raws, raw, 'MinRawInventory', 'MaxRawInventory'),
+                                          ('NeedleInventory', needles, needle, 'MinNeedleInventory', 'MaxNeedleInventory')]:
+        check(f"Min{name}", items, column(low, items) - stock, stock, column(low, items))
+        check(f"Max{name}", items, stock - column(high, items), stock, column(high, items))
+
+    # Demand: met exactly, or at most with shortages recorded for the backorder model
+    demand = np.array([[params['Demand'][s][t - 1] for t in periods] for s in sutures], dtype=float)
+    if options['demand_sense'] == '=':
+        check('Demand', sutures, np.abs(shipping - demand), shipping, demand)
+    else:
+        check('Demand', sutures, shipping - demand, shipping, demand)
+    if 'Shortage' in results:
+        shortage = block('Shortage', sutures)
+        check('Shortage', sutures, np.abs(shortage + shipping - demand), shortage + shipping, demand)
+
+    # Capacities; a second shift doubles them, machines and packaging follow the shift of the last line
+    shift = block('SecondShift', lines) if 'SecondShift' in results else np.zeros((len(lines), len(periods)))
+    total_preparation = preparation.sum(axis=0)[None, :]
+    total_packaging = stages['Packaging'].sum(axis=0)[None, :]
+    machines, pack_lines = list(params['MaxCapacity_m']), list(params['MaxPackagingCapacity'])
+    check('ProdCap', lines, total_preparation - column('MaxCapacity', lines) * (1 + shift), total_preparation, column('MaxCapacity', lines) * (1 + shift))
+    check('MachCap', machines, total_preparation - column('MaxCapacity_m', machines) * (1 + shift[-1]), total_preparation, column('MaxCapacity_m', machines) * (1 + shift[-1]))
+    check('PackCap', pack_lines, total_packaging - column('MaxPackagingCapacity', pack_lines) * (1 + shift[-1]), total_packaging, column('MaxPackagingCapacity', pack_lines) * (1 + shift[-1]))
+
+    # Staff: every line needs enough employees for the total preparation of the period
+    needed = np.ceil(total_preparation / options['units_per_employee'] - tol)
+    available = column('MaxEmployees', lines) * (1 + shift)
+    check('Staff', lines, needed - available, np.broadcast_to(needed, available.shape), available)
+
+    return {'plan_violations': violations}
+
+#-----------------------------------------
+
+# Structured validation report of one solve: bulk constraint check and independent plan re-check
+def validation_report(constraint_report, plan_report):
+    report = {**constraint_report, **plan_report}
+    report['ok'] = not report.get('constraint_violations') and not report.get('plan_violations')
+    return report
+
+#-----------------------------------------
+
+# Necessary conditions for a plan of the model type, on the compiled parameter arrays; returns the reasons the
+# parameters cannot have a feasible plan, empty when the screen passes (the solve may still find none).
+# Every line, machine and packaging line row and the staff of every line cap the total production of a period
+# (twice that with a second shift). Production comes in whole batches, and by every period the cumulative production
+# of a suture type must cover its demand (the models that ship all of it), the safety stock and the initial raw
+# material above MaxRawInventory, which period 1 has to use, while staying below what MaxFinishedInventory and the
+# demand let the stock take. Raw materials and needles can be ordered without limit, so they only fail through their
+# inventory limits.
+def feasibility_screen(params, model_type, time_periods=None):
+    options = MODEL_OPTIONS[model_type]
+    data = compile_arrays(params, time_periods if time_periods is not None else options['time_periods'])
+    sutures, raws, needles = data['sutures'], data['raws'], data['needles']
+    periods = np.arange(1, len(data['time_periods']) + 1)
+    reasons = []
+
+    # Production capacity of a period and the resource that sets it
+    shifts = 2 if options['second_shift'] else 1
+    resources = [("", data['lines'], data['MaxCapacity']), ("", data['machines'], data['MaxCapacity_m']), ("", data['pack_lines'], data['MaxPackagingCapacity']),
+                 ("the staff of ", data['lines'], options['units_per_employee'] * data['MaxEmployees'])]
+    capacity, resource = min((shifts * float(values.min()), prefix + items[int(values.argmin())]) for prefix, items, values in resources if len(items))
+
+    # Cumulative production every suture type needs by every period, in whole batches, and the most its stock can take
+    batch = data['BatchSize'][:, None]
+    cumulative_demand = np.cumsum(data['Demand'], axis=1)
+    required = data['SafetyStock'][:, None] - data['InitialInventory'][:, None] + (cumulative_demand if options['demand_sense'] == '=' else 0.0)
+    required[:, 0] = np.maximum(required[:, 0], (data['InitialRawInventory'] - data['MaxRawInventory'])[data['raw_of']])
+    required = np.maximum.accumulate(np.maximum(required, 0.0), axis=1)
+    least = np.ceil(required / batch - SCREEN_TOLERANCE) * batch
+    most = data['MaxFinishedInventory'][:, None] - data['InitialInventory'][:, None] + cumulative_demand
+
+    stock = np.argwhere(least > most + SCREEN_TOLERANCE)
+    if stock.size:
+        s, t = stock[0]
+        if required[s, t] <= most[s, t] + SCREEN_TOLERANCE:
+            reasons.append(f"no whole number of batches of {sutures[s]} (batch size {batch[s, 0]:.0f}) keeps its stock between SafetyStock and MaxFinishedInventory in period {periods[t]}")
+        else:
+            reasons.append(f"{sutures[s]} must produce at least {required[s, t]:.0f} units by period {periods[t]} but its stock can take at most {most[s, t]:.0f}")
+
+    total = least.sum(axis=0)
+    short = np.flatnonzero(total > capacity * periods + SCREEN_TOLERANCE)
+    if short.size:
+        t = short[0]
+        reasons.append(f"the production needed by period {periods[t]} in whole batches ({total[t]:.0f} units) exceeds the capacity of {capacity * periods[t]:.0f} units, "
+                       f"{capacity:.0f} per period of {resource}")
+    oversized = np.flatnonzero((least[:, -1] > 0) & (batch[:, 0] > capacity + SCREEN_TOLERANCE))
+    if oversized.size:
+        s = oversized[0]
+        reasons.append(f"a batch of {sutures[s]} ({batch[s, 0]:.0f} units) is larger than the capacity of a period, {capacity:.0f} of {resource}")
+
+    # Inventory limits that leave no room, and initial stocks above their maximum, which period 1 must use
+    for items, low, high in [(raws, 'MinRawInventory', 'MaxRawInventory'), (needles, 'MinNeedleInventory', 'MaxNeedleInventory'),
+                             (sutures, 'SafetyStock', 'MaxFinishedInventory')]:
+        for i in np.flatnonzero(data[low] > data[high] + SCREEN_TOLERANCE):
+            reasons.append(f"{low} of {items[i]} is above its {high}")
+    unused = np.setdiff1d(np.arange(len(raws)), data['raw_of'])
+    for i in unused[data['InitialRawInventory'][unused] > data['MaxRawInventory'][unused] + SCREEN_TOLERANCE]:
+        reasons.append(f"the initial stock of raw material {raws[i]} is above its MaxRawInventory and no suture type uses it")
+    excess = data['InitialNeedleInventory'] - data['MaxNeedleInventory']
+    first_period = min(capacity, float((np.floor(most[:, 0] / batch[:, 0] + SCREEN_TOLERANCE) * batch[:, 0]).clip(min=0).sum()))
+    if len(needles) and excess.max() > first_period + SCREEN_TOLERANCE:
+        n = int(excess.argmax())
+        reasons.append(f"the initial stock of needle {needles[n]} is {excess[n]:.0f} above its MaxNeedleInventory, more than period 1 can attach ({first_period:.0f})")
+    return reasons
+
+# Stop with the reasons of feasibility_screen when the parameters cannot have a plan of the model type
+def check_feasibility(params, model_type, time_periods=None):
+    reasons = feasibility_screen(params, model_type, time_periods)
+    if reasons:
+        raise ValueError(f"Parameter set is infeasible for {model_type}: {'; '.join(reasons)}")